@@ -1,39 +1,239 @@
 #!/usr/bin/env python3
 """
 Backend API for Libyan Food Company Website
-Using Flask, SQLite, and JWT Authentication
+Using Flask, SQLite (or PostgreSQL), and JWT Authentication
 """
 
-from flask import Flask, request, jsonify
+from flask import (Flask, request, jsonify, g, send_from_directory, make_response, Response,
+                   has_request_context)
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
-import sqlite3
+from flask_jwt_extended import (JWTManager, create_access_token, jwt_required, current_user,
+                                get_jwt_identity, verify_jwt_in_request)
+from werkzeug.security import generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.utils import safe_join
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timezone
+import hashlib
+import hmac
+import click
 import uuid
+import mimetypes
+import atexit
+import math
+import time
+import csv
+import io
+import tempfile
+from functools import wraps
+from urllib.parse import urlencode
+
+from cache import create_cache
+from changes import ChangeHub, change_bounds, change_triggers, is_gone, prune_changes, read_changes, sse_event
+from compression import compress, compress_all, is_compressible, negotiate
+from contact_queue import ContactQueue
+from db import DATABASE_ERRORS, INTEGRITY_ERRORS, create_storage
+from images import ImageBusy, ImagePipeline, ImageTooLarge, InvalidImage
+from jsonprovider import FastJSONProvider
+from metrics import SIZE_BUCKETS, Registry, SQLTracer, TracedConnection
+from passwords import PasswordBusy, PasswordHasher
+from ratelimit import create_rate_limiter
+from retention import MaintenanceScheduler, archive_batch, claim_run, compact_sqlite, retention_cutoff
+from search import arabic_normalize, search, search_schema
+from snapshot import SnapshotExporter
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app, use_orjson=os.environ.get('JSON_ORJSON', '1') == '1')
 app.config['JWT_SECRET_KEY'] = 'libyan-food-company-secret-key-2024'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['DATABASE_URL'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
+app.config['AUTO_MIGRATE'] = os.environ.get('AUTO_MIGRATE', '1') == '1'  # 0: only `flask migrate` changes the schema
+app.config['DATABASE_READ_URL'] = os.environ.get('DATABASE_READ_URL')  # optional read replica
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 8))
+app.config['DB_POOL_TIMEOUT'] = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+app.config['DB_MMAP_SIZE'] = int(os.environ.get('DB_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['DB_CACHE_SIZE'] = int(os.environ.get('DB_CACHE_SIZE', -16000))  # negative = KiB
+app.config['CACHE_URL'] = os.environ.get('CACHE_URL')  # e.g. redis://localhost:6379/0 for multi-worker setups
+app.config['CACHE_TTL'] = int(os.environ.get('CACHE_TTL', 300))
+app.config['CACHE_MAX_ENTRIES'] = int(os.environ.get('CACHE_MAX_ENTRIES', 512))
+app.config['COMPRESS'] = os.environ.get('COMPRESS', '1') == '1'  # gzip/brotli for JSON and text responses
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['CONTACT_QUEUE'] = os.environ.get('CONTACT_QUEUE', '1') == '1'  # write-behind contact inserts
+app.config['CONTACT_SPOOL_DIR'] = os.environ.get('CONTACT_SPOOL_DIR', 'spool')
+app.config['CONTACT_BATCH_SIZE'] = int(os.environ.get('CONTACT_BATCH_SIZE', 100))
+app.config['CONTACT_FLUSH_INTERVAL'] = float(os.environ.get('CONTACT_FLUSH_INTERVAL', 1.0))
+app.config['CONTACT_SPOOL_FSYNC'] = os.environ.get('CONTACT_SPOOL_FSYNC', '1') == '1'
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')  # werkzeug method string
+app.config['PASSWORD_WORKERS'] = int(os.environ.get('PASSWORD_WORKERS', 2))
+app.config['PASSWORD_MAX_PENDING'] = int(os.environ.get('PASSWORD_MAX_PENDING', 32))
+app.config['IDENTITY_CACHE_TTL'] = int(os.environ.get('IDENTITY_CACHE_TTL', 60))
+app.config['RATE_LIMITS'] = {
+    'login': os.environ.get('RATE_LIMIT_LOGIN', '10/minute'),
+    'contact': os.environ.get('RATE_LIMIT_CONTACT', '5/minute'),
+}
+app.config['RATE_LIMIT_URL'] = os.environ.get('RATE_LIMIT_URL')  # redis://... to share buckets between workers
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))  # proxies setting X-Forwarded-For
+app.config['METRICS'] = os.environ.get('METRICS', '1') == '1'  # request/SQL metrics on /metrics
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # bearer token required by /metrics
+app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', '0') == '1'  # no token: only if the proxy hides /metrics
+app.config['SQL_TRACE'] = os.environ.get('SQL_TRACE', '1') == '1'  # time statements run through get_db()
+app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))  # 0 disables the slow query log
+app.config['CHANGE_LOG_RETENTION'] = int(os.environ.get('CHANGE_LOG_RETENTION', 10000))  # newest entries kept
+app.config['CHANGES_POLL_INTERVAL'] = float(os.environ.get('CHANGES_POLL_INTERVAL', 0.5))
+app.config['CHANGES_BUFFER'] = int(os.environ.get('CHANGES_BUFFER', 1000))  # events kept in memory for streams
+app.config['CHANGES_HEARTBEAT'] = float(os.environ.get('CHANGES_HEARTBEAT', 15))
+app.config['CHANGES_STREAM_TIMEOUT'] = float(os.environ.get('CHANGES_STREAM_TIMEOUT', 300))  # clients reconnect
+app.config['CONTACT_RETENTION_DAYS'] = int(os.environ.get('CONTACT_RETENTION_DAYS', 0))  # 0 keeps every message
+app.config['ARCHIVE_BATCH_SIZE'] = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+app.config['MAINTENANCE_INTERVAL'] = int(os.environ.get('MAINTENANCE_INTERVAL', 24 * 3600))  # 0: only `flask maintain`
+app.config['MAINTENANCE_VACUUM_PAGES'] = int(os.environ.get('MAINTENANCE_VACUUM_PAGES', 4096))
+app.config['SNAPSHOT_DIR'] = os.environ.get('SNAPSHOT_DIR')  # static JSON export for nginx/CDN
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 2))
+app.config['IMAGE_TIMEOUT'] = float(os.environ.get('IMAGE_TIMEOUT', 60))
+app.config['IMAGE_MAX_AGE'] = 365 * 24 * 3600  # upload names are content hashes, so they never change
+app.config['UPLOADS_ACCEL_REDIRECT'] = os.environ.get('UPLOADS_ACCEL_REDIRECT')  # e.g. /internal-uploads/images/
+app.config['SNAPSHOT_ON_WRITE'] = os.environ.get('SNAPSHOT_ON_WRITE', '1') == '1'
 
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'Retry-After'])
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'])
 jwt = JWTManager(app)
 
+storage = create_storage(
+    app.config['DATABASE_URL'],
+    read_url=app.config['DATABASE_READ_URL'],
+    max_readers=app.config['DB_POOL_SIZE'],
+    timeout=app.config['DB_POOL_TIMEOUT'],
+    mmap_size=app.config['DB_MMAP_SIZE'],
+    cache_size=app.config['DB_CACHE_SIZE'],
+    functions={'arabic_normalize': arabic_normalize},
+)
+
+cache = create_cache(
+    app.config['CACHE_URL'],
+    max_entries=app.config['CACHE_MAX_ENTRIES'],
+    ttl=app.config['CACHE_TTL'],
+)
+
+password_hasher = PasswordHasher(
+    app.config['PASSWORD_HASH_METHOD'],
+    workers=app.config['PASSWORD_WORKERS'],
+    max_pending=app.config['PASSWORD_MAX_PENDING'],
+)
+
+rate_limiter = create_rate_limiter(app.config['RATE_LIMITS'], app.config['RATE_LIMIT_URL'])
+
+contact_queue = None
+if app.config['CONTACT_QUEUE']:
+    contact_queue = ContactQueue(
+        storage,
+        app.config['CONTACT_SPOOL_DIR'],
+        batch_size=app.config['CONTACT_BATCH_SIZE'],
+        flush_interval=app.config['CONTACT_FLUSH_INTERVAL'],
+        fsync=app.config['CONTACT_SPOOL_FSYNC'],
+        on_commit=lambda conn: commit_changes(conn, 'contact_messages'),
+        logger=app.logger,
+    )
+
+change_hub = ChangeHub(
+    storage,
+    app.json.dumpb,
+    poll_interval=app.config['CHANGES_POLL_INTERVAL'],
+    buffer_size=app.config['CHANGES_BUFFER'],
+    logger=app.logger,
+)
+
+snapshots = None
+if app.config['SNAPSHOT_DIR']:
+    snapshots = SnapshotExporter(app, storage, app.config['SNAPSHOT_DIR'])
+
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'images'), exist_ok=True)
+os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp'), exist_ok=True)
+os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'meta'), exist_ok=True)
 
-# Database initialization
-def init_db():
-    conn = sqlite3.connect('database.db')
-    cursor = conn.cursor()
-    
+IMAGES_DIR = os.path.abspath(os.path.join(app.config['UPLOAD_FOLDER'], 'images'))
+
+image_pipeline = ImagePipeline(
+    IMAGES_DIR,
+    os.path.join(app.config['UPLOAD_FOLDER'], 'meta'),
+    workers=app.config['IMAGE_WORKERS'],
+    timeout=app.config['IMAGE_TIMEOUT'],
+)
+
+# ==================== METRICS ====================
+
+metrics = Registry()
+request_duration = metrics.histogram('lfc_http_request_duration_seconds',
+                                     'Time from the start of a request until its response is ready.',
+                                     ('route', 'method'))
+request_count = metrics.counter('lfc_http_requests_total', 'Requests by route, method and status.',
+                                ('route', 'method', 'status'))
+response_size = metrics.histogram('lfc_http_response_size_bytes',
+                                  'Response body sizes as sent; streamed bodies are not included.',
+                                  ('route', 'method'), SIZE_BUCKETS)
+
+def request_route():
+    # The URL rule, not the path, keeps label cardinality bounded
+    if not has_request_context():
+        return 'none'
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+sql_tracer = None
+if app.config['SQL_TRACE']:
+    sql_tracer = SQLTracer(metrics, storage.dialect, route=request_route,
+                           slow_ms=app.config['SLOW_QUERY_MS'], logger=app.logger)
+
+metrics.collect('lfc_db_pool', storage.stats, label='pool',
+                counters=('hits', 'misses', 'waits', 'timeouts', 'writer_waits'))
+metrics.collect('lfc_cache', cache.stats, counters=('hits', 'misses', 'sets', 'evictions'))
+metrics.collect('lfc_passwords', password_hasher.stats,
+                counters=('verified', 'failed', 'hashed', 'rejected', 'timeouts'))
+metrics.collect('lfc_rate_limit', rate_limiter.stats, label='endpoint', counters=('allowed', 'limited'))
+metrics.collect('lfc_changes', change_hub.stats, counters=('polls', 'events', 'failures'))
+if contact_queue is not None:
+    metrics.collect('lfc_contact_queue', contact_queue.stats,
+                    counters=('enqueued', 'flushed', 'batches', 'failures', 'replayed'))
+
+# Registered before the other request hooks, so the timer also covers them
+@app.before_request
+def start_request_timer():
+    g._request_started = time.perf_counter()
+
+# After-request hooks run in reverse order: this one runs last and sees the compressed body
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('_request_started')
+    if not app.config['METRICS'] or started is None:
+        return response
+    route, method = request_route(), request.method
+    request_duration.observe(time.perf_counter() - started, route, method)
+    request_count.inc(route, method, str(response.status_code))
+    if not response.is_streamed and response.content_length is not None:
+        response_size.observe(response.content_length, route, method)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def export_metrics():
+    if not app.config['METRICS']:
+        return jsonify({'error': 'Not found'}), 404
+    token = app.config['METRICS_TOKEN']
+    if not token:
+        if not app.config['METRICS_PUBLIC']:
+            return jsonify({'error': 'Not found'}), 404
+    elif not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(app.logger), mimetype='text/plain; version=0.0.4')
+
+# ==================== SCHEMA MIGRATIONS ====================
+
+def create_tables(conn):
     # Users table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE NOT NULL,
@@ -42,10 +242,10 @@ def init_db():
             role TEXT DEFAULT 'admin',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    '''))
     
     # Site content table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS site_content (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             section TEXT NOT NULL,
@@ -55,10 +255,10 @@ def init_db():
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             UNIQUE(section, key)
         )
-    ''')
+    '''))
     
     # Services table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS services (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -69,10 +269,10 @@ def init_db():
             is_active BOOLEAN DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    '''))
     
     # Projects table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS projects (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -85,10 +285,10 @@ def init_db():
             is_active BOOLEAN DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    '''))
     
     # Testimonials table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS testimonials (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -100,10 +300,10 @@ def init_db():
             is_active BOOLEAN DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    '''))
     
     # News table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS news (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -117,10 +317,10 @@ def init_db():
             is_active BOOLEAN DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-    ''')
+    '''))
     
     # Contact messages table
-    cursor.execute('''
+    conn.execute(storage.translate_ddl('''
         CREATE TABLE IF NOT EXISTS contact_messages (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -130,13 +330,23 @@ def init_db():
             is_read BOOLEAN DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
+    '''))
+    
+    # Per-table change counters, bumped by the write handlers (ETag / Last-Modified source)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
     ''')
     
+def seed_defaults(conn):
     # Insert default admin user if not exists
-    cursor.execute("SELECT * FROM users WHERE username = 'admin'")
+    cursor = conn.execute("SELECT * FROM users WHERE username = 'admin'")
     if not cursor.fetchone():
-        password_hash = generate_password_hash('admin123')
-        cursor.execute('''
+        password_hash = generate_password_hash('admin123', app.config['PASSWORD_HASH_METHOD'])
+        conn.execute('''
             INSERT INTO users (username, email, password_hash, role)
             VALUES (?, ?, ?, ?)
         ''', ('admin', 'admin@foodcompany.ly', password_hash, 'admin'))
@@ -159,14 +369,15 @@ def init_db():
     ]
     
     for section, key, value, type_ in default_content:
-        cursor.execute('''
-            INSERT OR IGNORE INTO site_content (section, key, value, type)
+        conn.execute('''
+            INSERT INTO site_content (section, key, value, type)
             VALUES (?, ?, ?, ?)
+            ON CONFLICT(section, key) DO NOTHING
         ''', (section, key, value, type_))
     
     # Insert default services
-    cursor.execute("SELECT COUNT(*) FROM services")
-    if cursor.fetchone()[0] == 0:
+    cursor = conn.execute("SELECT COUNT(*) AS count FROM services")
+    if cursor.fetchone()['count'] == 0:
         default_services = [
             ('استيراد المواد الأساسية', 'نحن متخصصون في استيراد السلع الغذائية الأساسية مثل الدقيق، السكر، والزيوت النباتية بأعلى معايير الجودة العالمية.', 'Wheat', 'from-yellow-400 to-yellow-600', 1),
             ('منتجات الألبان والأجبان', 'توفير تشكيلة واسعة من أجود أنواع الألبان والأجبان المستوردة من أرقى المزارع العالمية.', 'Milk', 'from-blue-400 to-blue-600', 2),
@@ -175,63 +386,617 @@ def init_db():
             ('التخزين المبرد والجاف', 'مستودعات حديثة مجهزة بأحدث أنظمة التبريد والتحكم في الحرارة لضمان سلامة الأغذية.', 'Warehouse', 'from-purple-400 to-purple-600', 5),
             ('استشارات السوق الغذائي', 'دراسات سوقية وافية وتحليلات لمساعدة شركائنا على اتخاذ أفضل قرارات الشراء.', 'Lightbulb', 'from-red-400 to-red-600', 6)
         ]
-        cursor.executemany('''
+        conn.executemany('''
             INSERT INTO services (title, description, icon, color, order_num)
             VALUES (?, ?, ?, ?, ?)
         ''', default_services)
 
     # Insert default projects
-    cursor.execute("SELECT COUNT(*) FROM projects")
-    if cursor.fetchone()[0] == 0:
+    cursor = conn.execute("SELECT COUNT(*) AS count FROM projects")
+    if cursor.fetchone()['count'] == 0:
         default_projects = [
             ('شحنة الدقيق الكبرى 2024', 'تأمين 250,000 طن من أجود أنواع الدقيق لتلبية احتياجات السوق المحلي.', '/project-2.jpg', 'طرابلس، بنغازي', 'يناير 2024', '250K Ton', 1),
             ('تجهيز مستودعات طرابلس المركزية', 'تطوير وتجهيز أكبر مستودع مبرد في المنطقة الغربية بأحدث التقنيات.', '/project-3.jpg', 'طرابلس - قصر بن غشير', 'مارس 2024', 'M² 5000', 2),
             ('اتفاقية توريد منتجات الألبان', 'توقيع اتفاقية حصرية مع كبار المنتجين الأوروبيين لتوريد أجود أنواع الأجبان.', '/project-4.jpg', 'الخمس، مصراتة', 'مايو 2024', '150 Containers', 3)
         ]
-        cursor.executemany('''
+        conn.executemany('''
             INSERT INTO projects (title, description, image, location, date, weight, order_num)
             VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', default_projects)
 
     # Insert default testimonials
-    cursor.execute("SELECT COUNT(*) FROM testimonials")
-    if cursor.fetchone()[0] == 0:
+    cursor = conn.execute("SELECT COUNT(*) AS count FROM testimonials")
+    if cursor.fetchone()['count'] == 0:
         default_testimonials = [
             ('محمد السويحلي', 'مدير سلسلة متاجر الغذاء', 'شراكتنا مع الشركة الليبية للغذاء ممتدة لأكثر من 5 سنوات، ونحن نعتبرهم الركيزة الأساسية في توفير المنتجات عالية الجودة لعملائنا.', '/client-1.jpg', 5, 1),
             ('سارة محمود', 'مديرة مشتريات مجموعة الفنادق', 'الالتزام بالمواعيد والجودة هو ما يميز هذه الشركة. لم يسبق وأن تأخرت أي شحنة طلبتها، والمنتجات دائماً طازجة.', '/client-2.jpg', 5, 2),
             ('عمر مختار', 'صاحب مصنع للمخبوزات', 'الدقيق الذي توفره الشركة هو الأفضل في السوق. الجودة مستقرة وهذا ما يساعدنا في الحفاظ على مستوى إنتاجنا.', '/client-3.jpg', 5, 3)
         ]
-        cursor.executemany('''
+        conn.executemany('''
             INSERT INTO testimonials (name, position, content, image, rating, order_num)
             VALUES (?, ?, ?, ?, ?, ?)
         ''', default_testimonials)
 
     # Insert default news
-    cursor.execute("SELECT COUNT(*) FROM news")
-    if cursor.fetchone()[0] == 0:
+    cursor = conn.execute("SELECT COUNT(*) AS count FROM news")
+    if cursor.fetchone()['count'] == 0:
         default_news = [
             ('توسيع شبكة الموردين العالمية', 'أعلنت الشركة اليوم عن توقيع اتفاقيات جديدة مع موردين رائدين في أمريكا اللاتينية لضمان استقرار إمدادات الحبوب.', 'وقعت الشركة الليبية للغذاء سلسلة من مذكرات التفاهم مع كبار منتجي الصويا والذرة في البرازيل والأرجنتين. تأتي هذه الخطوة في إطار خطة استراتيجية لتعزيز الأمن الغذائي وتنويع مصادر الاستيراد لضمان أفضل الأسعار والجودة للمستهلك الليبي.', '/hero-bg.jpg', 'إنجازات', 'الإدارة العامة', '2024-05-15', 1),
             ('إطلاق تطبيق "شريك الغذاء" للموزعين', 'نظام رقمي جديد يتيح للموزعين تتبع طلباتهم وشحناتهم بشكل لحظي وتسهيل التعاملات المالية.', 'في خطوة نحو التحول الرقمي، أطلقت الشركة تطبيقها الجديد المخصص لشركائها التجاريين والموزعين، والذي يهدف إلى تبسيط عملية الطلب وتوفير شفافية كاملة في سلسلة الإمداد.', '/news-2.jpg', 'تكنولوجيا', 'قسم التطوير الرقمي', '2024-05-10', 0),
             ('الشركة تحصد جائزة الجودة العالمية', 'تم منح شركتنا شهادة الأيزو العالمية في جودة الخدمات اللوجستية وتخزين المواد الغذائية.', 'بعد فحوصات دقيقة وتدقيق شامل، حصلت الشركة الليبية للغذاء على شهادة الجودة الدولية، مما يؤكد التزامنا بأعلى المعايير العالمية في التعامل مع المواد الغذائية وتخزينها.', '/news-3.jpg', 'جوائز', 'مكتب الإعلام', '2024-05-02', 0)
         ]
-        cursor.executemany('''
+        conn.executemany('''
             INSERT INTO news (title, excerpt, content, image, category, author, date, is_featured)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', default_news)
 
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully!")
+# Secondary indexes backing the list endpoints (filter + ORDER BY without a sort step)
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_services_active_order ON services (is_active, order_num)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_active_order ON projects (is_active, order_num)',
+    'CREATE INDEX IF NOT EXISTS idx_testimonials_active_order ON testimonials (is_active, order_num)',
+    'CREATE INDEX IF NOT EXISTS idx_news_active_created ON news (is_active, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_contact_messages_created ON contact_messages (created_at)',
+]
+
+# Related items on the news and project detail pages, see DETAILS
+DETAIL_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_news_active_category_created ON news (is_active, category, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_projects_active_location_order ON projects (is_active, location, order_num)',
+]
+
+# Dashboard counters: name -> (table, condition a row must meet to be counted)
+COUNTERS = {
+    'services': ('services', 'is_active = 1'),
+    'projects': ('projects', 'is_active = 1'),
+    'testimonials': ('testimonials', 'is_active = 1'),
+    'news': ('news', 'is_active = 1'),
+    'unread_messages': ('contact_messages', 'is_read = 0'),
+    'total_messages': ('contact_messages', None),
+}
+
+# One aggregated query computing every counter from scratch
+COUNTERS_QUERY = 'SELECT ' + ', '.join(
+    f"(SELECT COUNT(*) FROM {table}{' WHERE ' + condition if condition else ''}) AS {name}"
+    for name, (table, condition) in COUNTERS.items()
+)
+
+def counter_triggers():
+    """SQLite triggers keeping the dashboard_counters row in step with every insert, update and delete."""
+    def delta(row, condition):
+        # A NULL flag counts as false; a bare comparison would be NULL and break the NOT NULL counters
+        return f'IFNULL({row}.{condition}, 0)' if condition else '1'
+
+    statements = []
+    for table in dict.fromkeys(t for t, _ in COUNTERS.values()):
+        counted = [(name, condition) for name, (t, condition) in COUNTERS.items() if t == table]
+        changes = {
+            'insert': [f'{name} = {name} + {delta("NEW", c)}' for name, c in counted],
+            'delete': [f'{name} = {name} - {delta("OLD", c)}' for name, c in counted],
+            'update': [f'{name} = {name} + {delta("NEW", c)} - {delta("OLD", c)}'
+                       for name, c in counted if c],
+        }
+        columns = sorted({c.split()[0] for _, c in counted if c})
+        for event, assignments in changes.items():
+            if not assignments:
+                continue
+            on = f"UPDATE OF {', '.join(columns)}" if event == 'update' else event.upper()
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_counters_{event} AFTER {on} ON {table}
+                BEGIN
+                    UPDATE dashboard_counters SET {', '.join(assignments)} WHERE id = 1;
+                END
+            ''')
+    return statements
+
+def rebuild_counters(conn):
+    """Recompute the counters from the tables; returns {name: (stored, actual)} for counters that drifted."""
+    actual = dict(conn.execute(COUNTERS_QUERY).fetchone())
+    row = conn.execute('SELECT * FROM dashboard_counters WHERE id = 1').fetchone()
+    stored = dict(row) if row else {}
+    drift = {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+    if drift:
+        conn.execute('DELETE FROM dashboard_counters')
+        conn.execute(f"INSERT INTO dashboard_counters (id, {', '.join(COUNTERS)}) VALUES (1, {', '.join('?' * len(COUNTERS))})",
+                     [actual[name] for name in COUNTERS])
+    return drift
+
+VERSIONED_TABLES = ('site_content', 'services', 'projects', 'testimonials', 'news', 'contact_messages', 'users')
+
+def create_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+    conn.executemany('INSERT INTO table_versions (name) VALUES (?) ON CONFLICT(name) DO NOTHING',
+                     [(name,) for name in VERSIONED_TABLES])
+
+def create_counters(conn):
+    if storage.dialect != 'sqlite':
+        return  # get_stats() aggregates on the fly instead
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS dashboard_counters (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            {', '.join(f'{name} INTEGER NOT NULL DEFAULT 0' for name in COUNTERS)}
+        )
+    ''')
+    for statement in counter_triggers():
+        conn.execute(statement)
+    if conn.execute('SELECT 1 FROM dashboard_counters WHERE id = 1').fetchone() is None:
+        rebuild_counters(conn)
+
+def recreate_counter_triggers(conn):
+    if storage.dialect != 'sqlite':
+        return
+    for table in dict.fromkeys(t for t, _ in COUNTERS.values()):
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_counters_{event}')
+    for statement in counter_triggers():
+        conn.execute(statement)
+
+def create_search(conn):
+    if storage.dialect == 'sqlite':
+        search_schema(conn)
+
+def create_detail_indexes(conn):
+    for statement in DETAIL_INDEXES:
+        conn.execute(statement)
+
+# Tables whose row changes are pushed to the admin UI, see changes.py
+CHANGE_LOG_TABLES = ('site_content', 'services', 'projects', 'testimonials', 'news', 'contact_messages')
+
+def create_change_log(conn):
+    conn.execute(storage.translate_ddl('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
+    for statement in change_triggers(storage.dialect, CHANGE_LOG_TABLES):
+        conn.execute(statement)
+
+def create_archive(conn):
+    conn.execute(storage.translate_ddl('''
+        CREATE TABLE IF NOT EXISTS contact_messages_archive (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT,
+            message TEXT NOT NULL,
+            is_read BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''))
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_contact_messages_archive_created '
+                 'ON contact_messages_archive (created_at)')
+    # Only read messages are archived; the partial index keeps unread ones out of the batch scan
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_contact_messages_read_created '
+                 'ON contact_messages (created_at) WHERE is_read = 1')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            name TEXT PRIMARY KEY,
+            last_run TIMESTAMP
+        )
+    ''')
+    conn.execute("INSERT INTO maintenance_runs (name) VALUES ('contact-retention') ON CONFLICT(name) DO NOTHING")
+
+# Applied in order, once per database, and recorded in schema_version.
+# Released steps are never edited: schema changes go in a new step at the end.
+# Steps 1-5 are idempotent so databases created before schema_version existed upgrade cleanly.
+MIGRATIONS = [
+    (1, 'Create tables', create_tables),
+    (2, 'Add list indexes and table version rows', create_indexes),
+    (3, 'Seed the admin user and default content', seed_defaults),
+    (4, 'Add trigger-maintained dashboard counters', create_counters),
+    (5, 'Add full-text search tables', create_search),
+    (6, 'Add related-item indexes for detail pages', create_detail_indexes),
+    (7, 'Add the change log and its triggers', create_change_log),
+    (8, 'Add the contact message archive', create_archive),
+    (9, 'Count NULL flags as false in the dashboard counter triggers', recreate_counter_triggers),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def read_schema_version(conn):
+    try:
+        row = conn.execute('SELECT MAX(version) AS version FROM schema_version').fetchone()
+    except DATABASE_ERRORS:
+        conn.rollback()
+        return 0  # no schema_version table yet
+    return row['version'] or 0
+
+def migrate_schema():
+    """Apply pending migrations under an exclusive database lock; returns the steps applied."""
+    conn = storage.acquire(write=True)
+    try:
+        # Other processes block here until we commit, then find nothing left to do
+        storage.lock_exclusive(conn)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        current = read_schema_version(conn)
+        applied = []
+        for version, description, step in MIGRATIONS:
+            if version > current:
+                step(conn)
+                conn.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                             (version, description))
+                applied.append((version, description))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        storage.release(conn)
+    if applied:
+        cache.clear()
+        app.logger.info('Database migrated to schema version %d', applied[-1][0])
+    return applied
+
+schema_ready = False
 
-# Helper function to get database connection
-def get_db():
-    conn = sqlite3.connect('database.db')
-    conn.row_factory = sqlite3.Row
+def check_schema():
+    """Boot-time check: one read of schema_version, migrating only when AUTO_MIGRATE allows it."""
+    global schema_ready
+    conn = storage.acquire()
+    try:
+        current = read_schema_version(conn)
+    finally:
+        storage.release(conn)
+    if current < SCHEMA_VERSION and app.config['AUTO_MIGRATE']:
+        migrate_schema()
+        current = SCHEMA_VERSION
+    if current > SCHEMA_VERSION:
+        app.logger.warning('Database schema version %d is newer than this code (%d)', current, SCHEMA_VERSION)
+    schema_ready = current >= SCHEMA_VERSION
+    if not schema_ready:
+        app.logger.error('Database schema is at version %d, expected %d: run `flask --app app migrate`',
+                         current, SCHEMA_VERSION)
+    return current
+
+@app.before_request
+def require_schema():
+    # Re-checked until the schema is migrated, so workers recover without a restart
+    if not schema_ready and check_schema() < SCHEMA_VERSION:
+        return jsonify({'error': 'Database schema is out of date'}), 503
+
+# Helper function to get database connection.
+# Connections are borrowed from the pool once per app context and handed back on teardown.
+def get_db(write=False):
+    key = '_db_writer' if write else '_db_reader'
+    conn = g.get(key)
+    if conn is None:
+        conn = storage.acquire(write=write)
+        if sql_tracer is not None:
+            conn = TracedConnection(conn, sql_tracer)
+        setattr(g, key, conn)
     return conn
 
+@app.teardown_appcontext
+def release_db(error):
+    for key in ('_db_writer', '_db_reader'):
+        conn = g.pop(key, None)
+        if conn is not None:
+            storage.release(conn.detach() if isinstance(conn, TracedConnection) else conn)
+
+# ==================== PAGINATION ====================
+
+NEWS_FIELDS = ('id', 'title', 'excerpt', 'content', 'image', 'category', 'author',
+               'date', 'is_featured', 'is_active', 'created_at')
+CONTACT_FIELDS = ('id', 'name', 'email', 'phone', 'message', 'is_read', 'created_at')
+
+# Paged list views leave out the large text bodies unless asked for with fields=
+NEWS_LIST_FIELDS = tuple(f for f in NEWS_FIELDS if f != 'content')
+CONTACT_LIST_FIELDS = tuple(f for f in CONTACT_FIELDS if f != 'message')
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+def parse_page_args(all_fields, list_fields):
+    """Read ?after=<created_at,id>&limit=&fields= from the query string.
+
+    Returns None when none of them is given, so callers keep their unpaged response.
+    Raises ValueError for malformed values.
+    """
+    if not any(arg in request.args for arg in ('after', 'limit', 'fields')):
+        return None
+    
+    fields = request.args.get('fields')
+    if fields:
+        columns = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [c for c in columns if c not in all_fields]
+        if unknown:
+            raise ValueError('Unknown fields: ' + ', '.join(unknown))
+        # The cursor is built from these, so they are always returned
+        for column in ('id', 'created_at'):
+            if column not in columns:
+                columns.append(column)
+    else:
+        columns = list(list_fields)
+    
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    
+    after = None
+    if request.args.get('after'):
+        created_at, _, row_id = request.args['after'].rpartition(',')
+        if not created_at or not row_id.isdigit():
+            raise ValueError('after must be <created_at>,<id>')
+        after = (created_at, int(row_id))
+    
+    return columns, after, limit
+
+def fetch_page(conn, table, where, page):
+    """Keyset page ordered by (created_at DESC, id DESC); the next cursor goes in X-Next-Cursor."""
+    columns, after, limit = page
+    clauses = [where] if where else []
+    params = []
+    if after:
+        clauses.append('(created_at, id) < (?, ?)')
+        params.extend(after)
+    
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if clauses:
+        sql += ' WHERE ' + ' AND '.join(clauses)
+    sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    
+    items = [dict(row) for row in rows[:limit]]
+    response = jsonify(items)
+    if len(rows) > limit:
+        last = items[-1]
+        response.headers['X-Next-Cursor'] = f"{last['created_at']},{last['id']}"
+    return response
+
+# ==================== STREAMING ====================
+
+STREAM_FORMATS = {'json': 'application/json', 'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+STREAM_BATCH_SIZE = 500
+
+def stream_rows(sql, params=(), fmt='json', batch_size=STREAM_BATCH_SIZE):
+    """Yield a query's rows as a JSON array, NDJSON or CSV, one chunk per fetchmany() batch.
+    
+    Only one batch is held in memory at a time. The generator borrows its own connection,
+    so it can keep reading after the request's app context is gone.
+    """
+    conn = storage.acquire()
+    cursor = None
+    try:
+        # On PostgreSQL a server-side cursor, so rows are not all transferred up front
+        cursor = conn.stream(sql, params)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if fmt == 'csv':
+            writer.writerow([d[0] for d in cursor.description])
+        elif fmt == 'json':
+            buffer.write('[')
+        separator = ''
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            if fmt == 'csv':
+                writer.writerows(row.values() if isinstance(row, dict) else row for row in rows)
+            elif fmt == 'json':
+                buffer.write(separator + ','.join(app.json.dumps(dict(row)) for row in rows))
+                separator = ','
+            else:
+                buffer.write(''.join(app.json.dumps(dict(row)) + '\n' for row in rows))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if fmt == 'json':
+            buffer.write(']')
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        storage.release(conn)
+
+def stream_response(sql, params=(), fmt='json'):
+    return Response(stream_rows(sql, params, fmt), mimetype=STREAM_FORMATS[fmt])
+
+# ==================== CACHING ====================
+
+def table_versions(tables):
+    """[(version, updated_at)] of tables from the table_versions rows, read once per request.
+    
+    Writes bump these counters in their own transaction, so every worker sees a
+    new version as soon as the write commits.
+    """
+    known = g.setdefault('_table_versions', {})
+    missing = [name for name in tables if name not in known]
+    if missing:
+        placeholders = ', '.join('?' for _ in missing)
+        for row in get_db().execute(f'SELECT name, version, updated_at FROM table_versions '
+                                    f'WHERE name IN ({placeholders})', missing).fetchall():
+            known[row['name']] = (row['version'], row['updated_at'])
+    return [known.get(name, (0, None)) for name in tables]
+
+def cached(*tables):
+    """Serve a public GET from the response cache, keyed on path, query and table versions.
+    
+    The versions are the ones the ETag is built from (see conditional), so a worker
+    can never answer a new ETag with a body cached for an older version.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            query = urlencode(sorted(request.args.items(multi=True)))
+            versions = ','.join(str(version) for version, _ in table_versions(tables))
+            key = f'{request.path}?{query}@{versions}'
+            
+            entry = cache.get(key)
+            if entry is not None:
+                body, headers, variants = entry
+                response = app.response_class(body, mimetype='application/json', headers=headers)
+                return use_compressed_variant(response, variants)
+            
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [(k, v) for k, v in response.headers.items() if k.startswith('X-')]
+                body = response.get_data()
+                # Compressed once per content version, next to the plain body
+                variants = compress_all(body, app.config['COMPRESS_MIN_SIZE']) if app.config['COMPRESS'] else {}
+                cache.set(key, (body, headers, variants))
+                response = use_compressed_variant(response, variants)
+            return response
+        return wrapper
+    return decorator
+
+def commit_changes(conn, *tables):
+    """Bump the change counters of the written tables and commit.
+    
+    The counters change in the same transaction as the rows, and cache keys
+    embed them, so cached responses go stale exactly when the write commits,
+    in every worker. Versions are read before the data they key, so an entry
+    can hold data newer than its key, never older.
+    """
+    conn.executemany('''
+        UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE name = ?
+    ''', [(name,) for name in tables])
+    if any(name in CHANGE_LOG_TABLES for name in tables):
+        prune_changes(conn, app.config['CHANGE_LOG_RETENTION'])
+    conn.commit()
+    if snapshots is not None and app.config['SNAPSHOT_ON_WRITE']:
+        snapshots.schedule(*tables)
+
+# ==================== COMPRESSION ====================
+
+def use_compressed_variant(response, variants):
+    """Swap in the pre-compressed body the client accepts, if there is one."""
+    if not variants:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.headers.get('Accept-Encoding'), tuple(variants))
+    if encoding:
+        response.set_data(variants[encoding])
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.after_request
+def compress_response(response):
+    """Compress JSON/text bodies above COMPRESS_MIN_SIZE that were not compressed from the cache."""
+    if (not app.config['COMPRESS'] or request.method == 'HEAD'
+            or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype)):
+        return response
+    body = response.get_data()
+    if len(body) < app.config['COMPRESS_MIN_SIZE']:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# ==================== RATE LIMITING ====================
+
+def rate_limited(endpoint, extra_keys=None):
+    """Reject over-limit requests with 429 before the view touches the database."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            keys = ['ip:' + (request.remote_addr or 'unknown')]
+            if extra_keys:
+                keys.extend(extra_keys())
+            allowed, retry_after = rate_limiter.check(endpoint, keys)
+            if not allowed:
+                response = jsonify({'error': 'Too many requests, please try again later'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+                return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def login_username_key():
+    data = request.get_json(silent=True) or {}
+    username = data.get('username')
+    return ['user:' + username.strip().lower()] if isinstance(username, str) and username.strip() else []
+
+# ==================== CONDITIONAL GET ====================
+
+def _to_utc(value):
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def conditional(*tables):
+    """Answer If-None-Match / If-Modified-Since from the table change counters alone."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = table_versions(tables)
+            query = urlencode(sorted(request.args.items(multi=True)))
+            marker = f"{request.path}?{query}|{','.join(str(version) for version, _ in versions)}"
+            etag = hashlib.sha1(marker.encode()).hexdigest()[:20]
+            last_modified = max((_to_utc(updated_at) for _, updated_at in versions if updated_at), default=None)
+            
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
+            
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            # A 304 must carry the Vary and Cache-Control its 200 would have (RFC 9110 15.4.5).
+            # Whether the 200 gets compressed depends on its size, so every representation
+            # varies on Accept-Encoding while compression is on.
+            if app.config['COMPRESS']:
+                response.vary.add('Accept-Encoding')
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
+
 # ==================== AUTH ROUTES ====================
 
+USER_FIELDS = ('id', 'username', 'email', 'role')
+
+def load_identity(username):
+    """The user behind a validated token, cached briefly and dropped whenever users changes."""
+    version = table_versions(('users',))[0][0]
+    key = f'identity:{username}@{version}'
+    user = cache.get(key)
+    if user is None:
+        row = get_db().execute(f"SELECT {', '.join(USER_FIELDS)} FROM users WHERE username = ?",
+                               (username,)).fetchone()
+        if row is None:
+            return None
+        user = dict(row)
+        cache.set(key, user, ttl=app.config['IDENTITY_CACHE_TTL'])
+    return user
+
+@jwt.user_lookup_loader
+def user_lookup(_jwt_header, jwt_data):
+    return load_identity(jwt_data['sub'])
+
+@jwt.user_lookup_error_loader
+def user_lookup_error(_jwt_header, jwt_data):
+    return jsonify({'error': 'User not found'}), 404
+
 @app.route('/api/auth/login', methods=['POST'])
+@rate_limited('login', login_username_key)
 def login():
     data = request.get_json()
     username = data.get('username')
@@ -241,12 +1006,27 @@ def login():
         return jsonify({'error': 'Username and password are required'}), 400
     
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+    cursor = conn.execute('SELECT * FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
-    conn.close()
     
-    if user and check_password_hash(user['password_hash'], password):
+    try:
+        verified = user is not None and password_hasher.verify(user['password_hash'], password)
+        if verified and password_hasher.needs_rehash(user['password_hash']):
+            # Move the stored hash to the configured parameters while the plain password is at hand.
+            # The hash is computed before the writer is taken, so no other write waits on it;
+            # matching the old hash keeps a password changed meanwhile from being overwritten
+            new_hash = password_hasher.hash(password)
+            conn = get_db(write=True)
+            conn.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                         (new_hash, user['id'], user['password_hash']))
+            commit_changes(conn, 'users')
+    except PasswordBusy:
+        response = jsonify({'error': 'Server is busy, please try again'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    if verified:
         access_token = create_access_token(identity=user['username'])
         return jsonify({
             'access_token': access_token,
@@ -262,57 +1042,135 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
-    current_user = get_jwt_identity()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT username, email, role FROM users WHERE username = ?', (current_user,))
-    user = cursor.fetchone()
-    conn.close()
-    
-    if user:
-        return jsonify(dict(user))
-    return jsonify({'error': 'User not found'}), 404
+    return jsonify({k: current_user[k] for k in ('username', 'email', 'role')})
 
-# ==================== CONTENT ROUTES ====================
+# ==================== PUBLIC READ HELPERS ====================
 
-@app.route('/api/content', methods=['GET'])
-def get_all_content():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM site_content')
-    rows = cursor.fetchall()
-    conn.close()
+def load_content(conn, section=None):
+    """site_content as {section: {key: item}}, or {key: item} for a single section."""
+    if section is None:
+        rows = conn.execute('SELECT * FROM site_content').fetchall()
+    else:
+        rows = conn.execute('SELECT * FROM site_content WHERE section = ?', (section,)).fetchall()
     
     content = {}
     for row in rows:
-        section = row['section']
-        if section not in content:
-            content[section] = {}
-        content[section][row['key']] = {
+        item = {
             'value': row['value'],
             'type': row['type'],
             'updated_at': row['updated_at']
         }
+        if section is None:
+            content.setdefault(row['section'], {})[row['key']] = item
+        else:
+            content[row['key']] = item
+    return content
+
+def load_active(conn, table, order_by, columns='*', limit=None):
+    sql = f'SELECT {columns} FROM {table} WHERE is_active = 1 ORDER BY {order_by}'
+    params = ()
+    if limit:
+        sql += ' LIMIT ?'
+        params = (limit,)
+    return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+# Detail pages link to their neighbours in list order and to related items
+# (same category / location); every lookup is a range scan on an index.
+DETAILS = {
+    'news': {'order': 'created_at', 'descending': True, 'related_by': 'category',
+             'fields': ('id', 'title', 'image', 'date')},
+    'projects': {'order': 'order_num', 'descending': False, 'related_by': 'location',
+                 'fields': ('id', 'title', 'image', 'location')},
+}
+RELATED_LIMIT = 4
+
+def detail_queries(table):
+    spec = DETAILS[table]
+    order = spec['order']
+    forward, backward = ('DESC', 'ASC') if spec['descending'] else ('ASC', 'DESC')
+    before, after = ('>', '<') if spec['descending'] else ('<', '>')
+    select = f"SELECT {', '.join(spec['fields'])} FROM {table} WHERE is_active = 1"
+    return {
+        'prev': f'{select} AND ({order}, id) {before} (?, ?) ORDER BY {order} {backward}, id {backward} LIMIT 1',
+        'next': f'{select} AND ({order}, id) {after} (?, ?) ORDER BY {order} {forward}, id {forward} LIMIT 1',
+        'related': f"{select} AND {spec['related_by']} = ? AND id != ? "
+                   f'ORDER BY {order} {forward}, id {forward} LIMIT ?',
+    }
+
+DETAIL_QUERIES = {table: detail_queries(table) for table in DETAILS}
+
+def load_detail(conn, table, item_id):
+    """An active row with its prev/next neighbours and related items, or None."""
+    row = conn.execute(f'SELECT * FROM {table} WHERE id = ? AND is_active = 1', (item_id,)).fetchone()
+    if row is None:
+        return None
+    spec, queries = DETAILS[table], DETAIL_QUERIES[table]
+    position = (row[spec['order']], row['id'])
+    prev = conn.execute(queries['prev'], position).fetchone()
+    next_ = conn.execute(queries['next'], position).fetchone()
+    related = conn.execute(queries['related'], (row[spec['related_by']], row['id'], RELATED_LIMIT)).fetchall()
+    return {
+        'item': dict(row),
+        'prev': dict(prev) if prev else None,
+        'next': dict(next_) if next_ else None,
+        'related': [dict(r) for r in related],
+    }
+
+# ==================== BOOTSTRAP ROUTE ====================
+
+BOOTSTRAP_TABLES = {'content': 'site_content', 'services': 'services', 'projects': 'projects',
+                    'testimonials': 'testimonials', 'news': 'news'}
+BOOTSTRAP_PARTS = tuple(BOOTSTRAP_TABLES)
+BOOTSTRAP_NEWS_LIMIT = 6
+
+def load_bootstrap_part(conn, part):
+    if part == 'content':
+        return load_content(conn)
+    if part == 'news':
+        return load_active(conn, 'news', 'created_at DESC',
+                           columns=', '.join(NEWS_LIST_FIELDS), limit=BOOTSTRAP_NEWS_LIMIT)
+    return load_active(conn, part, 'order_num')
+
+@app.route('/api/bootstrap', methods=['GET'])
+@conditional('site_content', 'services', 'projects', 'testimonials', 'news')
+@cached('site_content', 'services', 'projects', 'testimonials', 'news')
+def get_bootstrap():
+    """Every public homepage section in one response; stale sections are re-read from one snapshot."""
+    include = request.args.get('include')
+    parts = [p.strip() for p in include.split(',') if p.strip()] if include else list(BOOTSTRAP_PARTS)
+    unknown = [p for p in parts if p not in BOOTSTRAP_PARTS]
+    if unknown:
+        return jsonify({'error': 'Unknown sections: ' + ', '.join(unknown)}), 400
+    
+    # Each section is encoded once per version of its table and spliced into the response,
+    # so a change to one table does not re-encode the others
+    tables = {part: BOOTSTRAP_TABLES[part] for part in parts}
+    versions = {part: version for part, (version, _) in zip(tables, table_versions(list(tables.values())))}
+    encoded = {part: cache.get(f'bootstrap:{part}@{versions[part]}') for part in tables}
+    
+    missing = [part for part, body in encoded.items() if body is None]
+    if missing:
+        with get_db().read_snapshot() as conn:
+            for part in missing:
+                encoded[part] = app.json.dumpb(load_bootstrap_part(conn, part))
+                cache.set(f'bootstrap:{part}@{versions[part]}', encoded[part])
     
-    return jsonify(content)
+    body = b'{' + b','.join(app.json.dumpb(part) + b':' + encoded[part] for part in sorted(encoded)) + b'}\n'
+    return app.response_class(body, mimetype='application/json')
+
+# ==================== CONTENT ROUTES ====================
+
+@app.route('/api/content', methods=['GET'])
+@conditional('site_content')
+@cached('site_content')
+def get_all_content():
+    return jsonify(load_content(get_db()))
 
 @app.route('/api/content/<section>', methods=['GET'])
+@conditional('site_content')
+@cached('site_content')
 def get_section_content(section):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM site_content WHERE section = ?', (section,))
-    rows = cursor.fetchall()
-    conn.close()
-    
-    content = {}
-    for row in rows:
-        content[row['key']] = {
-            'value': row['value'],
-            'type': row['type'],
-            'updated_at': row['updated_at']
-        }
-    
-    return jsonify(content)
+    return jsonify(load_content(get_db(), section))
 
 @app.route('/api/content/<section>/<key>', methods=['PUT'])
 @jwt_required()
@@ -320,279 +1178,292 @@ def update_content(section, key):
     data = request.get_json()
     value = data.get('value')
     
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    conn.execute('''
         INSERT INTO site_content (section, key, value, updated_at)
         VALUES (?, ?, ?, ?)
         ON CONFLICT(section, key) DO UPDATE SET
         value = excluded.value,
         updated_at = excluded.updated_at
     ''', (section, key, value, datetime.now()))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'site_content')
     
     return jsonify({'message': 'Content updated successfully'})
 
 # ==================== SERVICES ROUTES ====================
 
 @app.route('/api/services', methods=['GET'])
+@conditional('services')
+@cached('services')
 def get_services():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM services WHERE is_active = 1 ORDER BY order_num')
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    return jsonify(load_active(get_db(), 'services', 'order_num'))
 
 @app.route('/api/services', methods=['POST'])
 @jwt_required()
 def create_service():
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    service_id = conn.insert('''
         INSERT INTO services (title, description, icon, color, order_num)
         VALUES (?, ?, ?, ?, ?)
     ''', (data.get('title'), data.get('description'), data.get('icon'), 
           data.get('color'), data.get('order_num', 0)))
-    conn.commit()
-    service_id = cursor.lastrowid
-    conn.close()
+    commit_changes(conn, 'services')
     return jsonify({'id': service_id, 'message': 'Service created successfully'}), 201
 
 @app.route('/api/services/<int:service_id>', methods=['PUT'])
 @jwt_required()
 def update_service(service_id):
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    conn.execute('''
         UPDATE services SET
         title = ?, description = ?, icon = ?, color = ?, order_num = ?, is_active = ?
         WHERE id = ?
     ''', (data.get('title'), data.get('description'), data.get('icon'),
           data.get('color'), data.get('order_num'), data.get('is_active', 1), service_id))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'services')
     return jsonify({'message': 'Service updated successfully'})
 
 @app.route('/api/services/<int:service_id>', methods=['DELETE'])
 @jwt_required()
 def delete_service(service_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM services WHERE id = ?', (service_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('DELETE FROM services WHERE id = ?', (service_id,))
+    commit_changes(conn, 'services')
     return jsonify({'message': 'Service deleted successfully'})
 
 # ==================== PROJECTS ROUTES ====================
 
 @app.route('/api/projects', methods=['GET'])
+@conditional('projects')
+@cached('projects')
 def get_projects():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM projects WHERE is_active = 1 ORDER BY order_num')
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    return jsonify(load_active(get_db(), 'projects', 'order_num'))
+
+@app.route('/api/projects/<int:project_id>', methods=['GET'])
+@conditional('projects')
+@cached('projects')
+def get_project(project_id):
+    with get_db().read_snapshot() as conn:
+        detail = load_detail(conn, 'projects', project_id)
+    if detail is None:
+        return jsonify({'error': 'Project not found'}), 404
+    return jsonify(detail)
 
 @app.route('/api/projects', methods=['POST'])
 @jwt_required()
 def create_project():
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    project_id = conn.insert('''
         INSERT INTO projects (title, description, image, location, date, weight, order_num)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (data.get('title'), data.get('description'), data.get('image'),
           data.get('location'), data.get('date'), data.get('weight'), data.get('order_num', 0)))
-    conn.commit()
-    project_id = cursor.lastrowid
-    conn.close()
+    commit_changes(conn, 'projects')
     return jsonify({'id': project_id, 'message': 'Project created successfully'}), 201
 
 @app.route('/api/projects/<int:project_id>', methods=['PUT'])
 @jwt_required()
 def update_project(project_id):
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    conn.execute('''
         UPDATE projects SET
         title = ?, description = ?, image = ?, location = ?, date = ?, weight = ?, order_num = ?, is_active = ?
         WHERE id = ?
     ''', (data.get('title'), data.get('description'), data.get('image'),
           data.get('location'), data.get('date'), data.get('weight'),
           data.get('order_num'), data.get('is_active', 1), project_id))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'projects')
     return jsonify({'message': 'Project updated successfully'})
 
 @app.route('/api/projects/<int:project_id>', methods=['DELETE'])
 @jwt_required()
 def delete_project(project_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM projects WHERE id = ?', (project_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+    commit_changes(conn, 'projects')
     return jsonify({'message': 'Project deleted successfully'})
 
 # ==================== TESTIMONIALS ROUTES ====================
 
 @app.route('/api/testimonials', methods=['GET'])
+@conditional('testimonials')
+@cached('testimonials')
 def get_testimonials():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM testimonials WHERE is_active = 1 ORDER BY order_num')
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    return jsonify(load_active(get_db(), 'testimonials', 'order_num'))
 
 @app.route('/api/testimonials', methods=['POST'])
 @jwt_required()
 def create_testimonial():
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    testimonial_id = conn.insert('''
         INSERT INTO testimonials (name, position, content, image, rating, order_num)
         VALUES (?, ?, ?, ?, ?, ?)
     ''', (data.get('name'), data.get('position'), data.get('content'),
           data.get('image'), data.get('rating', 5), data.get('order_num', 0)))
-    conn.commit()
-    testimonial_id = cursor.lastrowid
-    conn.close()
+    commit_changes(conn, 'testimonials')
     return jsonify({'id': testimonial_id, 'message': 'Testimonial created successfully'}), 201
 
 @app.route('/api/testimonials/<int:testimonial_id>', methods=['PUT'])
 @jwt_required()
 def update_testimonial(testimonial_id):
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    conn.execute('''
         UPDATE testimonials SET
         name = ?, position = ?, content = ?, image = ?, rating = ?, order_num = ?, is_active = ?
         WHERE id = ?
     ''', (data.get('name'), data.get('position'), data.get('content'),
           data.get('image'), data.get('rating'), data.get('order_num'),
           data.get('is_active', 1), testimonial_id))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'testimonials')
     return jsonify({'message': 'Testimonial updated successfully'})
 
 @app.route('/api/testimonials/<int:testimonial_id>', methods=['DELETE'])
 @jwt_required()
 def delete_testimonial(testimonial_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM testimonials WHERE id = ?', (testimonial_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('DELETE FROM testimonials WHERE id = ?', (testimonial_id,))
+    commit_changes(conn, 'testimonials')
     return jsonify({'message': 'Testimonial deleted successfully'})
 
 # ==================== NEWS ROUTES ====================
 
 @app.route('/api/news', methods=['GET'])
+@conditional('news')
+@cached('news')
 def get_news():
+    try:
+        page = parse_page_args(NEWS_FIELDS, NEWS_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM news WHERE is_active = 1 ORDER BY created_at DESC')
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    if page:
+        return fetch_page(conn, 'news', 'is_active = 1', page)
+    return jsonify(load_active(conn, 'news', 'created_at DESC'))
+
+@app.route('/api/news/<int:news_id>', methods=['GET'])
+@conditional('news')
+@cached('news')
+def get_news_article(news_id):
+    with get_db().read_snapshot() as conn:
+        detail = load_detail(conn, 'news', news_id)
+    if detail is None:
+        return jsonify({'error': 'News not found'}), 404
+    return jsonify(detail)
 
 @app.route('/api/news', methods=['POST'])
 @jwt_required()
 def create_news():
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    news_id = conn.insert('''
         INSERT INTO news (title, excerpt, content, image, category, author, date, is_featured)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
     ''', (data.get('title'), data.get('excerpt'), data.get('content'),
           data.get('image'), data.get('category'), data.get('author'),
           data.get('date'), data.get('is_featured', 0)))
-    conn.commit()
-    news_id = cursor.lastrowid
-    conn.close()
+    commit_changes(conn, 'news')
     return jsonify({'id': news_id, 'message': 'News created successfully'}), 201
 
 @app.route('/api/news/<int:news_id>', methods=['PUT'])
 @jwt_required()
 def update_news(news_id):
     data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    conn = get_db(write=True)
+    conn.execute('''
         UPDATE news SET
         title = ?, excerpt = ?, content = ?, image = ?, category = ?, author = ?, date = ?, is_featured = ?, is_active = ?
         WHERE id = ?
     ''', (data.get('title'), data.get('excerpt'), data.get('content'),
           data.get('image'), data.get('category'), data.get('author'),
           data.get('date'), data.get('is_featured'), data.get('is_active', 1), news_id))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'news')
     return jsonify({'message': 'News updated successfully'})
 
 @app.route('/api/news/<int:news_id>', methods=['DELETE'])
 @jwt_required()
 def delete_news(news_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM news WHERE id = ?', (news_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('DELETE FROM news WHERE id = ?', (news_id,))
+    commit_changes(conn, 'news')
     return jsonify({'message': 'News deleted successfully'})
 
 # ==================== CONTACT MESSAGES ROUTES ====================
 
+CONTACT_LIMITS = {'name': 200, 'email': 254, 'phone': 50, 'message': 5000}
+
+def validate_contact(data):
+    for field in ('name', 'email', 'message'):
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f'{field} is required'
+    if '@' not in data['email']:
+        return 'Invalid email address'
+    if data.get('phone') is not None and not isinstance(data['phone'], str):
+        return 'Invalid phone number'
+    for field, limit in CONTACT_LIMITS.items():
+        if len(data.get(field) or '') > limit:
+            return f'{field} is too long (max {limit} characters)'
+    return None
+
 @app.route('/api/contact', methods=['POST'])
+@rate_limited('contact')
 def submit_contact():
-    data = request.get_json()
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
+    data = request.get_json(silent=True) or {}
+    error = validate_contact(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    # Queued submissions are inserted in batches by the contact queue's flusher
+    if contact_queue is not None:
+        contact_queue.submit(data['name'], data['email'], data.get('phone'), data['message'])
+        return jsonify({'message': 'Message received'}), 202
+    
+    conn = get_db(write=True)
+    conn.execute('''
         INSERT INTO contact_messages (name, email, phone, message)
         VALUES (?, ?, ?, ?)
     ''', (data.get('name'), data.get('email'), data.get('phone'), data.get('message')))
-    conn.commit()
-    conn.close()
+    commit_changes(conn, 'contact_messages')
     return jsonify({'message': 'Message sent successfully'}), 201
 
+INBOX_QUERY = 'SELECT * FROM contact_messages ORDER BY created_at DESC'
+
 @app.route('/api/contact', methods=['GET'])
 @jwt_required()
 def get_contact_messages():
+    try:
+        page = parse_page_args(CONTACT_FIELDS, CONTACT_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM contact_messages ORDER BY created_at DESC')
-    rows = cursor.fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+    if page:
+        return fetch_page(conn, 'contact_messages', None, page)
+    
+    # The inbox can be large: stream it rather than building the whole list in memory
+    return stream_response(INBOX_QUERY)
 
 @app.route('/api/contact/<int:message_id>/read', methods=['PUT'])
 @jwt_required()
 def mark_message_read(message_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE contact_messages SET is_read = 1 WHERE id = ?', (message_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('UPDATE contact_messages SET is_read = 1 WHERE id = ?', (message_id,))
+    commit_changes(conn, 'contact_messages')
     return jsonify({'message': 'Message marked as read'})
 
 @app.route('/api/contact/<int:message_id>', methods=['DELETE'])
 @jwt_required()
 def delete_message(message_id):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM contact_messages WHERE id = ?', (message_id,))
-    conn.commit()
-    conn.close()
+    conn = get_db(write=True)
+    conn.execute('DELETE FROM contact_messages WHERE id = ?', (message_id,))
+    commit_changes(conn, 'contact_messages')
     return jsonify({'message': 'Message deleted successfully'})
 
 # ==================== FILE UPLOAD ROUTES ====================
@@ -607,21 +1478,473 @@ def upload_file():
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    filename = secure_filename(file.filename)
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], 'images', unique_filename)
-    file.save(filepath)
+    # The raw upload only lives in tmp/: what gets published are the re-encoded variants,
+    # named after the hash of the upload so identical files are stored once
+    tmp_path = os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', uuid.uuid4().hex)
+    file.save(tmp_path)
+    try:
+        stem, result = image_pipeline.ingest(tmp_path)
+    except ImageTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except InvalidImage as e:
+        return jsonify({'error': str(e)}), 400
+    except ImageBusy as e:
+        response = jsonify({'error': f'{e}, please try again'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    finally:
+        os.unlink(tmp_path)
+    
+    variants = {}
+    for name, variant in result['variants'].items():
+        variants[name] = {'width': variant['width'], 'height': variant['height']}
+        for fmt, variant_file in variant['files'].items():
+            variants[name][fmt] = f'/uploads/images/{variant_file}'
     
+    full_jpeg = result['variants']['full']['files']['jpeg']
     return jsonify({
-        'filename': unique_filename,
-        'url': f'/uploads/images/{unique_filename}'
+        'filename': full_jpeg,
+        'url': f'/uploads/images/{full_jpeg}',
+        'width': result['width'],
+        'height': result['height'],
+        'placeholder': result['placeholder'],
+        'variants': variants,
+        'deduplicated': result['deduplicated']
     })
 
 @app.route('/uploads/images/<filename>')
 def serve_image(filename):
-    return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], 'images'), filename)
+    path = safe_join(IMAGES_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'Not found'}), 404
+    
+    # Let nginx stream the bytes itself when it fronts the app
+    accel_prefix = app.config['UPLOADS_ACCEL_REDIRECT']
+    if accel_prefix:
+        response = app.response_class(mimetype=mimetypes.guess_type(filename)[0])
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + filename
+    else:
+        # conditional=True gives If-None-Match / Range handling; the file body goes
+        # through wsgi.file_wrapper, i.e. sendfile() under gunicorn
+        response = send_from_directory(IMAGES_DIR, filename, conditional=True,
+                                       etag=os.path.splitext(filename)[0],
+                                       max_age=app.config['IMAGE_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.max_age = app.config['IMAGE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+# ==================== BULK IMPORT / EXPORT ====================
+
+# table -> (key columns identifying a row, columns clients may write)
+BULK_TABLES = {
+    'site_content': (('section', 'key'), ('section', 'key', 'value', 'type')),
+    'services': (('id',), ('title', 'description', 'icon', 'color', 'order_num', 'is_active')),
+    'projects': (('id',), ('title', 'description', 'image', 'location', 'date', 'weight',
+                           'order_num', 'is_active')),
+    'testimonials': (('id',), ('name', 'position', 'content', 'image', 'rating', 'order_num', 'is_active')),
+    'news': (('id',), ('title', 'excerpt', 'content', 'image', 'category', 'author', 'date',
+                       'is_featured', 'is_active')),
+}
+# table -> column set to the current time on every write, as the single-row routes do
+BULK_TIMESTAMPS = {'site_content': 'updated_at'}
+BULK_TABLE_RULE = 'any(' + ', '.join(BULK_TABLES) + '):table'
+BULK_MAX_ROWS = 5000
+IMPORT_BATCH_SIZE = 500
+
+def _grouped(rows, key=lambda row: tuple(sorted(row))):
+    """Split rows into runs sharing the same column set, so each run is one executemany."""
+    groups = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups.items()
+
+def apply_bulk(conn, table, create=(), update=(), delete=()):
+    """Apply creates, updates and deletes with executemany; returns affected row counts."""
+    keys, _ = BULK_TABLES[table]
+    counts = {'created': 0, 'updated': 0, 'deleted': 0}
+    
+    for columns, rows in _grouped(create):
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        counts['created'] += conn.executemany(sql, [[r[c] for c in columns] for r in rows]).rowcount
+    
+    stamp = BULK_TIMESTAMPS.get(table)
+    for columns, rows in _grouped(update, key=lambda row: tuple(sorted(c for c in row if c not in keys))):
+        where = ' AND '.join(f'{k} = ?' for k in keys)
+        assignments = [f'{c} = ?' for c in columns]
+        touched = [datetime.now()] if stamp and stamp not in columns else []
+        if touched:
+            assignments.append(f'{stamp} = ?')
+        sql = f"UPDATE {table} SET {', '.join(assignments)} WHERE {where}"
+        params = [[r[c] for c in columns] + touched + [r[k] for k in keys] for r in rows]
+        counts['updated'] += conn.executemany(sql, params).rowcount
+    
+    if delete:
+        where = ' AND '.join(f'{k} = ?' for k in keys)
+        counts['deleted'] += conn.executemany(f'DELETE FROM {table} WHERE {where}',
+                                              [[r[k] for k in keys] for r in delete]).rowcount
+    return counts
+
+def non_scalar_columns(row):
+    """Columns holding objects or arrays, which no column type can store."""
+    return [c for c, v in row.items() if v is not None and not isinstance(v, (str, int, float))]
+
+def parse_bulk(table, data):
+    """Validate a {create, update, delete} payload; raises ValueError describing the first problem."""
+    keys, writable = BULK_TABLES[table]
+    if not isinstance(data, dict):
+        raise ValueError('Expected an object with create, update and/or delete arrays')
+    
+    ops = {}
+    for op in ('create', 'update', 'delete'):
+        items = data.get(op) or []
+        if not isinstance(items, list):
+            raise ValueError(f'{op} must be an array')
+        ops[op] = items
+    if sum(len(items) for items in ops.values()) > BULK_MAX_ROWS:
+        raise ValueError(f'At most {BULK_MAX_ROWS} rows per request')
+    
+    # Deletes of single-key tables may be given as bare ids
+    if len(keys) == 1:
+        ops['delete'] = [item if isinstance(item, dict) else {keys[0]: item} for item in ops['delete']]
+    
+    for op, items in ops.items():
+        allowed = writable if op == 'create' else set(writable) | set(keys)
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or not item:
+                raise ValueError(f'{op}[{i}] must be a non-empty object')
+            unknown = [c for c in item if c not in allowed]
+            if unknown:
+                raise ValueError(f"{op}[{i}]: unknown columns {', '.join(unknown)}")
+            nested = non_scalar_columns(item)
+            if nested:
+                raise ValueError(f"{op}[{i}]: {', '.join(nested)} must be a string, number, boolean or null")
+            if op != 'create' and any(item.get(k) is None for k in keys):
+                raise ValueError(f"{op}[{i}] must include {', '.join(keys)}")
+            if op == 'update' and not any(c not in keys for c in item):
+                raise ValueError(f'update[{i}] has no columns to change')
+    return ops
+
+@app.route(f'/api/<{BULK_TABLE_RULE}>/bulk', methods=['POST'])
+@jwt_required()
+def bulk_change(table):
+    try:
+        ops = parse_bulk(table, request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    conn = get_db(write=True)
+    try:
+        counts = apply_bulk(conn, table, ops['create'], ops['update'], ops['delete'])
+    except INTEGRITY_ERRORS as e:
+        conn.rollback()
+        return jsonify({'error': f'Constraint violation: {e}'}), 400
+    commit_changes(conn, table)
+    return jsonify(counts)
+
+@app.route(f'/api/<{BULK_TABLE_RULE}>/export', methods=['GET'])
+@jwt_required()
+def export_table(table):
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in STREAM_FORMATS:
+        return jsonify({'error': 'format must be one of ' + ', '.join(STREAM_FORMATS)}), 400
+    keys, _ = BULK_TABLES[table]
+    response = stream_response(f"SELECT * FROM {table} ORDER BY {', '.join(keys)}", fmt=fmt)
+    response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+    return response
 
-from flask import send_from_directory
+def read_import_rows(fmt):
+    """Rows of the request body, parsed line by line from the input stream."""
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                raise ValueError(f'Line {reader.line_num} has more fields than the header')
+            yield {k: (v if v != '' else None) for k, v in row.items()}
+        return
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                raise ValueError(f'Line {number} is not valid JSON')
+            if not isinstance(row, dict):
+                raise ValueError(f'Line {number} is not a JSON object')
+            yield row
+
+def import_batch(conn, table, columns, rows):
+    """Insert rows, or update them in place when they carry an existing key."""
+    keys, _ = BULK_TABLES[table]
+    values = [[row.get(c) for c in columns] for row in rows]
+    stamp = BULK_TIMESTAMPS.get(table)
+    if stamp and stamp not in columns:
+        now = datetime.now()
+        columns = tuple(columns) + (stamp,)
+        values = [row + [now] for row in values]
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    updates = [c for c in columns if c not in keys and c != 'id']
+    if all(k in columns for k in keys) and updates:
+        sql += (f" ON CONFLICT({', '.join(keys)}) DO UPDATE SET "
+                + ', '.join(f'{c} = excluded.{c}' for c in updates))
+    conn.executemany(sql, values)
+
+def import_batches(rows):
+    """Runs of consecutive rows with the same columns, at most IMPORT_BATCH_SIZE long."""
+    batch, columns = [], None
+    for row in rows:
+        if batch and (tuple(row) != columns or len(batch) >= IMPORT_BATCH_SIZE):
+            yield columns, batch
+            batch = []
+        columns = tuple(row)
+        batch.append(row)
+    if batch:
+        yield columns, batch
+
+def spool_import_rows(fmt, allowed, spool):
+    """Check each row of the request body and write it to spool as a JSON line; returns the row count.
+    
+    Raises ValueError describing the first bad row. One row is held in memory at a time.
+    """
+    count = 0
+    for count, row in enumerate(read_import_rows(fmt), 1):
+        unknown = [c for c in row if c not in allowed]
+        if unknown:
+            raise ValueError(f"Row {count}: unknown columns {', '.join(unknown)}")
+        nested = non_scalar_columns(row)
+        if nested:
+            raise ValueError(f"Row {count}: {', '.join(nested)} must be a string, number, boolean or null")
+        spool.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+    return count
+
+def spooled_rows(spool):
+    spool.seek(0)
+    for line in spool:
+        yield json.loads(line)
+
+@app.route(f'/api/<{BULK_TABLE_RULE}>/import', methods=['POST'])
+@jwt_required()
+def import_table(table):
+    fmt = 'csv' if request.mimetype == 'text/csv' or request.args.get('format') == 'csv' else 'ndjson'
+    # Any column of the table is accepted, so an export can be imported back unchanged
+    allowed = {d[0] for d in get_db().execute(f'SELECT * FROM {table} LIMIT 0').description}
+    
+    # The body is checked and copied to a temp file before the writer is taken: a slow
+    # upload must not hold the single writer (and an open transaction) while it trickles in
+    with tempfile.TemporaryFile(prefix='lfc-import-') as spool:
+        try:
+            count = spool_import_rows(fmt, allowed, spool)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Everything goes in one transaction, sent to the database IMPORT_BATCH_SIZE rows at a time
+        conn = get_db(write=True)
+        try:
+            for columns, batch in import_batches(spooled_rows(spool)):
+                import_batch(conn, table, columns, batch)
+        except INTEGRITY_ERRORS as e:
+            conn.rollback()
+            return jsonify({'error': f'Constraint violation: {e}'}), 400
+    
+    commit_changes(conn, table)
+    return jsonify({'imported': count})
+
+# ==================== SEARCH ====================
+
+# ?type= values -> searched tables; messages are only searched for signed-in admins
+SEARCH_TYPES = {'news': 'news', 'projects': 'projects', 'messages': 'contact_messages'}
+PUBLIC_SEARCH_TYPES = ('news', 'projects')
+
+@app.route('/api/search', methods=['GET'])
+def search_content():
+    if storage.dialect != 'sqlite':
+        return jsonify({'error': 'Search is only available with SQLite'}), 501
+    
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    
+    verify_jwt_in_request(optional=True)
+    signed_in = get_jwt_identity() is not None
+    
+    types = [t.strip() for t in request.args.get('type', '').split(',') if t.strip()]
+    if not types:
+        types = list(SEARCH_TYPES) if signed_in else list(PUBLIC_SEARCH_TYPES)
+    unknown = [t for t in types if t not in SEARCH_TYPES]
+    if unknown:
+        return jsonify({'error': 'Unknown type: ' + ', '.join(unknown)}), 400
+    if not signed_in and any(t not in PUBLIC_SEARCH_TYPES for t in types):
+        return jsonify({'error': 'Authentication required to search messages'}), 401
+    
+    try:
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    
+    results, has_more = search(get_db(), [SEARCH_TYPES[t] for t in types], q, limit, offset)
+    names = {table: name for name, table in SEARCH_TYPES.items()}
+    for result in results:
+        result['type'] = names[result['type']]
+    return jsonify({
+        'results': results,
+        'limit': limit,
+        'offset': offset,
+        'next_offset': offset + limit if has_more else None,
+    })
+
+# ==================== CHANGE FEED ====================
+
+DEFAULT_CHANGES_LIMIT = 100
+MAX_CHANGES_LIMIT = 500
+
+def parse_since(value):
+    if value is None or value == '':
+        return None
+    if not value.isdigit():
+        raise ValueError('since must be a change sequence number')
+    return int(value)
+
+def changes_gone():
+    return jsonify({'error': 'Changes before this point are no longer kept; reload the tables',
+                    'reload': True}), 410
+
+@app.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    """Row deltas after since; without since, only the cursor to start from."""
+    try:
+        since = parse_since(request.args.get('since'))
+        limit = min(max(int(request.args.get('limit', DEFAULT_CHANGES_LIMIT)), 1), MAX_CHANGES_LIMIT)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with get_db().read_snapshot() as conn:
+        oldest, head = change_bounds(conn)
+        if since is None:
+            return jsonify({'changes': [], 'next': head, 'has_more': False})
+        if is_gone(since, oldest, head):
+            return changes_gone()
+        changes, has_more = read_changes(conn, since, limit)
+    return jsonify({'changes': changes, 'next': changes[-1]['seq'] if changes else since, 'has_more': has_more})
+
+def stream_changes(cursor):
+    """Server-sent events from the shared hub; falls back to the table when it lags behind."""
+    heartbeat = app.config['CHANGES_HEARTBEAT']
+    deadline = time.monotonic() + app.config['CHANGES_STREAM_TIMEOUT']
+    change_hub.subscribe()
+    try:
+        yield b'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            events = change_hub.wait(cursor, heartbeat)
+            if events is None:
+                conn = storage.acquire()
+                try:
+                    oldest, head = change_bounds(conn)
+                    if is_gone(cursor, oldest, head):
+                        yield b'event: reload\ndata: {}\n\n'
+                        return
+                    changes, _ = read_changes(conn, cursor, MAX_CHANGES_LIMIT)
+                finally:
+                    storage.release(conn)
+                events = [(delta['seq'], sse_event(delta, app.json.dumpb)) for delta in changes]
+            if not events:
+                yield b': keepalive\n\n'
+            for seq, event in events:
+                yield event
+                cursor = seq
+    finally:
+        change_hub.unsubscribe()
+
+@app.route('/api/changes/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])  # EventSource cannot set headers: ?jwt=<token>
+def get_change_stream():
+    try:
+        since = parse_since(request.headers.get('Last-Event-ID') or request.args.get('since'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    oldest, head = change_bounds(get_db())
+    if since is None:
+        since = head
+    elif is_gone(since, oldest, head):
+        return changes_gone()
+    return Response(stream_changes(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# ==================== RETENTION ====================
+
+ARCHIVE_FIELDS = CONTACT_FIELDS + ('archived_at',)
+ARCHIVE_LIST_FIELDS = tuple(f for f in ARCHIVE_FIELDS if f != 'message')
+
+def run_maintenance(force=False):
+    """Archive old read messages in batches, then compact; None if another worker ran it recently."""
+    conn = storage.acquire(write=True)
+    try:
+        claimed = claim_run(conn, 'contact-retention', app.config['MAINTENANCE_INTERVAL']) or force
+    finally:
+        storage.release(conn)
+    if not claimed:
+        return None
+    
+    archived = 0
+    if app.config['CONTACT_RETENTION_DAYS'] > 0:
+        cutoff = retention_cutoff(app.config['CONTACT_RETENTION_DAYS'])
+        batch_size = app.config['ARCHIVE_BATCH_SIZE']
+        while True:
+            # One transaction per batch, so request writes get the writer in between
+            conn = storage.acquire(write=True)
+            try:
+                moved = archive_batch(conn, cutoff, batch_size)
+                if moved:
+                    commit_changes(conn, 'contact_messages')
+            finally:
+                storage.release(conn)
+            archived += moved
+            if moved < batch_size:
+                break
+            time.sleep(0.01)
+    
+    conn = storage.acquire(write=True)
+    try:
+        if storage.dialect == 'sqlite':
+            result = compact_sqlite(conn, app.config['MAINTENANCE_VACUUM_PAGES'])
+        else:
+            # Autovacuum reclaims space on PostgreSQL; refresh the statistics after the move
+            conn.execute('ANALYZE contact_messages')
+            conn.execute('ANALYZE contact_messages_archive')
+            conn.commit()
+            result = {}
+    finally:
+        storage.release(conn)
+    if archived:
+        app.logger.info('Archived %d contact messages older than %d days',
+                        archived, app.config['CONTACT_RETENTION_DAYS'])
+    return dict(result, archived=archived)
+
+maintenance = None
+if app.config['MAINTENANCE_INTERVAL'] > 0:
+    maintenance = MaintenanceScheduler(run_maintenance, check_interval=min(300, app.config['MAINTENANCE_INTERVAL']),
+                                       logger=app.logger)
+    metrics.collect('lfc_maintenance', maintenance.stats, counters=('runs', 'failures', 'archived', 'freed_pages'))
+
+@app.before_request
+def start_maintenance():
+    # Started by the first request rather than on import: preloading servers fork after import
+    if maintenance is not None:
+        maintenance.start()
+
+@app.route('/api/contact/archive', methods=['GET'])
+@jwt_required()
+def get_archived_messages():
+    try:
+        page = parse_page_args(ARCHIVE_FIELDS, ARCHIVE_LIST_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # Always paged: the archive is the large table
+    page = page or (list(ARCHIVE_LIST_FIELDS), None, DEFAULT_PAGE_SIZE)
+    return fetch_page(get_db(), 'contact_messages_archive', None, page)
 
 # ==================== DASHBOARD STATS ====================
 
@@ -629,30 +1952,203 @@ from flask import send_from_directory
 @jwt_required()
 def get_stats():
     conn = get_db()
-    cursor = conn.cursor()
-    
-    stats = {}
+    if storage.dialect == 'sqlite':
+        # Maintained by triggers, see counter_triggers()
+        row = conn.execute(f"SELECT {', '.join(COUNTERS)} FROM dashboard_counters WHERE id = 1").fetchone()
+    else:
+        row = conn.execute(COUNTERS_QUERY).fetchone()
+    return jsonify(dict(row))
+
+@app.route('/api/stats/rebuild', methods=['POST'])
+@jwt_required()
+def rebuild_stats():
+    if storage.dialect != 'sqlite':
+        return jsonify({'error': 'Counters are computed on every request for this database'}), 501
+    conn = get_db(write=True)
+    drift = rebuild_counters(conn)
+    conn.commit()
+    return jsonify({'drift': {name: {'stored': stored, 'actual': actual}
+                              for name, (stored, actual) in drift.items()}})
+
+@app.route('/api/stats/db', methods=['GET'])
+@jwt_required()
+def get_db_stats():
+    return jsonify(storage.stats())
+
+@app.route('/api/stats/cache', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    return jsonify(cache.stats())
+
+@app.route('/api/stats/passwords', methods=['GET'])
+@jwt_required()
+def get_password_stats():
+    return jsonify(password_hasher.stats())
+
+@app.route('/api/stats/rate-limits', methods=['GET'])
+@jwt_required()
+def get_rate_limit_stats():
+    return jsonify(rate_limiter.stats())
+
+@app.route('/api/stats/changes', methods=['GET'])
+@jwt_required()
+def get_change_feed_stats():
+    return jsonify(change_hub.stats())
+
+@app.route('/api/stats/maintenance', methods=['GET'])
+@jwt_required()
+def get_maintenance_stats():
+    if maintenance is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(maintenance.stats(), enabled=True))
+
+@app.route('/api/stats/contact-queue', methods=['GET'])
+@jwt_required()
+def get_contact_queue_stats():
+    if contact_queue is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(contact_queue.stats(), enabled=True))
+
+# ==================== CLI COMMANDS ====================
+
+class RecordingConnection:
+    """Passes statements through to conn and keeps them, so their plans can be checked."""
     
-    cursor.execute('SELECT COUNT(*) as count FROM services WHERE is_active = 1')
-    stats['services'] = cursor.fetchone()['count']
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = {}  # sql -> params of its first run
     
-    cursor.execute('SELECT COUNT(*) as count FROM projects WHERE is_active = 1')
-    stats['projects'] = cursor.fetchone()['count']
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
     
-    cursor.execute('SELECT COUNT(*) as count FROM testimonials WHERE is_active = 1')
-    stats['testimonials'] = cursor.fetchone()['count']
+    def execute(self, sql, params=()):
+        self.statements.setdefault(sql, tuple(params))
+        return self.conn.execute(sql, params)
+
+def list_statements(conn):
+    """Run the list, page and detail reads once and return the statements they issued.
     
-    cursor.execute('SELECT COUNT(*) as count FROM news WHERE is_active = 1')
-    stats['news'] = cursor.fetchone()['count']
+    The statements are captured from the read helpers themselves, so the plan check
+    follows any change to load_active, fetch_page or load_detail.
+    """
+    recorder = RecordingConnection(conn)
+    oldest = ('9999-12-31 23:59:59', 0)  # a cursor, so the keyset condition is part of the query
+    with app.test_request_context():
+        for table in ('services', 'projects', 'testimonials'):
+            load_active(recorder, table, 'order_num')
+        load_active(recorder, 'news', 'created_at DESC')
+        load_bootstrap_part(recorder, 'news')
+        fetch_page(recorder, 'news', 'is_active = 1', (list(NEWS_LIST_FIELDS), oldest, DEFAULT_PAGE_SIZE))
+        fetch_page(recorder, 'contact_messages', None, (list(CONTACT_LIST_FIELDS), oldest, DEFAULT_PAGE_SIZE))
+        fetch_page(recorder, 'contact_messages_archive', None,
+                   (list(ARCHIVE_LIST_FIELDS), oldest, DEFAULT_PAGE_SIZE))
+        for table in DETAILS:
+            # prev/next/related only run for an existing item
+            row = conn.execute(f'SELECT id FROM {table} WHERE is_active = 1 LIMIT 1').fetchone()
+            load_detail(recorder, table, row['id'] if row else 0)
+    recorder.statements.setdefault(INBOX_QUERY, ())
+    return recorder.statements
+
+def query_plans(conn):
+    """(sql, plan lines, whether it sorts in a temp B-tree) for every statement of list_statements()."""
+    for sql, params in list_statements(conn).items():
+        plan = [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        yield sql, plan, any('TEMP B-TREE' in detail for detail in plan)
+
+@app.cli.command('check-query-plans')
+def check_query_plans():
+    """Fail if a list query needs a temp B-tree sort."""
+    if storage.dialect != 'sqlite':
+        raise SystemExit('check-query-plans only supports SQLite')
     
-    cursor.execute('SELECT COUNT(*) as count FROM contact_messages WHERE is_read = 0')
-    stats['unread_messages'] = cursor.fetchone()['count']
+    conn = storage.acquire()
+    failed = False
+    try:
+        for sql, plan, sorts in query_plans(conn):
+            failed = failed or sorts
+            click.echo(('SORT  ' if sorts else 'OK    ') + ' '.join(sql.split()))
+            for detail in plan:
+                click.echo('      ' + detail)
+    finally:
+        storage.release(conn)
     
-    cursor.execute('SELECT COUNT(*) as count FROM contact_messages')
-    stats['total_messages'] = cursor.fetchone()['count']
+    if failed:
+        raise SystemExit(1)
+
+@app.cli.command('migrate')
+@click.option('--status', is_flag=True, help='Only show the current and latest schema version.')
+def migrate_command(status):
+    """Apply pending schema migrations."""
+    conn = storage.acquire()
+    try:
+        current = read_schema_version(conn)
+    finally:
+        storage.release(conn)
+    if status:
+        click.echo(f'Schema version {current}, latest {SCHEMA_VERSION}')
+        for version, description, _ in MIGRATIONS:
+            click.echo(f"  {'applied' if version <= current else 'pending'}  {version:>3}  {description}")
+        return
+    applied = migrate_schema()
+    for version, description in applied:
+        click.echo(f'Applied {version}: {description}')
+    if not applied:
+        click.echo(f'Schema is up to date (version {current})')
+
+@app.cli.command('rebuild-counters')
+@click.option('--check', is_flag=True, help='Only report drift; exit 1 if the counters are wrong.')
+def rebuild_counters_command(check):
+    """Recompute the dashboard counters from the tables (SQLite only)."""
+    if storage.dialect != 'sqlite':
+        raise SystemExit('rebuild-counters only supports SQLite')
+    conn = storage.acquire(write=True)
+    try:
+        drift = rebuild_counters(conn)
+        if check:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        storage.release(conn)
+    for name, (stored, actual) in drift.items():
+        click.echo(f'{name}: stored {stored}, actual {actual}')
+    if not drift:
+        click.echo('Counters are consistent')
+    elif check:
+        raise SystemExit(1)
+
+@app.cli.command('maintain')
+@click.option('--full', is_flag=True, help='Run a full VACUUM first (SQLite; needed once for older databases).')
+def maintain_command(full):
+    """Archive old read contact messages and compact the database now."""
+    if full and storage.dialect == 'sqlite':
+        conn = storage.acquire(write=True)
+        try:
+            # Switches an older database to incremental auto-vacuum as part of the rebuild
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('VACUUM')
+        finally:
+            storage.release(conn)
+        click.echo('Database vacuumed')
+    result = run_maintenance(force=True)
+    click.echo(f"Archived {result['archived']} messages" +
+               (f", {result['freed_pages']} pages freed" if 'freed_pages' in result else ''))
+
+@app.cli.command('export-snapshot')
+@click.option('--dir', 'directory', help='Output directory (defaults to SNAPSHOT_DIR).')
+@click.option('--tables', help='Comma-separated tables to regenerate (default: tables that changed).')
+@click.option('--force', is_flag=True, help='Regenerate every table.')
+def export_snapshot(directory, tables, force):
+    """Render the public API to pre-compressed static JSON files."""
+    directory = directory or app.config['SNAPSHOT_DIR']
+    if not directory:
+        raise click.UsageError('Pass --dir or set SNAPSHOT_DIR')
     
-    conn.close()
-    return jsonify(stats)
+    exporter = SnapshotExporter(app, storage, directory)
+    tables = [t.strip() for t in tables.split(',')] if tables else None
+    result = exporter.export(tables, force=force)
+    click.echo(f"Tables: {', '.join(result['tables']) or 'none changed'}; "
+               f"{result['files']} files rendered, {result['written']} written to {directory}")
 
 # ==================== ERROR HANDLERS ====================
 
@@ -664,8 +2160,12 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
 
-# Initialize database on startup
-init_db()
+# Workers only compare schema versions on boot; migrations run once, under a lock
+check_schema()
+
+if contact_queue is not None:
+    contact_queue.start()
+    atexit.register(contact_queue.flush)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
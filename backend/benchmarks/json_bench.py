@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON response path.
+Compares Flask's default provider (stdlib json, ASCII escaping) with
+FastJSONProvider on stdlib json and on orjson, using payloads shaped like
+/api/news and /api/bootstrap with Arabic text.
+
+    python benchmarks/json_bench.py [--rows 200] [--repeat 200]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from jsonprovider import FastJSONProvider, orjson
+
+ARABIC = 'تستورد الشركة الليبية للأغذية القمح والدقيق والزيوت من أفضل المصادر العالمية. '
+
+
+def news_rows(count):
+    start = datetime(2024, 1, 1, 9, 30)
+    return [{
+        'id': i,
+        'title': f'شحنة القمح رقم {i}',
+        'excerpt': ARABIC * 2,
+        'content': ARABIC * 30,
+        'image': f'/uploads/images/{i:032x}-full.jpg',
+        'category': 'أخبار',
+        'author': 'فريق التحرير',
+        'date': '2024-01-01',
+        'is_featured': i % 5 == 0,
+        'is_active': 1,
+        'created_at': (start + timedelta(hours=i)).strftime('%Y-%m-%d %H:%M:%S'),
+    } for i in range(count)]
+
+
+def bootstrap_payload(count):
+    content = {f'section{s}': {f'key{k}': {'value': ARABIC * 3, 'type': 'text',
+                                           'updated_at': '2024-01-01 09:30:00'}
+                               for k in range(10)} for s in range(8)}
+    rows = news_rows(count)
+    return {'content': content, 'news': rows[:6], 'services': rows[:6],
+            'projects': rows[:8], 'testimonials': rows[:6]}
+
+
+def bench(name, provider, payload, repeat):
+    body = provider(payload)
+    seconds = min(timeit.repeat(lambda: provider(payload), number=repeat, repeat=3)) / repeat
+    return {'name': name, 'us': seconds * 1e6, 'bytes': len(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=200, help='news rows in the list payload')
+    parser.add_argument('--repeat', type=int, default=200, help='encodings per timing run')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    providers = [('flask default', DefaultJSONProvider(app)),
+                 ('fast (stdlib)', FastJSONProvider(app, use_orjson=False))]
+    if orjson is not None:
+        providers.append(('fast (orjson)', FastJSONProvider(app)))
+    else:
+        print('orjson is not installed; only the stdlib paths are measured\n')
+
+    payloads = [('news list', news_rows(args.rows)), ('bootstrap', bootstrap_payload(args.rows))]
+    with app.app_context():
+        for label, payload in payloads:
+            print(f'{label}:')
+            baseline = None
+            for name, provider in providers:
+                result = bench(name, lambda obj, p=provider: p.response(obj).get_data(), payload, args.repeat)
+                baseline = baseline or result
+                print(f"  {name:<15} {result['us']:>10.1f} us  {result['bytes']:>9,} bytes"
+                      f"  x{baseline['us'] / result['us']:.1f} speed  x{baseline['bytes'] / result['bytes']:.2f} smaller")
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Load test and latency benchmark for the API.
+Seeds a throwaway database (schema migrations plus generated rows), then fires each
+scenario at the app with concurrent clients, through the Flask test client
+and/or a real threaded WSGI server, and reports p50/p95/p99 latency,
+throughput and RSS per scenario. Results are written as JSON so two runs
+(e.g. two commits) can be compared.
+
+    python benchmarks/load_test.py --messages 100000 --news 10000 --output before.json
+    python benchmarks/load_test.py --messages 100000 --news 10000 --compare before.json
+"""
+
+import argparse
+import http.client
+import io
+import json
+import logging
+import math
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ARABIC = 'تستورد الشركة الليبية للأغذية القمح والدقيق والزيوت من أفضل المصادر العالمية. '
+WORDS = ['قمح', 'دقيق', 'زيت', 'شحنة', 'ميناء', 'طرابلس', 'بنغازي', 'مستودع', 'جودة', 'توريد']
+
+# name -> group, method, path, admin only, requests (None = --requests)
+SCENARIOS = {
+    'bootstrap': ('public reads', 'GET', '/api/bootstrap', False, None),
+    'content': ('public reads', 'GET', '/api/content', False, None),
+    'news_list': ('public reads', 'GET', '/api/news', False, None),
+    'news_page': ('public reads', 'GET', '/api/news?limit=20', False, None),
+    'search': ('public reads', 'GET', '/api/search?q=' + quote('شحنة'), False, None),
+    'inbox_page': ('admin reads', 'GET', '/api/contact?limit=50', True, None),
+    'inbox_full': ('admin reads', 'GET', '/api/contact', True, 5),
+    'stats': ('admin reads', 'GET', '/api/stats', True, None),
+    'login': ('logins', 'POST', '/api/auth/login', False, 50),
+    'upload': ('uploads', 'POST', '/api/upload', True, 20),
+    'contact_burst': ('contact bursts', 'POST', '/api/contact', False, None),
+}
+
+
+# ---------- setup ----------
+
+def load_app(workdir):
+    """Import the app against a fresh database in workdir (migrated on import).
+
+    DATABASE_URL is always overridden: seeding writes generated rows, so it
+    must never reach a database exported in the calling shell.
+    """
+    os.chdir(workdir)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ['CONTACT_SPOOL_DIR'] = os.path.join(workdir, 'spool')
+    # The benchmark measures the endpoints, not the limiter
+    os.environ['RATE_LIMIT_LOGIN'] = '1000000/second'
+    os.environ['RATE_LIMIT_CONTACT'] = '1000000/second'
+    import app as api
+    return api
+
+
+def seed(api, messages, news, content):
+    started = time.perf_counter()
+    rng = random.Random(42)
+    base = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    def stamp(i, total):
+        return (base + timedelta(seconds=i * 86400 * 365 // max(total, 1))).strftime('%Y-%m-%d %H:%M:%S')
+
+    def text(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    conn = api.storage.acquire(write=True)
+    try:
+        conn.executemany('''
+            INSERT INTO news (title, excerpt, content, category, author, date, is_featured, is_active, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ((f'{text(4)} {i}', text(20), ARABIC * 8 + text(60), 'أخبار', 'فريق التحرير',
+               stamp(i, news)[:10], int(i % 50 == 0), int(i % 10 != 0), stamp(i, news))
+              for i in range(news)))
+        conn.executemany('''
+            INSERT INTO contact_messages (name, email, phone, message, is_read, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', ((f'عميل {i}', f'client{i}@example.com', '+218910000000', text(40),
+               int(rng.random() < 0.7), stamp(i, messages)) for i in range(messages)))
+        conn.executemany('''
+            INSERT INTO site_content (section, key, value, type) VALUES (?, ?, ?, 'text')
+            ON CONFLICT(section, key) DO NOTHING
+        ''', ((f'bench{i // 50}', f'key{i % 50}', ARABIC * 3) for i in range(content)))
+        api.commit_changes(conn, 'news', 'contact_messages', 'site_content')
+    finally:
+        api.storage.release(conn)
+    return time.perf_counter() - started
+
+
+def png_bytes(seed_value, size=(640, 480)):
+    from PIL import Image
+    rng = random.Random(seed_value)
+    image = Image.new('RGB', size)
+    image.putdata([(rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                   for _ in range(size[0] * size[1] // 64)] * 64)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def multipart(field, filename, data, content_type):
+    boundary = uuid.uuid4().hex
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def build_requests(name, count, token, run_id):
+    """(body, headers) for every request of a scenario, built before the clock starts."""
+    _, method, path, admin, _ = SCENARIOS[name]
+    headers = {'Accept-Encoding': 'gzip, br'}
+    if admin:
+        headers['Authorization'] = f'Bearer {token}'
+
+    requests = []
+    for i in range(count):
+        body, extra = None, {}
+        if name == 'login':
+            body = json.dumps({'username': 'admin', 'password': 'admin123'}).encode()
+            extra = {'Content-Type': 'application/json'}
+        elif name == 'contact_burst':
+            body = json.dumps({'name': f'زائر {i}', 'email': f'visitor{i}@example.com',
+                               'message': ARABIC * 2}).encode()
+            extra = {'Content-Type': 'application/json'}
+        elif name == 'upload':
+            # A new image each time, so the content-hash dedup does not short-circuit the pipeline
+            body, content_type = multipart('file', f'bench-{i}.png', png_bytes(f'{run_id}-{i}'), 'image/png')
+            extra = {'Content-Type': content_type}
+        requests.append((method, path, body, {**headers, **extra}))
+    return requests
+
+
+# ---------- transports ----------
+
+class TestClientTransport:
+    name = 'test_client'
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def send(self, method, path, body, headers):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, data=body, headers=headers)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class WSGIServerTransport:
+    name = 'wsgi_server'
+
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no access log line per request
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def send(self, method, path, body, headers):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        finally:
+            conn.close()
+
+    def close(self):
+        self.server.shutdown()
+
+
+# ---------- measurement ----------
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+
+def run_scenario(transport, warmup, requests, concurrency):
+    for request in warmup:
+        transport.send(*request)
+
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(request):
+        nonlocal errors
+        started = time.perf_counter()
+        status = transport.send(*request)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, requests))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'rss_mb': rss_mb(),
+    }
+
+
+# ---------- reporting ----------
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    for mode, scenarios in results.items():
+        print(f'\n{mode}')
+        print(f"  {'scenario':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'rss MB':>8} {'err':>5}")
+        for name, r in scenarios.items():
+            line = (f"  {name:<14} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                    f"{r['throughput_rps']:>9.1f} {r['rss_mb']:>8.1f} {r['errors']:>5}")
+            old = (baseline or {}).get(mode, {}).get(name)
+            if old:
+                def delta(key):
+                    return f"{(r[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else 'n/a'
+                line += f"   p50 {delta('p50_ms')}, p95 {delta('p95_ms')}, req/s {delta('throughput_rps')}"
+            print(line)
+
+
+def run(args, names, workdir, output, compare):
+    api = load_app(workdir)
+    seconds = seed(api, args.messages, args.news, args.content)
+    print(f'Seeded {args.messages} messages, {args.news} news, {args.content} content rows '
+          f'in {seconds:.1f}s ({workdir})')
+
+    token = api.app.test_client().post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}
+                                        ).get_json()['access_token']
+    modes = {'client': [TestClientTransport], 'server': [WSGIServerTransport],
+             'both': [TestClientTransport, WSGIServerTransport]}[args.mode]
+
+    results = {}
+    for transport_class in modes:
+        transport = transport_class(api.app)
+        try:
+            results[transport.name] = {}
+            for name in names:
+                count = SCENARIOS[name][4] or args.requests
+                requests = build_requests(name, count + args.warmup, token, f'{transport.name}-{time.time()}')
+                result = run_scenario(transport, requests[:args.warmup], requests[args.warmup:], args.concurrency)
+                results[transport.name][name] = {'group': SCENARIOS[name][0], **result}
+        finally:
+            transport.close()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': api.storage.dialect,
+            'seed': {'messages': args.messages, 'news': args.news, 'content': args.content,
+                     'seconds': round(seconds, 2)},
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'peak_rss_mb': peak_rss_mb(),
+        },
+        'results': results,
+    }
+
+    baseline = None
+    if compare:
+        with open(compare, encoding='utf-8') as f:
+            old = json.load(f)
+        baseline = old['results']
+        print(f"\nCompared with {args.compare} (commit {old['meta'].get('commit')})")
+    print_results(results, baseline)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f'\nResults written to {args.output}')
+
+    if api.contact_queue is not None:
+        api.contact_queue.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Seed a temp database and load-test the API.')
+    parser.add_argument('--messages', type=int, default=100_000, help='contact_messages rows to seed')
+    parser.add_argument('--news', type=int, default=10_000, help='news rows to seed')
+    parser.add_argument('--content', type=int, default=2_000, help='extra site_content rows to seed')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed requests before each scenario')
+    parser.add_argument('--mode', choices=('client', 'server', 'both'), default='both')
+    parser.add_argument('--scenarios', help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='print changes against an earlier results file')
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(',')] if args.scenarios else list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error('unknown scenarios: ' + ', '.join(unknown))
+
+    # The app runs from the temp directory, so resolve the result paths first
+    output = os.path.abspath(args.output) if args.output else None
+    compare = os.path.abspath(args.compare) if args.compare else None
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='lfc-bench-') as workdir:
+        try:
+            run(args, names, workdir, output, compare)
+        finally:
+            os.chdir(cwd)  # leave the directory before it is removed
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Worker startup benchmark.
+Boots the app in fresh processes against an already-migrated SQLite file,
+one at a time and all at once (like a gunicorn restart), and compares the
+boot-time schema check with replaying every migration step, which is what
+each worker used to do on import.
+
+    python benchmarks/startup_bench.py [--workers 8] [--boots 5] [--repeat 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child: time the import of the app module, which performs the boot check
+BOOT = '''
+import json, sys, time
+sys.path.insert(0, {backend!r})
+started = time.perf_counter()
+import app
+print(json.dumps({{"import_ms": (time.perf_counter() - started) * 1000}}))
+'''
+
+
+def boot(env, workdir):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', BOOT.format(backend=BACKEND_DIR)], cwd=workdir, env=env,
+                            capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - started) * 1000
+    return json.loads(result.stdout.strip().splitlines()[-1])['import_ms'], wall
+
+
+def summary(values):
+    return f'median {statistics.median(values):9.3f} ms   max {max(values):9.3f} ms'
+
+
+def run(args, workdir):
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(workdir, 'startup.db'), CONTACT_QUEUE='0')
+
+    boot(env, workdir)  # creates and migrates the database
+    print(f'Database: {workdir}/startup.db\n')
+
+    sequential = [boot(env, workdir) for _ in range(args.boots)]
+    print(f'sequential boots ({args.boots}):')
+    print(f'  import   {summary([s[0] for s in sequential])}')
+    print(f'  process  {summary([s[1] for s in sequential])}')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        concurrent = list(pool.map(lambda _: boot(env, workdir), range(args.workers)))
+    wall = (time.perf_counter() - started) * 1000
+    print(f'\nconcurrent boots ({args.workers} at once, {wall:.0f} ms until all were up):')
+    print(f'  import   {summary([c[0] for c in concurrent])}')
+
+    # In-process: the check every worker now runs vs the steps every worker used to run
+    os.chdir(workdir)
+    os.environ.update(env)
+    sys.path.insert(0, BACKEND_DIR)
+    import app as api
+
+    def timed(fn):
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    def replay_migrations():
+        conn = api.storage.acquire(write=True)
+        try:
+            api.storage.lock_exclusive(conn)
+            for _, _, step in api.MIGRATIONS:
+                step(conn)
+            conn.commit()
+        finally:
+            api.storage.release(conn)
+
+    print(f'\nper boot, in process ({args.repeat} runs):')
+    print(f'  check_schema()            {summary(timed(api.check_schema))}')
+    print(f'  replay all migrations     {summary(timed(replay_migrations))}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure worker boot time.')
+    parser.add_argument('--workers', type=int, default=8, help='processes booted at the same time')
+    parser.add_argument('--boots', type=int, default=5, help='sequential boots')
+    parser.add_argument('--repeat', type=int, default=50, help='in-process repetitions of each check')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='lfc-startup-') as workdir:
+        try:
+            run(args, workdir)
+        finally:
+            os.chdir(cwd)  # leave the directory before it is removed
+
+
+if __name__ == '__main__':
+    main()
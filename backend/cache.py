@@ -0,0 +1,157 @@
+"""
+Read-through response cache for the public API.
+Entries are keyed per endpoint and query string; each key also embeds the
+version of the tables it was built from (the table_versions rows), so a
+write only has to bump a table version to invalidate everything derived
+from it, and stale entries age out of the LRU or expire.
+"""
+
+import json
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+
+BLOB = '__bytes__'
+LENGTH = struct.Struct('>I')
+
+
+def dumps(value):
+    """Encode a cache entry as JSON, with bytes values (bodies) appended raw after it.
+
+    Unlike pickle, reading an entry back cannot run code, so a shared Redis
+    that someone else can write to only yields bad data, not execution.
+    """
+    blobs = []
+
+    def default(obj):
+        if isinstance(obj, (bytes, bytearray)):
+            blobs.append(bytes(obj))
+            return {BLOB: len(blobs) - 1}
+        raise TypeError(f'Cannot cache {type(obj).__name__} values')
+
+    header = json.dumps(value, default=default, ensure_ascii=False, separators=(',', ':')).encode()
+    return b''.join([LENGTH.pack(len(header)), header] + [LENGTH.pack(len(b)) + b for b in blobs])
+
+
+def loads(raw):
+    (size,), offset = LENGTH.unpack_from(raw), LENGTH.size
+    header = raw[offset:offset + size]
+    offset += size
+    blobs = []
+    while offset < len(raw):
+        (length,), offset = LENGTH.unpack_from(raw, offset), offset + LENGTH.size
+        blobs.append(raw[offset:offset + length])
+        offset += length
+
+    def object_hook(obj):
+        return blobs[obj[BLOB]] if len(obj) == 1 and BLOB in obj else obj
+
+    return json.loads(header, object_hook=object_hook)
+
+
+class MemoryCache:
+    def __init__(self, max_entries=512, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            self._stats['sets'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        stats['backend'] = 'memory'
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class RedisCache:
+    # Shared between workers, so each response is built once per version for all of them
+    def __init__(self, url=None, ttl=300, prefix='lfc:cache:', client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError('The Redis cache backend requires the redis package')
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'sets': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        try:
+            value = loads(raw) if raw is not None else None
+        except (ValueError, LookupError, TypeError, struct.error):
+            value = None  # written by an older version, or not by us: rebuilt like a miss
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.client.setex(self.prefix + key, self.ttl if ttl is None else ttl, dumps(value))
+        self._count('sets')
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['backend'] = 'redis'
+        stats['ttl'] = self.ttl
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def create_cache(url=None, max_entries=512, ttl=300):
+    """Build the cache backend for CACHE_URL (redis://... or empty for in-process)."""
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisCache(url, ttl=ttl)
+    return MemoryCache(max_entries=max_entries, ttl=ttl)
@@ -0,0 +1,201 @@
+"""
+Change feed for the admin UI.
+Triggers append one change_log entry (table, row id, operation) per written
+row; readers page through the log by sequence number and attach the current
+row, so clients apply deltas instead of reloading whole tables. One poller
+thread per process fans new entries out to every event-stream subscriber.
+"""
+
+import threading
+import time
+from collections import deque
+
+CHANGE_OPS = ('insert', 'update', 'delete')
+ROW_CHUNK = 500
+CHANGE_LOCK_ID = 0x4C4644  # pg_advisory_xact_lock key taken by logged writes
+
+# PostgreSQL: commits must become visible in sequence order, or a reader that
+# already saw seq N+1 would skip a later-committed N; the transaction lock
+# serializes logged writes until commit.
+PG_FUNCTION = '''
+    CREATE OR REPLACE FUNCTION log_row_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock({lock_id});
+        INSERT INTO change_log (table_name, row_id, op)
+        VALUES (TG_TABLE_NAME, CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END, lower(TG_OP));
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+'''
+
+
+def change_triggers(dialect, tables):
+    """DDL that makes every insert, update and delete on tables write a change_log entry."""
+    if dialect != 'sqlite':
+        statements = [PG_FUNCTION.format(lock_id=CHANGE_LOCK_ID)]
+        for table in tables:
+            statements.append(f'DROP TRIGGER IF EXISTS {table}_change ON {table}')
+            statements.append(f'CREATE TRIGGER {table}_change AFTER INSERT OR UPDATE OR DELETE ON {table} '
+                              f'FOR EACH ROW EXECUTE FUNCTION log_row_change()')
+        return statements
+    statements = []
+    for table in tables:
+        for op in CHANGE_OPS:
+            row = 'old' if op == 'delete' else 'new'
+            statements.append(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_change_{op} AFTER {op.upper()} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{op}');
+                END
+            ''')
+    return statements
+
+
+def change_bounds(conn):
+    """(oldest retained seq or None, latest seq or 0)."""
+    row = conn.execute('SELECT MIN(seq) AS oldest, MAX(seq) AS head FROM change_log').fetchone()
+    return row['oldest'], row['head'] or 0
+
+
+def is_gone(since, oldest, head):
+    """True if entries after since were pruned, or since is ahead of the log."""
+    return since > head or (oldest is not None and since + 1 < oldest)
+
+
+def prune_changes(conn, keep):
+    conn.execute('DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?', (keep,))
+
+
+def _load_rows(conn, entries):
+    ids = {}
+    for entry in entries:
+        if entry['op'] != 'delete':
+            ids.setdefault(entry['table_name'], set()).add(entry['row_id'])
+    rows = {}
+    for table, table_ids in ids.items():
+        table_ids = sorted(table_ids)
+        for start in range(0, len(table_ids), ROW_CHUNK):
+            chunk = table_ids[start:start + ROW_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            for row in conn.execute(f'SELECT * FROM {table} WHERE id IN ({placeholders})', chunk).fetchall():
+                rows[(table, row['id'])] = dict(row)
+    return rows
+
+
+def read_changes(conn, since, limit):
+    """Deltas after since, oldest first, and whether more are waiting.
+
+    row is the row as it is now: null for deletes, and for rows deleted
+    after the change was logged.
+    """
+    entries = conn.execute('SELECT seq, table_name, row_id, op FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?',
+                           (since, limit + 1)).fetchall()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    rows = _load_rows(conn, entries)
+    return [{
+        'seq': entry['seq'],
+        'table': entry['table_name'],
+        'op': entry['op'],
+        'id': entry['row_id'],
+        'row': rows.get((entry['table_name'], entry['row_id'])),
+    } for entry in entries], has_more
+
+
+def sse_event(delta, encode):
+    return b'id: %d\nevent: change\ndata: %s\n\n' % (delta['seq'], encode(delta))
+
+
+class ChangeHub:
+    """Polls change_log once per process while anyone is subscribed.
+
+    New deltas are encoded once as server-sent events and kept in a bounded
+    buffer; subscribers only wait on a condition and copy the bytes, so a
+    subscriber costs no polling and no database connection.
+    """
+
+    def __init__(self, storage, encode, poll_interval=0.5, buffer_size=1000, batch_size=500, logger=None):
+        self.storage = storage
+        self.encode = encode
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.logger = logger
+        self.head = None
+        self._events = deque(maxlen=buffer_size)  # (seq, encoded event)
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stats = {'polls': 0, 'events': 0, 'failures': 0}
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='change-hub', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._subscribers > 0)
+            try:
+                self.poll()
+            except Exception:
+                with self._cond:
+                    self._stats['failures'] += 1
+                if self.logger:
+                    self.logger.exception('Change feed poll failed')
+            time.sleep(self.poll_interval)
+
+    def poll(self):
+        conn = self.storage.acquire()
+        try:
+            head = self.head
+            if head is None:
+                head = change_bounds(conn)[1]
+            deltas, has_more = [], True
+            while has_more:
+                batch, has_more = read_changes(conn, head, self.batch_size)
+                if batch:
+                    head = batch[-1]['seq']
+                    deltas.extend(batch)
+        finally:
+            self.storage.release(conn)
+
+        events = [(delta['seq'], sse_event(delta, self.encode)) for delta in deltas]
+        with self._cond:
+            self._events.extend(events)
+            self.head = head
+            self._stats['polls'] += 1
+            self._stats['events'] += len(events)
+            self._cond.notify_all()
+
+    def wait(self, cursor, timeout):
+        """Encoded events after cursor, [] after timeout, None if cursor is older than the buffer."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.head is not None and self.head > cursor, timeout)
+            if self.head is None or self.head <= cursor:
+                return []
+            if not self._events or self._events[0][0] > cursor + 1:
+                return None
+            events = []
+            for seq, event in reversed(self._events):
+                if seq <= cursor:
+                    break
+                events.append((seq, event))
+        events.reverse()
+        return events
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['subscribers'] = self._subscribers
+            stats['buffered'] = len(self._events)
+            stats['head'] = self.head or 0
+        stats['poll_interval'] = self.poll_interval
+        return stats
@@ -0,0 +1,61 @@
+"""
+gzip/brotli response compression.
+The encoding is negotiated from Accept-Encoding (q-values honoured, brotli
+preferred on ties); bodies below a minimum size are sent as they are.
+"""
+
+import gzip
+
+try:
+    import brotli
+except ImportError:  # only gzip is offered without it
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+# Per-request compression favours speed; cached variants are made once per
+# content version, so they can afford the slower, smaller settings
+FAST = {'gzip': 6, 'br': 4}
+BEST = {'gzip': 9, 'br': 9}
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encoding, encodings=None):
+    """The best encoding both sides accept, or None for identity."""
+    encodings = encodings or available_encodings()
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    wildcard = accepted.get('*', 0.0)
+    ranked = [(accepted.get(e, wildcard), -i, e) for i, e in enumerate(encodings)]
+    q, _, encoding = max(ranked, default=(0.0, 0, None))
+    return encoding if q > 0 else None
+
+
+def compress(body, encoding, best=False):
+    level = (BEST if best else FAST)[encoding]
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def compress_all(body, min_size):
+    """Every available encoding of body, for storing next to a cache entry."""
+    if len(body) < min_size:
+        return {}
+    return {encoding: compress(body, encoding, best=True) for encoding in available_encodings()}
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
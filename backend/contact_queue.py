@@ -0,0 +1,198 @@
+"""
+Write-behind queue for contact form submissions.
+Submissions are appended to a per-process spool file (one JSON line each) and
+a background thread moves them into contact_messages in batches, one
+transaction per batch. Spool files left behind by a crashed worker are
+replayed on startup, so delivery is at-least-once.
+"""
+
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+INSERT_SQL = '''
+    INSERT INTO contact_messages (name, email, phone, message, created_at)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+class ContactQueue:
+    def __init__(self, storage, spool_dir, batch_size=100, flush_interval=1.0,
+                 fsync=True, on_commit=None, logger=None):
+        self.storage = storage
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_commit = on_commit
+        self.logger = logger
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pid = None
+        self._spool = None
+        self._spool_path = None
+        self._pending = 0
+        self._backlog = []
+        self._rotations = 0
+        self._stats = {'enqueued': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'replayed': 0,
+                       'last_flush_ms': 0.0, 'max_flush_ms': 0.0, 'total_flush_ms': 0.0}
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        """Replay orphaned spools and start the flusher (again, after a fork)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._spool = None
+            self._pending = 0
+            self._backlog = []
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._replay_orphans()
+        threading.Thread(target=self._run, name='contact-queue', daemon=True).start()
+
+    def _open_spool(self):
+        self._spool_path = os.path.join(self.spool_dir, f'contact-{os.getpid()}.ndjson')
+        self._spool = open(self._spool_path, 'a', encoding='utf-8')
+        # Held for the life of the process: an unlockable spool belongs to a live worker
+        fcntl.flock(self._spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _replay_orphans(self):
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, 'contact-*.ndjson*'))):
+            try:
+                f = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                count = self._insert_file(path)
+                if count is not None:
+                    os.unlink(path)
+                    self._count('replayed', count)
+
+    # ---------- producer side ----------
+
+    def submit(self, name, email, phone, message):
+        self.start()
+        record = {
+            'name': name,
+            'email': email,
+            'phone': phone,
+            'message': message,
+            'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._spool is None:
+                self._open_spool()
+            self._spool.write(line)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending += 1
+            self._stats['enqueued'] += 1
+            full = self._pending >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    # ---------- consumer side ----------
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                if self.logger:
+                    self.logger.exception('Contact queue flush failed')
+
+    def _rotate(self):
+        # Called with self._lock held: new submissions go to a fresh spool file
+        self._rotations += 1
+        path = f'{self._spool_path}.{self._rotations}.flushing'
+        os.rename(self._spool_path, path)
+        old = self._spool
+        self._spool = None
+        self._pending = 0
+        self._backlog.append((path, old))
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if self._pending:
+                    self._rotate()
+                backlog = list(self._backlog)
+            for path, handle in backlog:
+                if self._insert_file(path) is None:
+                    break
+                handle.close()
+                os.unlink(path)
+                with self._lock:
+                    self._backlog.remove((path, handle))
+
+    def _insert_file(self, path):
+        """Insert every record in a spool file in one transaction; None if that failed."""
+        with open(path, encoding='utf-8') as f:
+            rows = []
+            for line in f:
+                try:
+                    r = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash mid-write
+                rows.append((r['name'], r['email'], r.get('phone'), r['message'], r['created_at']))
+        if not rows:
+            return 0
+
+        started = time.perf_counter()
+        conn = self.storage.acquire(write=True)
+        try:
+            conn.executemany(INSERT_SQL, rows)
+            if self.on_commit:
+                self.on_commit(conn)
+            else:
+                conn.commit()
+        except Exception:
+            self._count('failures')
+            if self.logger:
+                self.logger.exception('Could not flush %d contact messages from %s', len(rows), path)
+            return None
+        finally:
+            self.storage.release(conn)
+
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats['flushed'] += len(rows)
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round(elapsed, 3)
+            self._stats['max_flush_ms'] = round(max(self._stats['max_flush_ms'], elapsed), 3)
+            self._stats['total_flush_ms'] += elapsed
+        return len(rows)
+
+    # ---------- metrics ----------
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['depth'] = self._pending
+            stats['backlog_files'] = len(self._backlog)
+        total = stats.pop('total_flush_ms')
+        stats['avg_flush_ms'] = round(total / stats['batches'], 3) if stats['batches'] else 0.0
+        stats['batch_size'] = self.batch_size
+        stats['flush_interval'] = self.flush_interval
+        return stats
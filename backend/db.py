@@ -0,0 +1,293 @@
+"""
+Storage layer for the backend API.
+SQLite (pooled, one writer and many readers) and PostgreSQL (psycopg pool)
+engines behind the same acquire/release + execute/insert/commit surface.
+"""
+
+import os
+import queue
+import sqlite3
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+except ImportError:  # PostgreSQL support is optional
+    psycopg = None
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# Constraint violations raised by either engine
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + ((psycopg.IntegrityError,) if psycopg else ())
+DATABASE_ERRORS = (sqlite3.DatabaseError,) + ((psycopg.DatabaseError,) if psycopg else ())
+
+# pg_advisory_xact_lock key serializing schema migrations between processes
+MIGRATION_LOCK_ID = 0x4C4643
+
+
+class SQLiteConnection(sqlite3.Connection):
+    def insert(self, sql, params=()):
+        return self.execute(sql, params).lastrowid
+
+    def stream(self, sql, params=()):
+        """Cursor for a large result; SQLite already steps through the rows as they are fetched."""
+        return self.execute(sql, params)
+
+    @contextmanager
+    def read_snapshot(self):
+        # Every SELECT inside the block sees the same WAL snapshot
+        if self.in_transaction:
+            self.rollback()
+        self.execute('BEGIN')
+        try:
+            yield self
+        finally:
+            self.rollback()
+
+
+class SQLiteStorage:
+    dialect = 'sqlite'
+
+    def __init__(self, path, max_readers=8, timeout=10.0,
+                 mmap_size=256 * 1024 * 1024, cache_size=-16000, functions=None):
+        self.path = path
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.functions = functions or {}
+
+        # Pooled connections cannot share a plain in-memory database, and shared-cache
+        # mode locks whole tables (a read overlapping a write fails at once). :memory:
+        # therefore gets a throwaway WAL file, removed together with this storage.
+        self._tmpdir = None
+        if path == ':memory:':
+            self._tmpdir = tempfile.TemporaryDirectory(prefix='lfc-db-')
+            self.path = os.path.join(self._tmpdir.name, 'memory.db')
+
+        self._readers = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'timeouts': 0, 'writer_waits': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               factory=SQLiteConnection)
+        conn.row_factory = sqlite3.Row
+        # Per-connection settings are applied once, when the connection is created.
+        # auto_vacuum lets maintenance return free pages with PRAGMA incremental_vacuum.
+        # It only takes effect on a new database (older ones need `flask maintain --full`),
+        # and setting it on an existing one waits for the write lock, so new ones only.
+        if conn.execute('PRAGMA page_count').fetchone()[0] == 0:
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+        # SQL functions used by triggers must exist on every connection that writes
+        for name, fn in self.functions.items():
+            conn.create_function(name, -1, fn, deterministic=True)
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def translate_ddl(self, sql):
+        return sql
+
+    def lock_exclusive(self, conn):
+        """Open a transaction holding the database write lock, shared with other processes."""
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('BEGIN IMMEDIATE')
+
+    def acquire(self, write=False):
+        if write:
+            return self._acquire_writer()
+
+        try:
+            conn = self._readers.get_nowait()
+            self._count('hits')
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.max_readers
+            if create:
+                self._created += 1
+        if create:
+            self._count('misses')
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        # Pool exhausted: wait for a reader to be handed back
+        self._count('waits')
+        try:
+            return self._readers.get(timeout=self.timeout)
+        except queue.Empty:
+            self._count('timeouts')
+            raise PoolTimeout('Timed out waiting for a database connection')
+
+    def _acquire_writer(self):
+        if not self._writer_lock.acquire(blocking=False):
+            self._count('writer_waits')
+            if not self._writer_lock.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise PoolTimeout('Timed out waiting for the database writer')
+        try:
+            if self._writer is None:
+                self._writer = self._connect()
+        except Exception:
+            self._writer_lock.release()
+            raise
+        return self._writer
+
+    def release(self, conn):
+        # Never hand a connection back with an open transaction
+        if conn.in_transaction:
+            conn.rollback()
+        if conn is self._writer:
+            self._writer_lock.release()
+        else:
+            self._readers.put(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['readers_open'] = self._created
+        stats['readers_idle'] = self._readers.qsize()
+        stats['max_readers'] = self.max_readers
+        total = stats['hits'] + stats['misses'] + stats['waits']
+        stats['hit_rate'] = round(stats['hits'] / total, 4) if total else 0.0
+        return stats
+
+
+class PostgresConnection:
+    # Routes are written with sqlite-style '?' placeholders
+    def __init__(self, conn, pool):
+        self.raw = conn
+        self.pool = pool
+
+    @staticmethod
+    def _sql(sql):
+        return sql.replace('%', '%%').replace('?', '%s')
+
+    @staticmethod
+    def _params(params):
+        # Flags are stored as INTEGER, so booleans from JSON bodies become 0/1
+        return tuple(int(p) if isinstance(p, bool) else p for p in params)
+
+    @property
+    def in_transaction(self):
+        return self.raw.info.transaction_status != psycopg.pq.TransactionStatus.IDLE
+
+    def execute(self, sql, params=()):
+        return self.raw.execute(self._sql(sql), self._params(params))
+
+    def executemany(self, sql, seq_of_params):
+        cursor = self.raw.cursor()
+        cursor.executemany(self._sql(sql), [self._params(p) for p in seq_of_params])
+        return cursor
+
+    def insert(self, sql, params=()):
+        return self.execute(sql + ' RETURNING id', params).fetchone()['id']
+
+    def stream(self, sql, params=()):
+        """Server-side cursor for a large result: fetchmany() pulls each batch from the server.
+
+        A client-side cursor would transfer the whole result before the first row is returned.
+        The cursor lives in the current transaction, so close it before commit or release.
+        """
+        cursor = self.raw.cursor(name=f'lfc_stream_{uuid.uuid4().hex}')
+        cursor.execute(self._sql(sql), self._params(params))
+        return cursor
+
+    @contextmanager
+    def read_snapshot(self):
+        if self.in_transaction:
+            self.rollback()
+        self.raw.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+        try:
+            yield self
+        finally:
+            self.rollback()
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+
+class PostgresStorage:
+    dialect = 'postgresql'
+
+    def __init__(self, url, read_url=None, max_readers=8, timeout=10.0):
+        if psycopg is None:
+            raise RuntimeError('PostgreSQL support requires psycopg[pool] to be installed')
+        self.timeout = timeout
+        kwargs = {'row_factory': dict_row}
+        self._writer_pool = ConnectionPool(url, min_size=1, max_size=max(2, max_readers // 2),
+                                           timeout=timeout, kwargs=kwargs, open=True)
+        # Reads can be pointed at a replica to scale them out horizontally
+        self._reader_pool = self._writer_pool
+        if read_url:
+            self._reader_pool = ConnectionPool(read_url, min_size=1, max_size=max_readers,
+                                               timeout=timeout, kwargs=kwargs, open=True)
+
+    def translate_ddl(self, sql):
+        return (sql.replace('INTEGER PRIMARY KEY AUTOINCREMENT', 'SERIAL PRIMARY KEY')
+                   .replace('BOOLEAN DEFAULT', 'INTEGER DEFAULT'))
+
+    def lock_exclusive(self, conn):
+        """Open a transaction holding the migration advisory lock until commit or rollback."""
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute('SELECT pg_advisory_xact_lock(?)', (MIGRATION_LOCK_ID,))
+
+    def acquire(self, write=False):
+        pool = self._writer_pool if write else self._reader_pool
+        try:
+            raw = pool.getconn(timeout=self.timeout)
+        except Exception as e:
+            raise PoolTimeout(str(e))
+        return PostgresConnection(raw, pool)
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        conn.pool.putconn(conn.raw)
+
+    def stats(self):
+        stats = {'writer': self._writer_pool.get_stats()}
+        if self._reader_pool is not self._writer_pool:
+            stats['reader'] = self._reader_pool.get_stats()
+        return stats
+
+
+def create_storage(url, read_url=None, **options):
+    """Build the storage engine for a DATABASE_URL (sqlite:///path or postgresql://...)."""
+    if url.startswith(('postgres://', 'postgresql://')):
+        options.pop('mmap_size', None)
+        options.pop('cache_size', None)
+        options.pop('functions', None)
+        return PostgresStorage(url, read_url=read_url, **options)
+    if url.startswith('sqlite:///'):
+        return SQLiteStorage(url[len('sqlite:///'):] or ':memory:', **options)
+    raise ValueError(f'Unsupported DATABASE_URL {url!r}: expected sqlite:///path or postgresql://...')
@@ -0,0 +1,225 @@
+"""
+Image upload pipeline.
+Decodes and validates uploaded images, then writes metadata-free resized
+variants (thumb/card/full) as WebP, AVIF (when Pillow supports it) and JPEG,
+plus a tiny blurred placeholder. Encoding runs in a process pool so request
+threads only wait on a future instead of holding the GIL.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageFilter, ImageOps, UnidentifiedImageError, features
+
+# Longest edge of each variant; images are never upscaled
+VARIANTS = {'thumb': 320, 'card': 800, 'full': 1920}
+QUALITY = {'webp': 80, 'avif': 55, 'jpeg': 82}
+EXTENSIONS = {'webp': 'webp', 'avif': 'avif', 'jpeg': 'jpg'}
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF', 'BMP', 'TIFF', 'AVIF'}
+MAX_PIXELS = 40_000_000
+PLACEHOLDER_SIZE = 16
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class ImageTooLarge(InvalidImage):
+    pass
+
+
+class ImageBusy(Exception):
+    pass
+
+
+def output_formats():
+    formats = ['webp', 'jpeg']
+    if features.check('avif'):
+        formats.insert(1, 'avif')
+    return formats
+
+
+def _open(path):
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    try:
+        with Image.open(path) as probe:
+            if probe.format not in ALLOWED_FORMATS:
+                raise InvalidImage(f'Unsupported image format: {probe.format}')
+            # Pillow only refuses images above twice MAX_IMAGE_PIXELS; the header is
+            # enough to enforce the real limit before anything is decoded
+            if probe.width * probe.height > MAX_PIXELS:
+                raise ImageTooLarge('Image dimensions are too large')
+            probe.verify()
+        # verify() leaves the image unusable, so decode it again for real
+        image = Image.open(path)
+        image.load()
+    except InvalidImage:
+        raise
+    except Image.DecompressionBombError:
+        raise ImageTooLarge('Image dimensions are too large')
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise InvalidImage('File is not a valid image')
+    return image
+
+
+def _flatten(image):
+    # JPEG has no alpha channel: composite transparent images onto white
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _resize(image, longest):
+    if max(image.size) <= longest:
+        return image
+    resized = image.copy()
+    resized.thumbnail((longest, longest), Image.LANCZOS)
+    return resized
+
+
+def _save(image, f, fmt):
+    # Nothing from the source (EXIF, XMP, ICC) is passed on, so metadata is dropped
+    options = {'quality': QUALITY[fmt]}
+    if fmt == 'jpeg':
+        image = _flatten(image)
+        options.update(optimize=True, progressive=True)
+    elif fmt == 'webp':
+        options['method'] = 4
+    image.save(f, format=fmt.upper(), **options)
+
+
+def _write_atomic(path, write):
+    """Call write(f) on a temp file next to path and move it into place.
+
+    Published names are served as immutable, so a reader must never see a
+    partly written file: it sees no file, or the whole one.
+    """
+    directory, name = os.path.split(path)
+    # Not mkstemp: its 0600 mode would hide the file from a web server running as another user
+    tmp_path = os.path.join(directory, f'.{name}.{uuid.uuid4().hex}.tmp')
+    try:
+        with open(tmp_path, 'xb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _placeholder(image):
+    small = _flatten(image)
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    small = small.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    small.save(buffer, format='WEBP', quality=30)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def process_image(src_path, out_dir, stem):
+    """Write every variant of src_path into out_dir as <stem>-<variant>.<ext>.
+
+    Runs in a worker process; returns plain data describing what was written.
+    """
+    source = _open(src_path)
+    try:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        result = {
+            'width': image.width,
+            'height': image.height,
+            'placeholder': _placeholder(image),
+            'variants': {},
+        }
+        for name, longest in VARIANTS.items():
+            resized = _resize(image, longest)
+            files = {}
+            for fmt in output_formats():
+                filename = f'{stem}-{name}.{EXTENSIONS[fmt]}'
+                _write_atomic(os.path.join(out_dir, filename), lambda f: _save(resized, f, fmt))
+                files[fmt] = filename
+            result['variants'][name] = {'width': resized.width, 'height': resized.height, 'files': files}
+        return result
+    finally:
+        source.close()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+class ImagePipeline:
+    def __init__(self, out_dir, meta_dir, workers=2, timeout=60):
+        self.out_dir = out_dir
+        self.meta_dir = meta_dir
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # fork, not spawn: spawned children would re-import the app module as __main__
+                method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context(method))
+            return self._executor
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def process(self, src_path, stem):
+        """Run process_image in the pool; ImageBusy if it times out or the pool keeps breaking."""
+        for attempt in (1, 2):
+            executor = self._pool()
+            try:
+                return executor.submit(process_image, src_path, self.out_dir, stem).result(timeout=self.timeout)
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory) and took the pool with it:
+                # replace the pool and try once more
+                self._discard(executor)
+            except TimeoutError:
+                raise ImageBusy('Image processing timed out')
+        raise ImageBusy('Image processing failed')
+
+    def ingest(self, src_path):
+        """Publish src_path under its content hash; identical uploads reuse the existing variants."""
+        stem = file_digest(src_path)
+        meta_path = os.path.join(self.meta_dir, stem + '.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                result = json.load(f)
+            result['deduplicated'] = True
+            return stem, result
+        except (OSError, ValueError):
+            pass
+
+        result = self.process(src_path, stem)
+        # Written last: its presence means every variant is already on disk
+        _write_atomic(meta_path, lambda f: f.write(json.dumps(result).encode('utf-8')))
+        result['deduplicated'] = False
+        return stem, result
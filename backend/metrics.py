@@ -0,0 +1,347 @@
+"""
+In-process request and SQL metrics, exported in the Prometheus text format.
+Histograms keep fixed buckets per label set, so recording an observation is a
+bisect and three additions under a lock. Every worker process keeps its own
+numbers; Prometheus scrapes and sums them per instance.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+OPERATIONS = ('select', 'insert', 'update', 'delete', 'commit')
+# Statements EXPLAIN accepts; anything else (BEGIN, PRAGMA, DDL) is only timed
+EXPLAINABLE = ('select', 'insert', 'update', 'delete')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name + _labels(self.labels, labels), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield self.name + '_bucket' + _labels(self.labels, labels, le), cumulative
+            yield self.name + '_sum' + _labels(self.labels, labels), round(values[-1], 6)
+            yield self.name + '_count' + _labels(self.labels, labels), cumulative
+
+
+class StatsCollector:
+    """Exposes a component's stats() dict as gauges and counters on every scrape.
+
+    Numeric values become `<prefix>_<key>`; keys listed in counters are
+    exported as counters (`_total`). Nested dicts (per pool, per endpoint)
+    are flattened under a label named by label.
+    """
+
+    def __init__(self, prefix, stats, counters=(), label=None):
+        self.prefix = prefix
+        self.stats = stats
+        self.counters = frozenset(counters)
+        self.label = label
+
+    def _flatten(self, stats, labels=()):
+        for key, value in stats.items():
+            if isinstance(value, dict) and self.label:
+                yield from self._flatten(value, labels + (key,))
+            elif isinstance(value, (bool, int, float)):
+                yield key, labels, int(value) if isinstance(value, bool) else value
+
+    def families(self):
+        families = {}
+        for key, labels, value in self._flatten(self.stats()):
+            counter = key in self.counters
+            name = f'{self.prefix}_{key}' + ('_total' if counter else '')
+            family = families.setdefault(name, ('counter' if counter else 'gauge', []))
+            family[1].append((name + _labels((self.label,) if labels else (), labels), value))
+        for name, (kind, samples) in families.items():
+            yield name, kind, samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collect(self, prefix, stats, counters=(), label=None):
+        self.collectors.append(StatsCollector(prefix, stats, counters, label))
+
+    def render(self, logger=None):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{sample} {_number(value)}' for sample, value in metric.samples())
+        for collector in self.collectors:
+            try:
+                families = list(collector.families())
+            except Exception:  # one unreachable backend must not break the scrape
+                if logger:
+                    logger.exception('Could not collect %s metrics', collector.prefix)
+                continue
+            for name, kind, samples in families:
+                lines.append(f'# TYPE {name} {kind}')
+                lines.extend(f'{sample} {_number(value)}' for sample, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+class SQLTracer:
+    """Records statement timings and logs slow statements with their query plan."""
+
+    def __init__(self, registry, dialect, route=lambda: 'none', slow_ms=100, logger=None, max_plans=256):
+        self.dialect = dialect
+        self.route = route
+        self.slow = slow_ms / 1000 if slow_ms else None
+        self.logger = logger
+        self.max_plans = max_plans
+        self._plans = OrderedDict()  # sql -> plan lines, so repeated slow statements are explained once
+        self._lock = threading.Lock()
+        self.duration = registry.histogram('lfc_db_query_duration_seconds',
+                                           'Time spent executing and fetching SQL statements.',
+                                           ('route', 'operation'), QUERY_BUCKETS)
+        self.rows = registry.counter('lfc_db_query_rows_total', 'Rows fetched by SQL statements.',
+                                     ('route', 'operation'))
+        self.slow_queries = registry.counter('lfc_db_slow_queries_total',
+                                             'SQL statements slower than SLOW_QUERY_MS.', ('route', 'operation'))
+
+    @staticmethod
+    def operation(sql):
+        verb = sql.lstrip().split(None, 1)[0].lower() if sql.strip() else ''
+        if verb == 'with':
+            return 'select'
+        return verb if verb in OPERATIONS else 'other'
+
+    def record(self, conn, route, sql, params, seconds, rows):
+        operation = self.operation(sql)
+        self.duration.observe(seconds, route, operation)
+        if rows:
+            self.rows.inc(route, operation, amount=rows)
+        if self.slow is not None and seconds >= self.slow:
+            self.slow_queries.inc(route, operation)
+            if self.logger:
+                plan = self.plan(conn, sql, params)
+                self.logger.warning('Slow query on %s: %.1f ms, %d rows\n  %s%s', route, seconds * 1000, rows,
+                                    ' '.join(sql.split()), ''.join('\n    ' + line for line in plan))
+
+    def plan(self, conn, sql, params):
+        with self._lock:
+            if sql in self._plans:
+                self._plans.move_to_end(sql)
+                return self._plans[sql]
+        if params is None or self.operation(sql) not in EXPLAINABLE:
+            return []
+        try:
+            if self.dialect == 'sqlite':
+                plan = [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+            else:
+                plan = [row['QUERY PLAN'] for row in conn.execute('EXPLAIN ' + sql, params)]
+        except Exception as e:
+            return [f'(no plan: {e})']
+        with self._lock:
+            self._plans[sql] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+
+class TracedCursor:
+    """Accumulates fetch time and row count until the result is exhausted or abandoned."""
+
+    def __init__(self, cursor, conn, sql, params, seconds):
+        self._cursor = cursor
+        self._conn = conn
+        self._sql = sql
+        self._params = params
+        self._seconds = seconds
+        self._rows = 0
+        self._done = False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _fetched(self, started, rows, exhausted):
+        self._seconds += time.perf_counter() - started
+        self._rows += rows
+        if exhausted:
+            self.finish()
+
+    def finish(self):
+        if not self._done:
+            self._done = True
+            self._conn._finished(self)
+            conn = self._conn
+            conn.tracer.record(conn.conn, conn.route, self._sql, self._params, self._seconds, self._rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+
+class TracedConnection:
+    """Wraps a pooled connection so every statement run through it is timed.
+
+    A statement is recorded once its rows are exhausted, or when the next
+    statement, commit, rollback or release on the connection abandons it.
+    """
+
+    def __init__(self, conn, tracer):
+        self.conn = conn
+        self.tracer = tracer
+        self.route = tracer.route()  # fixed when borrowed: teardown runs outside the request
+        self._open = None
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def _finished(self, cursor):
+        if self._open is cursor:
+            self._open = None
+
+    def _settle(self):
+        if self._open is not None:
+            self._open.finish()
+
+    def execute(self, sql, params=()):
+        self._settle()
+        started = time.perf_counter()
+        cursor = self.conn.execute(sql, params)
+        self._open = TracedCursor(cursor, self, sql, params, time.perf_counter() - started)
+        return self._open
+
+    def executemany(self, sql, seq_of_params):
+        self._settle()
+        started = time.perf_counter()
+        cursor = self.conn.executemany(sql, seq_of_params)
+        self.tracer.record(self.conn, self.route, sql, None, time.perf_counter() - started, 0)
+        return cursor
+
+    def insert(self, sql, params=()):
+        self._settle()
+        started = time.perf_counter()
+        row_id = self.conn.insert(sql, params)
+        self.tracer.record(self.conn, self.route, sql, params, time.perf_counter() - started, 0)
+        return row_id
+
+    def commit(self):
+        self._settle()
+        started = time.perf_counter()
+        self.conn.commit()
+        self.tracer.record(self.conn, self.route, 'COMMIT', None, time.perf_counter() - started, 0)
+
+    def rollback(self):
+        self._settle()
+        self.conn.rollback()
+
+    @contextmanager
+    def read_snapshot(self):
+        self._settle()
+        with self.conn.read_snapshot():
+            yield self
+            self._settle()
+
+    def detach(self):
+        """Record whatever is still open and return the pooled connection."""
+        self._settle()
+        return self.conn
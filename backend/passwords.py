@@ -0,0 +1,110 @@
+"""
+Password hashing off the request thread.
+werkzeug's scrypt/pbkdf2 run in hashlib, which releases the GIL, so a small
+thread pool keeps slow hashes from stalling other requests. The pool is
+bounded: when too many verifications are already waiting, new ones are
+refused instead of queueing without limit, and so is a check that does not
+finish within the timeout.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class PasswordBusy(Exception):
+    pass
+
+
+def hash_prefix(method):
+    """The parameters werkzeug writes in front of hashes made with method, e.g. 'scrypt:32768:8:1'.
+
+    Worked out from the method string with werkzeug's defaults, because hashing
+    a sample password would cost a full scrypt run on every worker boot.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        n, r, p = (int(arg) for arg in args) if args else (2 ** 15, 8, 1)
+        return f'scrypt:{n}:{r}:{p}'
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'Invalid hash method {method!r}')
+
+
+class PasswordHasher:
+    def __init__(self, method='scrypt', workers=2, max_pending=32, timeout=10.0):
+        self.method = method
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        # Stored hashes start with their parameters, e.g. 'scrypt:32768:8:1$salt$hash'
+        self.prefix = hash_prefix(method)
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+        self._stats = {'verified': 0, 'failed': 0, 'hashed': 0, 'rejected': 0, 'timeouts': 0}
+
+    def _pool(self):
+        with self._lock:
+            # Worker threads do not survive a fork, so each process gets its own pool
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix='password')
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise PasswordBusy('Too many password checks in progress')
+            self._pending += 1
+        try:
+            future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._done()
+            raise
+        # Counted as pending until the hash finishes, even if the caller stopped waiting
+        future.add_done_callback(self._done)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self._count('timeouts')
+            raise PasswordBusy('Password check timed out')
+
+    def _done(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def verify(self, pwhash, password):
+        ok = self._run(check_password_hash, pwhash, password)
+        self._count('verified' if ok else 'failed')
+        return ok
+
+    def hash(self, password):
+        pwhash = self._run(generate_password_hash, password, self.method)
+        self._count('hashed')
+        return pwhash
+
+    def needs_rehash(self, pwhash):
+        """True when pwhash was made with other parameters than the configured method."""
+        return pwhash.split('$', 1)[0] != self.prefix
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['method'] = self.prefix
+        stats['workers'] = self.workers
+        stats['max_pending'] = self.max_pending
+        return stats
@@ -0,0 +1,135 @@
+"""
+Token-bucket rate limiting for the unauthenticated write endpoints.
+Each endpoint has a limit such as '5/minute' (bucket capacity 5, refilled at
+5 tokens per minute). A request is checked against several keys (client IP,
+username, ...): it is allowed only if every one of their buckets holds a token,
+and then takes one from each. A rejected request takes nothing, so a client
+that is already limited cannot drain the buckets of other keys.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:  # the shared backend is optional
+    redis = None
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(spec):
+    """'10/minute' -> (refill rate in tokens per second, capacity)."""
+    count, _, period = spec.partition('/')
+    count = int(count)
+    seconds = PERIODS[period.strip().rstrip('s') or 'second']
+    return count / seconds, count
+
+
+class MemoryBuckets:
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, keys, rate, capacity):
+        """Take a token from every bucket in keys, or from none if any of them is empty."""
+        now = time.monotonic()
+        with self._lock:
+            levels = {}
+            for key in keys:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                levels[key] = min(capacity, tokens + (now - updated) * rate)
+            retry_after = max(((1 - tokens) / rate for tokens in levels.values() if tokens < 1), default=0.0)
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens if retry_after else tokens - 1, now)
+                self._buckets.move_to_end(key)
+            # Least recently seen keys go first; a dropped bucket simply starts full again
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after == 0.0, retry_after
+
+
+class RedisBuckets:
+    # Refill every bucket, then take from all of them or none, in one atomic step,
+    # so concurrent workers share the buckets
+    SCRIPT = '''
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local levels = {}
+        local retry = 0
+        for i, key in ipairs(KEYS) do
+            local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+            local tokens = tonumber(bucket[1]) or capacity
+            local ts = tonumber(bucket[2]) or now
+            tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+            if tokens < 1 then
+                retry = math.max(retry, (1 - tokens) / rate)
+            end
+            levels[i] = tokens
+        end
+        for i, key in ipairs(KEYS) do
+            local tokens = levels[i]
+            if retry == 0 then
+                tokens = tokens - 1
+            end
+            redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+            redis.call('PEXPIRE', key, math.ceil(capacity / rate * 1000))
+        end
+        return tostring(retry)
+    '''
+
+    def __init__(self, url=None, prefix='lfc:rl:', client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError('The Redis rate limit backend requires the redis package')
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    def take(self, keys, rate, capacity):
+        """Take a token from every bucket in keys, or from none if any of them is empty."""
+        if not keys:
+            return True, 0.0
+        retry_after = float(self._script(keys=[self.prefix + key for key in keys],
+                                         args=[rate, capacity, time.time()]))
+        return retry_after == 0.0, retry_after
+
+
+class RateLimiter:
+    def __init__(self, backend, limits):
+        self.backend = backend
+        self.limits = {name: parse_limit(spec) for name, spec in limits.items() if spec}
+        self._lock = threading.Lock()
+        self._stats = {name: {'allowed': 0, 'limited': 0} for name in self.limits}
+
+    def check(self, endpoint, keys):
+        """Take a token for every key, or none; returns (allowed, seconds until a retry can succeed)."""
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return True, 0.0
+        rate, capacity = limit
+
+        allowed, retry_after = self.backend.take([f'{endpoint}:{key}' for key in keys], rate, capacity)
+
+        with self._lock:
+            self._stats[endpoint]['allowed' if allowed else 'limited'] += 1
+        return allowed, retry_after
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._stats.items()}
+        for name, (rate, capacity) in self.limits.items():
+            stats[name]['capacity'] = capacity
+            stats[name]['refill_per_second'] = round(rate, 6)
+        return stats
+
+
+def create_rate_limiter(limits, url=None):
+    """In-process buckets, or shared ones in Redis when url is redis://..."""
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RateLimiter(RedisBuckets(url), limits)
+    return RateLimiter(MemoryBuckets(), limits)
@@ -0,0 +1,122 @@
+"""
+Retention for contact_messages.
+Read messages older than the retention period are moved to
+contact_messages_archive in small transactions, so the inbox table and its
+indexes stay small. A scheduler thread runs the maintenance job; a row in
+maintenance_runs is claimed first, so with several workers only one of them
+runs it per interval.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+ARCHIVE_COLUMNS = ('id', 'name', 'email', 'phone', 'message', 'is_read', 'created_at')
+
+SELECT_BATCH = '''
+    SELECT id FROM contact_messages
+    WHERE is_read = 1 AND created_at < ?
+    ORDER BY created_at, id LIMIT ?
+'''
+
+
+def _timestamp(moment):
+    # Same format as CURRENT_TIMESTAMP and the contact queue, so text comparison works on SQLite
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def retention_cutoff(days, now=None):
+    return _timestamp((now or datetime.now(timezone.utc)) - timedelta(days=days))
+
+
+def archive_batch(conn, cutoff, batch_size):
+    """Move up to batch_size read messages created before cutoff; returns how many moved.
+
+    The caller commits, so the copy and the delete land in one transaction.
+    """
+    ids = [row['id'] for row in conn.execute(SELECT_BATCH, (cutoff, batch_size)).fetchall()]
+    if not ids:
+        return 0
+    placeholders = ', '.join('?' for _ in ids)
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    conn.execute(f'''
+        INSERT INTO contact_messages_archive ({columns})
+        SELECT {columns} FROM contact_messages WHERE id IN ({placeholders})
+    ''', ids)
+    conn.execute(f'DELETE FROM contact_messages WHERE id IN ({placeholders})', ids)
+    return len(ids)
+
+
+def claim_run(conn, name, interval, now=None):
+    """Atomically mark job name as run now, unless it already ran within interval seconds."""
+    now = now or datetime.now(timezone.utc)
+    cursor = conn.execute('''
+        UPDATE maintenance_runs SET last_run = ?
+        WHERE name = ? AND (last_run IS NULL OR last_run <= ?)
+    ''', (_timestamp(now), name, _timestamp(now - timedelta(seconds=interval))))
+    claimed = cursor.rowcount == 1
+    conn.commit()
+    return claimed
+
+
+def compact_sqlite(conn, max_pages):
+    """Give up to max_pages free pages back to the filesystem and refresh planner statistics."""
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:  # INCREMENTAL
+        # Each step of this pragma frees a single page; executescript steps it to completion
+        conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)})')
+    conn.execute('PRAGMA optimize').fetchall()
+    after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return {'free_pages': after, 'freed_pages': before - after}
+
+
+class MaintenanceScheduler:
+    """Calls job every check_interval seconds in a daemon thread; job decides whether it is due."""
+
+    def __init__(self, job, check_interval=300, logger=None):
+        self.job = job
+        self.check_interval = check_interval
+        self.logger = logger
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'failures': 0, 'archived': 0, 'freed_pages': 0, 'last_run_ms': 0.0}
+
+    def start(self):
+        """Start the thread in this process; threads do not survive a fork, so call it after one."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='maintenance', daemon=True).start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(self.check_interval)
+            self.run()
+
+    def run(self, force=False):
+        """Run the job now; returns its result, or None if it was not due."""
+        started = time.perf_counter()
+        try:
+            result = self.job(force=force)
+        except Exception:
+            with self._lock:
+                self._stats['failures'] += 1
+            if self.logger:
+                self.logger.exception('Maintenance run failed')
+            return None
+        if result is not None:
+            with self._lock:
+                self._stats['runs'] += 1
+                self._stats['archived'] += result['archived']
+                self._stats['freed_pages'] += result.get('freed_pages', 0)
+                self._stats['last_run_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['check_interval'] = self.check_interval
+        return stats
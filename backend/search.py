@@ -0,0 +1,200 @@
+"""
+Full-text search over news, projects and contact messages (SQLite FTS5).
+Each source table has an FTS5 mirror holding a normalized copy of its text
+columns, kept in sync by triggers; rowid is the id of the source row.
+Arabic is normalized the same way on both sides: diacritics and tatweel are
+dropped, alef variants become ا, taa marbuta ه and alef maksura ي, and the
+definite article ال is split off so "قمح" also finds "القمح".
+"""
+
+import html
+import re
+
+# Source table -> (FTS table, indexed columns, column shown as the hit title, public filter)
+SEARCH_TABLES = {
+    'news': ('news_fts', ('title', 'excerpt', 'content'), 'title', 'is_active = 1'),
+    'projects': ('projects_fts', ('title', 'description', 'location'), 'title', 'is_active = 1'),
+    'contact_messages': ('contact_messages_fts', ('name', 'email', 'message'), 'name', None),
+}
+
+# Hits in the first column (title, name) weigh more than hits in the body
+COLUMN_WEIGHTS = (10.0, 4.0, 1.0)
+
+_DROP = dict.fromkeys([*range(0x064B, 0x0660), 0x0670, *range(0x06D6, 0x06EE), 0x0640])
+_FOLD = {0x0623: 'ا', 0x0625: 'ا', 0x0622: 'ا', 0x0671: 'ا', 0x0629: 'ه', 0x0649: 'ي'}
+NORMALIZE = str.maketrans({**_DROP, **_FOLD})
+
+# ال at the start of a word that is at least two letters long without it
+ARTICLE = re.compile(r'(?<!\w)ال(?=\w\w)')
+TOKEN = re.compile(r'\w+')
+MAX_TERMS = 10
+
+
+def arabic_normalize(text):
+    """Registered as an SQL function; the FTS triggers index its output."""
+    if text is None:
+        return None
+    return ARTICLE.sub('', str(text).translate(NORMALIZE))
+
+
+# ---------- schema ----------
+
+def search_schema(conn):
+    """Create the FTS tables and their triggers; new tables are filled from the source rows."""
+    for table, (fts, columns, _, _) in SEARCH_TABLES.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                              (fts,)).fetchone()
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {', '.join(columns)}, tokenize = 'unicode61 remove_diacritics 2'
+            )
+        ''')
+
+        column_list = ', '.join(columns)
+        new_values = ', '.join(f'arabic_normalize(NEW.{c})' for c in columns)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF {column_list} ON {table}
+            BEGIN
+                DELETE FROM {fts} WHERE rowid = OLD.id;
+                INSERT INTO {fts} (rowid, {column_list}) VALUES (NEW.id, {new_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM {fts} WHERE rowid = OLD.id;
+            END
+        ''')
+
+        if not exists:
+            conn.execute(f'''
+                INSERT INTO {fts} (rowid, {column_list})
+                SELECT id, {', '.join(f'arabic_normalize({c})' for c in columns)} FROM {table}
+            ''')
+
+
+# ---------- queries ----------
+
+def query_terms(q):
+    return [t.lower() for t in TOKEN.findall(arabic_normalize(q))][:MAX_TERMS]
+
+
+def match_expression(terms):
+    """Every term must match; the last one as a prefix so results follow the typing."""
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(conn, tables, q, limit=20, offset=0):
+    """Ranked hits over tables as ([{'type': table, 'id', 'title', 'snippet', 'score'}], has_more)."""
+    terms = query_terms(q)
+    if not terms or not tables:
+        return [], False
+    match = match_expression(terms)
+
+    parts, params = [], []
+    for table in tables:
+        fts, columns, _, public_filter = SEARCH_TABLES[table]
+        weights = ', '.join(str(w) for w in COLUMN_WEIGHTS[:len(columns)])
+        where = f' AND s.{public_filter}' if public_filter else ''
+        parts.append(f'''
+            SELECT '{table}' AS source, f.rowid AS id, bm25({fts}, {weights}) AS score
+            FROM {fts} f JOIN {table} s ON s.id = f.rowid
+            WHERE {fts} MATCH ?{where}
+        ''')
+        params.append(match)
+
+    sql = ' UNION ALL '.join(parts) + ' ORDER BY score, id DESC LIMIT ? OFFSET ?'
+    rows = conn.execute(sql, params + [limit + 1, offset]).fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Snippets are cut from the original text, not the normalized FTS copy
+    sources = {}
+    for table in {row['source'] for row in rows}:
+        _, columns, title, _ = SEARCH_TABLES[table]
+        ids = [row['id'] for row in rows if row['source'] == table]
+        found = conn.execute(
+            f"SELECT id, {', '.join(columns)} FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids
+        ).fetchall()
+        sources[table] = {r['id']: r for r in found}
+
+    results = []
+    for row in rows:
+        source = sources[row['source']].get(row['id'])
+        if source is None:
+            continue
+        _, columns, title, _ = SEARCH_TABLES[row['source']]
+        results.append({
+            'type': row['source'],
+            'id': row['id'],
+            'title': source[title],
+            'snippet': best_snippet([source[c] for c in columns[1:]] or [source[title]], terms),
+            'score': round(-row['score'], 4),
+        })
+    return results, has_more
+
+
+# ---------- snippets ----------
+
+def _normalized_with_positions(text):
+    """Normalized, lowercased text plus the index in text of every character it contains."""
+    chars, positions = [], []
+    for i, ch in enumerate(text):
+        for out in ch.translate(NORMALIZE).lower():
+            chars.append(out)
+            positions.append(i)
+    folded = ''.join(chars)
+    for m in reversed(list(ARTICLE.finditer(folded))):
+        positions[m.end()] = positions[m.start()]  # a match on the word then marks its article too
+        del chars[m.start():m.end()]
+        del positions[m.start():m.end()]
+    return ''.join(chars), positions
+
+
+def _spans(text, terms):
+    normalized, positions = _normalized_with_positions(text)
+    pattern = re.compile(r'(?<!\w)(?:' + '|'.join(re.escape(t) for t in terms) + r')\w*')
+    spans = []
+    for m in pattern.finditer(normalized):
+        end = positions[m.end() - 1] + 1
+        while end < len(text) and ord(text[end]) in _DROP:  # trailing diacritics belong to the word
+            end += 1
+        spans.append((positions[m.start()], end))
+    return spans
+
+
+def snippet(text, terms, width=160):
+    """HTML-escaped excerpt of text around the first match, with matches wrapped in <mark>."""
+    spans = _spans(text, terms)
+    if not spans:
+        return html.escape(text[:width]) + ('…' if len(text) > width else '')
+
+    start = max(0, spans[0][0] - width // 3)
+    end = min(len(text), start + width)
+    out = ['…' if start else '']
+    cursor = start
+    for s, e in spans:
+        if s < cursor or e > end:
+            continue
+        out.append(html.escape(text[cursor:s]))
+        out.append('<mark>' + html.escape(text[s:e]) + '</mark>')
+        cursor = e
+    out.append(html.escape(text[cursor:end]))
+    out.append('…' if end < len(text) else '')
+    return ''.join(out)
+
+
+def best_snippet(texts, terms, width=160):
+    texts = [t for t in texts if t]
+    for text in texts:
+        if _spans(text, terms):
+            return snippet(text, terms, width)
+    return snippet(texts[0], terms, width) if texts else ''
@@ -0,0 +1,189 @@
+"""
+Static JSON snapshot of the public API.
+Renders the public GET routes through the app itself and writes each payload
+(plus .gz/.br siblings) under a directory that nginx or a CDN can serve
+directly, e.g. /api/services -> <root>/api/services.json.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+try:
+    import brotli
+except ImportError:  # .br files are skipped without it
+    brotli = None
+
+SNAPSHOT_TABLES = ('site_content', 'services', 'projects', 'testimonials', 'news')
+# Tables that also get one file per active row, rendered by their detail route
+DETAIL_TABLES = ('news', 'projects')
+SAFE_SEGMENT = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class SnapshotExporter:
+    def __init__(self, app, storage, root, delay=1.0):
+        self.app = app
+        self.storage = storage
+        self.root = root
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._wakeup = threading.Condition()
+        self._worker = None
+
+    # ---------- paths ----------
+
+    def _paths(self, conn, table):
+        if table == 'site_content':
+            rows = conn.execute('SELECT DISTINCT section FROM site_content').fetchall()
+            return ['/api/content'] + [f"/api/content/{row['section']}" for row in rows
+                                       if SAFE_SEGMENT.match(row['section'])]
+        if table in DETAIL_TABLES:
+            rows = conn.execute(f'SELECT id FROM {table} WHERE is_active = 1').fetchall()
+            return [f'/api/{table}'] + [f"/api/{table}/{row['id']}" for row in rows]
+        return [f'/api/{table}']
+
+    def _file(self, path):
+        return os.path.join(self.root, path.lstrip('/') + '.json')
+
+    # ---------- rendering ----------
+
+    def _render(self, client, path):
+        response = client.get(path)
+        return response.get_data() if response.status_code == 200 else None
+
+    def _write(self, path, body):
+        """Atomically replace path.json and its compressed siblings; False if unchanged."""
+        target = self._file(path)
+        digest = hashlib.sha256(body).hexdigest()
+        if os.path.exists(target):
+            with open(target, 'rb') as f:
+                if hashlib.sha256(f.read()).hexdigest() == digest:
+                    return False
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        variants = [('', body), ('.gz', gzip.compress(body, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(body, quality=11)))
+        # Compressed siblings first, so the plain file never points at stale .gz/.br data
+        for suffix, data in reversed(variants):
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix='.tmp-')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, target + suffix)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        return True
+
+    def _remove_stale_details(self, table, keep):
+        directory = os.path.join(self.root, 'api', table)
+        if not os.path.isdir(directory):
+            return
+        for name in os.listdir(directory):
+            stem = name.split('.', 1)[0]
+            if stem.isdigit() and f'/api/{table}/{stem}' not in keep:
+                os.unlink(os.path.join(directory, name))
+
+    # ---------- manifest ----------
+
+    def _manifest_path(self):
+        return os.path.join(self.root, 'manifest.json')
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'tables': {}, 'files': {}}
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp, self._manifest_path())
+
+    # ---------- export ----------
+
+    def export(self, tables=None, force=False):
+        """Regenerate the files of the given tables (default: tables whose version changed)."""
+        with self._lock:
+            manifest = self._load_manifest()
+            conn = self.storage.acquire()
+            try:
+                versions = {row['name']: row['version'] for row in
+                            conn.execute('SELECT name, version FROM table_versions').fetchall()}
+                if tables is None:
+                    tables = [t for t in SNAPSHOT_TABLES
+                              if force or manifest['tables'].get(t) != versions.get(t)]
+                tables = [t for t in tables if t in SNAPSHOT_TABLES]
+
+                paths = []
+                for table in tables:
+                    paths.extend(self._paths(conn, table))
+                if tables:
+                    paths.append('/api/bootstrap')
+
+                written = 0
+                client = self.app.test_client()
+                for path in paths:
+                    body = self._render(client, path)
+                    if body is None:
+                        continue
+                    if self._write(path, body):
+                        written += 1
+                    manifest['files'][path] = {
+                        'sha256': hashlib.sha256(body).hexdigest(),
+                        'bytes': len(body),
+                    }
+
+                for table in DETAIL_TABLES:
+                    if table not in tables:
+                        continue
+                    self._remove_stale_details(table, set(paths))
+                    for path in list(manifest['files']):
+                        if path.startswith(f'/api/{table}/') and path not in paths:
+                            del manifest['files'][path]
+            finally:
+                self.storage.release(conn)
+
+            for table in tables:
+                manifest['tables'][table] = versions.get(table)
+            manifest['generated_at'] = datetime.now(timezone.utc).isoformat()
+            self._save_manifest(manifest)
+            return {'tables': tables, 'files': len(paths), 'written': written}
+
+    # ---------- write hook ----------
+
+    def schedule(self, *tables):
+        """Queue an incremental export; bursts of writes are coalesced into one run."""
+        tables = [t for t in tables if t in SNAPSHOT_TABLES]
+        if not tables:
+            return
+        with self._wakeup:
+            self._pending.update(tables)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name='snapshot-export', daemon=True)
+                self._worker.start()
+            self._wakeup.notify()
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._pending:
+                    self._wakeup.wait()
+            time.sleep(self.delay)
+            with self._wakeup:
+                tables, self._pending = self._pending, set()
+            try:
+                self.export(sorted(tables))
+            except Exception:
+                self.app.logger.exception('Snapshot export failed for %s', ', '.join(sorted(tables)))
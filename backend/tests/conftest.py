@@ -0,0 +1,47 @@
+"""
+Shared fixtures. The app is configured from the environment when app.py is
+imported, so the environment is set up first and the module is imported once
+per session, against a throwaway database and working directory.
+"""
+
+import importlib
+import os
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='lfc-tests-')
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(WORKDIR, 'test.db'),
+    'CONTACT_QUEUE': '0',
+    'CONTACT_SPOOL_DIR': os.path.join(WORKDIR, 'spool'),
+    'MAINTENANCE_INTERVAL': '0',
+    'SNAPSHOT_DIR': '',
+})
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    cwd = os.getcwd()
+    os.chdir(WORKDIR)  # uploads/ is created relative to the working directory
+    try:
+        yield importlib.import_module('app')
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app_module):
+    app_module.cache.clear()
+    return app_module.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def token(app_module):
+    with app_module.app.app_context():
+        return app_module.create_access_token(identity='admin')
+
+
+@pytest.fixture
+def auth(token):
+    return {'Authorization': f'Bearer {token}'}
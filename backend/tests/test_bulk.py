@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+
+def ndjson(*rows):
+    return '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n'
+
+
+@pytest.mark.parametrize('value', [{'ar': 'عنوان'}, ['a', 'b']])
+def test_bulk_rejects_nested_values(client, auth, value):
+    response = client.post('/api/services/bulk', headers=auth, json={
+        'create': [{'title': 'Fine'}, {'title': value}],
+    })
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'create[1]: title must be a string, number, boolean or null'
+
+
+def test_bulk_rejects_nested_delete_ids(client, auth):
+    response = client.post('/api/services/bulk', headers=auth, json={'delete': [[1, 2]]})
+    assert response.status_code == 400
+
+
+def test_bulk_applies_changes(client, auth):
+    created = client.post('/api/projects/bulk', headers=auth, json={
+        'create': [{'title': 'Bulk A', 'order_num': 50}, {'title': 'Bulk B', 'order_num': 51}],
+    })
+    assert created.get_json() == {'created': 2, 'updated': 0, 'deleted': 0}
+
+
+def test_import_rejects_nested_values(client, auth):
+    body = ndjson({'title': 'Imported'}, {'title': 'Nested', 'description': {'html': '<p>'}})
+    response = client.post('/api/services/import', headers=auth, data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('Row 2: description')
+
+
+def test_import_rejects_ragged_csv(client, auth):
+    body = 'title,order_num\nOne,1\nTwo,2,extra\n'
+    response = client.post('/api/services/import', headers=auth, data=body, content_type='text/csv')
+    assert response.status_code == 400
+
+
+def test_import_checks_body_before_taking_the_writer(app_module, client, auth, monkeypatch):
+    read_rows = app_module.read_import_rows
+    writer_held = []
+
+    def watched(fmt):
+        for row in read_rows(fmt):
+            writer_held.append(app_module.storage._writer_lock.locked())
+            yield row
+
+    monkeypatch.setattr(app_module, 'read_import_rows', watched)
+    rows = [{'title': f'Imported {i}', 'order_num': 100 + i} for i in range(3)]
+    response = client.post('/api/services/import', headers=auth, data=ndjson(*rows),
+                           content_type='application/x-ndjson')
+
+    assert response.get_json() == {'imported': 3}
+    assert writer_held == [False, False, False]
+    titles = [s['title'] for s in client.get('/api/services').get_json()]
+    assert {'Imported 0', 'Imported 1', 'Imported 2'} <= set(titles)
+
+
+def test_import_streams_batches_from_the_spool(app_module, client, auth, monkeypatch):
+    import_batch = app_module.import_batch
+    batches = []
+
+    def recorded(conn, table, columns, rows):
+        batches.append([row['title'] for row in rows])
+        import_batch(conn, table, columns, rows)
+
+    monkeypatch.setattr(app_module, 'IMPORT_BATCH_SIZE', 2)
+    monkeypatch.setattr(app_module, 'import_batch', recorded)
+    body = 'title,order_num\nخدمة 1,1\nخدمة 2,2\nخدمة 3,3\nخدمة 4,4\nخدمة 5,5\n'
+    response = client.post('/api/services/import', headers=auth, data=body.encode(), content_type='text/csv')
+
+    assert response.get_json() == {'imported': 5}
+    assert batches == [['خدمة 1', 'خدمة 2'], ['خدمة 3', 'خدمة 4'], ['خدمة 5']]
+
+
+def test_import_writes_nothing_when_a_later_row_is_bad(client, auth):
+    body = ndjson({'title': 'Never imported'}, {'title': 'Bad', 'colour': 'red'})
+    response = client.post('/api/services/import', headers=auth, data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Row 2: unknown columns colour'
+    titles = [s['title'] for s in client.get('/api/services').get_json()]
+    assert 'Never imported' not in titles
+
+
+def test_export_import_round_trip(client, auth):
+    exported = client.get('/api/site_content/export?format=ndjson', headers=auth).get_data(as_text=True)
+    response = client.post('/api/site_content/import', headers=auth, data=exported,
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.get_json()['imported'] == len(exported.strip().splitlines())
+
+
+def content_stamp(app_module, key):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.execute("UPDATE site_content SET updated_at = '2000-01-01 00:00:00' WHERE section = 'hero' AND key = ?",
+                     (key,))
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+    return lambda client: client.get('/api/content/hero').get_json()[key]['updated_at']
+
+
+def test_bulk_content_update_sets_updated_at(app_module, client, auth):
+    updated_at = content_stamp(app_module, 'title')
+    response = client.post('/api/site_content/bulk', headers=auth, json={
+        'update': [{'section': 'hero', 'key': 'title', 'value': 'عنوان جديد'}],
+    })
+    assert response.get_json()['updated'] == 1
+    assert not updated_at(client).startswith('2000')
+
+
+def test_import_content_update_sets_updated_at(app_module, client, auth):
+    updated_at = content_stamp(app_module, 'subtitle')
+    body = ndjson({'section': 'hero', 'key': 'subtitle', 'value': 'نص'})
+    response = client.post('/api/site_content/import', headers=auth, data=body, content_type='application/x-ndjson')
+    assert response.get_json() == {'imported': 1}
+    assert not updated_at(client).startswith('2000')
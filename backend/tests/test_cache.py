@@ -0,0 +1,60 @@
+import pickle
+
+import pytest
+
+from cache import MemoryCache, RedisCache, dumps, loads
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        assert isinstance(value, bytes)
+        self.data[key] = value
+
+
+class Exploit:
+    def __reduce__(self):
+        return (pytest.fail, ('pickle payload was executed',))
+
+
+def test_entry_round_trip():
+    entry = ('{"title": "خبر"}'.encode(), [('X-Next-Cursor', '2026-01-01 00:00:00,5')],
+             {'gzip': b'\x1f\x8b\x08\x00', 'br': b'\x0b\x02\x80'})
+    body, headers, variants = loads(dumps(entry))
+    assert body == entry[0]
+    assert [tuple(h) for h in headers] == entry[1]
+    assert variants == entry[2]
+    assert loads(dumps({'id': 1, 'username': 'admin'})) == {'id': 1, 'username': 'admin'}
+    assert loads(dumps(b'')) == b''
+
+
+def test_redis_cache_stores_no_pickles():
+    client = FakeRedis()
+    cache = RedisCache(client=client)
+    cache.set('bootstrap:news@3', b'[1,2]')
+    assert cache.get('bootstrap:news@3') == b'[1,2]'
+
+    # Unreadable entries (e.g. pickles written by an older version) are misses, never unpickled
+    client.data[cache.prefix + 'evil'] = pickle.dumps(Exploit())
+    assert cache.get('evil') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_unsupported_values_are_refused():
+    with pytest.raises(TypeError):
+        dumps({'when': object()})
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.stats()['evictions'] == 1
@@ -0,0 +1,64 @@
+import pytest
+
+from changes import ChangeHub
+
+
+@pytest.fixture
+def head(app_module, client, auth):
+    return client.get('/api/changes', headers=auth).get_json()['next']
+
+
+def create_services(client, auth, count):
+    return [client.post('/api/services', json={'title': f'Service {i}'}, headers=auth).get_json()['id']
+            for i in range(count)]
+
+
+def test_changes_since_cursor(client, auth, head):
+    ids = create_services(client, auth, 2)
+    client.delete(f'/api/services/{ids[0]}', headers=auth)
+
+    body = client.get(f'/api/changes?since={head}', headers=auth).get_json()
+    assert [(c['table'], c['op'], c['id']) for c in body['changes']] == [
+        ('services', 'insert', ids[0]), ('services', 'insert', ids[1]), ('services', 'delete', ids[0])]
+    # Rows are attached as they are now: null once deleted
+    assert body['changes'][0]['row'] is None
+    assert body['changes'][1]['row']['title'] == 'Service 1'
+    assert body['next'] == body['changes'][-1]['seq']
+    assert body['has_more'] is False
+
+    page = client.get(f'/api/changes?since={head}&limit=2', headers=auth).get_json()
+    assert len(page['changes']) == 2 and page['has_more'] is True
+
+
+def test_pruned_cursor_gets_410(app_module, client, auth, head, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'CHANGE_LOG_RETENTION', 2)
+    create_services(client, auth, 5)
+
+    response = client.get(f'/api/changes?since={head}', headers=auth)
+    assert response.status_code == 410
+    assert response.get_json()['reload'] is True
+    assert client.get(f'/api/changes/stream?since={head}', headers=auth).status_code == 410
+
+    latest = client.get('/api/changes', headers=auth).get_json()['next']
+    assert client.get(f'/api/changes?since={latest - 1}', headers=auth).status_code == 200
+
+
+def test_cursor_ahead_of_log_gets_410(client, auth, head):
+    assert client.get(f'/api/changes?since={head + 1000}', headers=auth).status_code == 410
+
+
+def test_malformed_cursor_is_rejected(client, auth):
+    assert client.get('/api/changes?since=abc', headers=auth).status_code == 400
+
+
+def test_hub_reports_cursor_older_than_buffer(app_module, client, auth, head):
+    hub = ChangeHub(app_module.storage, app_module.app.json.dumpb, buffer_size=2)
+    hub.poll()  # starts from the current head
+    create_services(client, auth, 3)
+    hub.poll()
+
+    assert hub.wait(hub.head - 1, timeout=0) == [(hub.head, hub._events[-1][1])]
+    assert hub.wait(hub.head, timeout=0) == []
+    # Two events are kept: a cursor before them must fall back to the table
+    assert hub.wait(hub.head - 3, timeout=0) is None
+    assert hub.stats()['events'] == 3
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import brotli
+import pytest
+
+from compression import available_encodings, compress, compress_all, negotiate
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, br', 'br'),  # brotli wins ties
+    ('br;q=0.5, gzip', 'gzip'),
+    ('gzip;q=0, br;q=0', None),
+    ('*', 'br'),
+    ('*;q=0.1, gzip;q=0.5', 'gzip'),
+    ('deflate', None),
+    ('', None),
+    (None, None),
+    ('br;q=abc, gzip;q=0.2', 'gzip'),  # a malformed q-value counts as 0
+])
+def test_negotiate(accept, expected):
+    assert negotiate(accept, ('br', 'gzip')) == expected
+
+
+def test_brotli_is_available():
+    # A listed requirement: without it br would silently never be offered
+    assert available_encodings() == ('br', 'gzip')
+
+
+def test_compress_round_trips():
+    body = json.dumps({'title': 'القمح ' * 200}, ensure_ascii=False).encode()
+    assert brotli.decompress(compress(body, 'br')) == body
+    assert gzip.decompress(compress(body, 'gzip', best=True)) == body
+
+
+def test_compress_all_respects_the_threshold():
+    assert compress_all(b'x' * 99, 100) == {}
+    variants = compress_all(b'x' * 100, 100)
+    assert set(variants) == {'br', 'gzip'}
+    assert brotli.decompress(variants['br']) == b'x' * 100
+
+
+@pytest.fixture
+def small_threshold(app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'COMPRESS_MIN_SIZE', 64)
+
+
+@pytest.mark.parametrize('encoding, decompress', [('br', brotli.decompress), ('gzip', gzip.decompress)])
+def test_cached_response_is_served_compressed(client, small_threshold, encoding, decompress):
+    plain = client.get('/api/content')
+    assert 'Content-Encoding' not in plain.headers
+    # The first response fills the cache, the second is served from its stored variants
+    for _ in range(2):
+        response = client.get('/api/content', headers={'Accept-Encoding': encoding})
+        assert response.headers['Content-Encoding'] == encoding
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert decompress(response.data) == plain.data
+
+
+def test_uncached_response_is_compressed(client, auth, small_threshold):
+    response = client.get('/api/stats', headers={**auth, 'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.data))
+
+
+def test_small_responses_are_sent_as_they_are(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'COMPRESS_MIN_SIZE', 10 ** 9)
+    response = client.get('/api/content', headers={'Accept-Encoding': 'br, gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()
+
+
+def test_compression_can_be_turned_off(app_module, client, small_threshold, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'COMPRESS', False)
+    response = client.get('/api/content', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
@@ -0,0 +1,57 @@
+import pytest
+
+
+def write_elsewhere(app_module, sql, params=()):
+    """Commit a write the way another worker would: nothing in this process is invalidated."""
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.execute(sql, params)
+        conn.execute("UPDATE table_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP "
+                     "WHERE name = 'services'")
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+
+
+def titles(response):
+    return [service['title'] for service in response.get_json()]
+
+
+def test_write_in_another_worker_invalidates_cache_and_etag(app_module, client):
+    first = client.get('/api/services')
+    assert client.get('/api/services').headers['ETag'] == first.headers['ETag']  # served from the cache
+
+    write_elsewhere(app_module, "INSERT INTO services (title, order_num) VALUES ('From worker B', 99)")
+
+    second = client.get('/api/services')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert 'From worker B' in titles(second)
+    # The old validator no longer matches, so clients holding the old body get the new one
+    revalidated = client.get('/api/services', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 200
+    assert 'From worker B' in titles(revalidated)
+
+
+def test_unchanged_tables_answer_304(client):
+    etag = client.get('/api/services').headers['ETag']
+    assert client.get('/api/services', headers={'If-None-Match': etag}).status_code == 304
+
+
+@pytest.mark.parametrize('path', ['/api/bootstrap', '/api/bootstrap?include=services'])
+def test_bootstrap_sections_follow_database_versions(app_module, client, path):
+    client.get(path)
+    write_elsewhere(app_module, "UPDATE services SET title = 'Renamed elsewhere' WHERE id = "
+                                "(SELECT MIN(id) FROM services WHERE is_active = 1)")
+    services = client.get(path).get_json()['services']
+    assert 'Renamed elsewhere' in [service['title'] for service in services]
+
+
+@pytest.mark.parametrize('path', ['/api/services', '/api/content/hero', '/api/bootstrap'])
+def test_304_repeats_vary_and_cache_control(client, path):
+    ok = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    not_modified = client.get(path, headers={'Accept-Encoding': 'gzip', 'If-None-Match': ok.headers['ETag']})
+
+    assert not_modified.status_code == 304
+    for header in ('Vary', 'Cache-Control', 'ETag'):
+        assert not_modified.headers[header] == ok.headers[header]
+    assert 'Accept-Encoding' in ok.headers['Vary']
@@ -0,0 +1,65 @@
+import fcntl
+import json
+import os
+
+import pytest
+
+from contact_queue import ContactQueue
+
+
+@pytest.fixture
+def queue(app_module, tmp_path):
+    # A long interval keeps the background flusher out of the way; tests flush explicitly
+    return ContactQueue(app_module.storage, str(tmp_path), batch_size=100, flush_interval=3600, fsync=False)
+
+
+def stored(app_module, email):
+    conn = app_module.storage.acquire()
+    try:
+        return [dict(row) for row in conn.execute(
+            'SELECT name, email, phone, message FROM contact_messages WHERE email = ? ORDER BY id', (email,))]
+    finally:
+        app_module.storage.release(conn)
+
+
+def spool_record(name, email):
+    return json.dumps({'name': name, 'email': email, 'phone': None, 'message': 'Hello',
+                       'created_at': '2026-01-01 00:00:00'}, ensure_ascii=False) + '\n'
+
+
+def test_flush_inserts_spooled_submissions(app_module, queue, tmp_path):
+    for i in range(3):
+        queue.submit(f'Sender {i}', 'flush@example.com', None, f'Message {i}')
+    assert queue.stats()['depth'] == 3
+    assert stored(app_module, 'flush@example.com') == []
+
+    queue.flush()
+
+    rows = stored(app_module, 'flush@example.com')
+    assert [row['message'] for row in rows] == ['Message 0', 'Message 1', 'Message 2']
+    stats = queue.stats()
+    assert (stats['depth'], stats['flushed'], stats['batches'], stats['backlog_files']) == (0, 3, 1, 0)
+    assert os.listdir(tmp_path) == []
+
+
+def test_orphaned_spool_is_replayed_on_start(app_module, queue, tmp_path):
+    # Left behind by a worker that crashed mid-write: the torn last line is skipped
+    orphan = tmp_path / 'contact-999999.ndjson.1.flushing'
+    orphan.write_text(spool_record('أحمد', 'replay@example.com') + spool_record('Sara', 'replay@example.com')
+                      + '{"name": "torn', encoding='utf-8')
+
+    queue.start()
+
+    assert [row['name'] for row in stored(app_module, 'replay@example.com')] == ['أحمد', 'Sara']
+    assert queue.stats()['replayed'] == 2
+    assert not orphan.exists()
+
+
+def test_spool_of_live_worker_is_left_alone(app_module, queue, tmp_path):
+    live = tmp_path / 'contact-888888.ndjson'
+    live.write_text(spool_record('Live', 'live@example.com'), encoding='utf-8')
+    with open(live, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        queue.start()
+        assert stored(app_module, 'live@example.com') == []
+        assert live.exists()
@@ -0,0 +1,62 @@
+import pytest
+
+
+@pytest.fixture
+def drift(app_module):
+    def check():
+        conn = app_module.storage.acquire(write=True)
+        try:
+            return app_module.rebuild_counters(conn)
+        finally:
+            conn.rollback()
+            app_module.storage.release(conn)
+    return check
+
+
+def stats(client, auth):
+    return client.get('/api/stats', headers=auth).get_json()
+
+
+def test_null_flag_on_update(client, auth, drift):
+    service_id = client.post('/api/services', json={'title': 'Nullable'}, headers=auth).get_json()['id']
+    before = stats(client, auth)['services']
+
+    response = client.put(f'/api/services/{service_id}', json={'title': 'Nullable', 'is_active': None},
+                          headers=auth)
+
+    assert response.status_code == 200
+    assert stats(client, auth)['services'] == before - 1
+    assert drift() == {}
+
+    client.put(f'/api/services/{service_id}', json={'title': 'Nullable', 'is_active': 1}, headers=auth)
+    assert stats(client, auth)['services'] == before
+    assert drift() == {}
+
+
+def test_null_flags_in_bulk(client, auth, drift):
+    before = stats(client, auth)
+    response = client.post('/api/news/bulk', headers=auth, json={
+        'create': [{'title': 'Null flag', 'is_active': None}, {'title': 'Active', 'is_active': 1}],
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+    assert stats(client, auth)['news'] == before['news'] + 1
+    assert drift() == {}
+
+
+def test_null_flag_on_delete(client, auth, drift):
+    testimonial_id = client.post('/api/testimonials', json={'name': 'Null'}, headers=auth).get_json()['id']
+    client.put(f'/api/testimonials/{testimonial_id}', json={'name': 'Null', 'is_active': None}, headers=auth)
+
+    assert client.delete(f'/api/testimonials/{testimonial_id}', headers=auth).status_code == 200
+    assert drift() == {}
+
+
+def test_message_counters(client, auth, drift):
+    before = stats(client, auth)
+    client.post('/api/contact', json={'name': 'Counter', 'email': 'counter@example.com', 'message': 'Hi'})
+    after = stats(client, auth)
+    assert (after['total_messages'], after['unread_messages']) == (before['total_messages'] + 1,
+                                                                   before['unread_messages'] + 1)
+    assert drift() == {}
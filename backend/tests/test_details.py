@@ -0,0 +1,79 @@
+import pytest
+
+# order_num, active; far after the seeded projects, so the neighbours are predictable
+PROJECTS = [(9001, 1), (9002, 0), (9003, 1), (9004, 1)]
+
+
+@pytest.fixture
+def projects(app_module, client, auth):
+    """{order_num: id} of four projects in one location; 9002 is inactive."""
+    client.post('/api/projects/bulk', headers=auth, json={'create': [
+        {'title': f'Detail {order}', 'location': 'سرت', 'order_num': order, 'is_active': active}
+        for order, active in PROJECTS
+    ]})
+    conn = app_module.storage.acquire()
+    try:
+        rows = conn.execute("SELECT id, order_num FROM projects WHERE location = 'سرت'").fetchall()
+    finally:
+        app_module.storage.release(conn)
+    ids = {row['order_num']: row['id'] for row in rows}
+    yield ids
+    client.post('/api/projects/bulk', headers=auth, json={'delete': list(ids.values())})
+
+
+def test_detail_has_neighbours_and_related_items(client, projects):
+    body = client.get(f'/api/projects/{projects[9003]}').get_json()
+
+    assert body['item']['title'] == 'Detail 9003'
+    # The inactive project in between is skipped
+    assert body['prev']['id'] == projects[9001]
+    assert body['next']['id'] == projects[9004]
+    assert [item['id'] for item in body['related']] == [projects[9001], projects[9004]]
+    assert set(body['related'][0]) == {'id', 'title', 'image', 'location'}
+
+
+def test_last_item_has_no_next(client, projects):
+    body = client.get(f'/api/projects/{projects[9004]}').get_json()
+    assert body['next'] is None
+    assert body['prev']['id'] == projects[9003]
+
+
+@pytest.mark.parametrize('path', ['/api/projects/{inactive}', '/api/projects/999999', '/api/news/999999'])
+def test_missing_or_inactive_items_answer_404(client, projects, path):
+    response = client.get(path.format(inactive=projects[9002]))
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_detail_revalidates_with_its_etag(client, auth, projects):
+    path = f'/api/projects/{projects[9001]}'
+    first = client.get(path)
+    etag = first.headers['ETag']
+
+    not_modified = client.get(path, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+
+    client.put(path, headers=auth, json={'title': 'Detail renamed', 'location': 'سرت', 'order_num': 9001})
+    changed = client.get(path, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['item']['title'] == 'Detail renamed'
+
+
+def test_news_detail(client, auth):
+    ids = [client.post('/api/news', headers=auth, json={'title': f'Detail news {i}', 'category': 'تفاصيل'})
+           .get_json()['id'] for i in range(2)]
+    try:
+        response = client.get(f'/api/news/{ids[0]}')
+        body = response.get_json()
+        assert body['item']['title'] == 'Detail news 0'
+        # Newest first: the later article is the previous one
+        assert body['prev']['id'] == ids[1]
+        assert [item['id'] for item in body['related']] == [ids[1]]
+        assert set(body['related'][0]) == {'id', 'title', 'image', 'date'}
+        etag = response.headers['ETag']
+        assert client.get(f'/api/news/{ids[0]}', headers={'If-None-Match': etag}).status_code == 304
+    finally:
+        for news_id in ids:
+            client.delete(f'/api/news/{news_id}', headers=auth)
@@ -0,0 +1,104 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import images
+from images import ImageBusy, ImagePipeline, ImageTooLarge
+
+
+def png(path, size=(40, 30)):
+    Image.new('RGB', size, (200, 80, 20)).save(path, format='PNG')
+    return str(path)
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    (tmp_path / 'out').mkdir()
+    (tmp_path / 'meta').mkdir()
+    pipeline = ImagePipeline(str(tmp_path / 'out'), str(tmp_path / 'meta'), workers=1, timeout=30)
+    yield pipeline
+    if pipeline._executor is not None:
+        pipeline._executor.shutdown()
+
+
+@pytest.fixture
+def max_pixels(monkeypatch):
+    # _open() sets Pillow's global limit too; put it back afterwards
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', Image.MAX_IMAGE_PIXELS)
+    monkeypatch.setattr(images, 'MAX_PIXELS', 1000)
+
+
+def test_pixel_limit_is_exact(tmp_path, max_pixels):
+    # 1200 pixels: over MAX_PIXELS, but below the 2x where Pillow itself refuses
+    with pytest.raises(ImageTooLarge):
+        images._open(png(tmp_path / 'big.png', (40, 30)))
+    images._open(png(tmp_path / 'ok.png', (40, 25))).close()
+
+
+def test_pipeline_recovers_from_broken_pool(pipeline, tmp_path):
+    executor = pipeline._pool()
+    with pytest.raises(images.BrokenProcessPool):
+        executor.submit(os._exit, 1).result()
+
+    result = pipeline.process(png(tmp_path / 'a.png'), 'a')
+    assert result['width'] == 40
+    assert pipeline._executor is not executor
+
+
+def test_timeout_is_reported_as_busy(pipeline, tmp_path):
+    pipeline.timeout = 0
+    with pytest.raises(ImageBusy):
+        pipeline.process(png(tmp_path / 'a.png'), 'a')
+
+
+def test_variants_are_published_whole(pipeline, tmp_path):
+    stem, result = pipeline.ingest(png(tmp_path / 'a.png'))
+    written = sorted(os.listdir(pipeline.out_dir))
+    assert written == sorted(f for v in result['variants'].values() for f in v['files'].values())
+    assert all(f.startswith(stem + '-') for f in written)
+    assert os.listdir(pipeline.meta_dir) == [stem + '.json']
+
+
+def test_failed_write_leaves_nothing_behind(tmp_path):
+    path = str(tmp_path / 'x-card.webp')
+
+    def write(f):
+        f.write(b'half an image')
+        raise OSError('disk full')
+
+    with pytest.raises(OSError):
+        images._write_atomic(path, write)
+    assert os.listdir(tmp_path) == []
+
+    images._write_atomic(path, lambda f: f.write(b'whole'))
+    assert os.listdir(tmp_path) == ['x-card.webp']
+    assert oct(os.stat(path).st_mode & 0o777) == oct(0o666 & ~current_umask())
+
+
+def current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def upload(client, auth, size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 200)).save(buffer, format='PNG')
+    buffer.seek(0)
+    return client.post('/api/upload', data={'file': (buffer, 'photo.png')}, headers=auth,
+                       content_type='multipart/form-data')
+
+
+def test_upload_too_large_answers_413(app_module, client, auth, pipeline, monkeypatch, max_pixels):
+    monkeypatch.setattr(app_module, 'image_pipeline', pipeline)
+    assert upload(client, auth, (40, 30)).status_code == 413
+
+
+def test_upload_timeout_answers_503(app_module, client, auth, pipeline, monkeypatch):
+    pipeline.timeout = 0
+    monkeypatch.setattr(app_module, 'image_pipeline', pipeline)
+    response = upload(client, auth, (41, 31))
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
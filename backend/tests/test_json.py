@@ -0,0 +1,77 @@
+import base64
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+
+from jsonprovider import FastJSONProvider
+
+VALUES = {
+    'text': 'القمح الليبي',
+    'created_at': datetime.datetime(2024, 5, 10, 8, 30, 15),
+    'aware': datetime.datetime(2024, 5, 10, 8, 30, 15, 250000, tzinfo=datetime.timezone.utc),
+    'date': datetime.date(2024, 5, 10),
+    'price': decimal.Decimal('12.50'),
+    'ref': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'blob': b'\x00\xffPNG',
+    'count': 3,
+    'ratio': 0.5,
+    'none': None,
+    'flags': [True, False],
+}
+
+EXPECTED = {
+    'text': 'القمح الليبي',
+    'created_at': '2024-05-10T08:30:15',
+    'aware': '2024-05-10T08:30:15.250000+00:00',
+    'date': '2024-05-10',
+    'price': '12.50',
+    'ref': '12345678-1234-5678-1234-567812345678',
+    'blob': base64.b64encode(b'\x00\xffPNG').decode(),
+    'count': 3,
+    'ratio': 0.5,
+    'none': None,
+    'flags': [True, False],
+}
+
+
+@pytest.fixture(params=[True, False], ids=['orjson', 'stdlib'])
+def provider(request, app_module):
+    provider = FastJSONProvider(app_module.app, use_orjson=request.param)
+    assert provider.use_orjson is request.param
+    return provider
+
+
+def test_values_round_trip(provider):
+    encoded = provider.dumpb(VALUES)
+    assert json.loads(encoded) == EXPECTED
+    assert provider.loads(provider.dumps(VALUES)) == EXPECTED
+
+
+def test_text_is_raw_utf8(provider):
+    encoded = provider.dumpb({'title': 'قمح'})
+    assert encoded == '{"title":"قمح"}'.encode()
+    assert b'\\u' not in encoded
+
+
+def test_both_paths_write_the_same_bytes(app_module):
+    # ETags and snapshot hashes must not change with JSON_ORJSON
+    fast = FastJSONProvider(app_module.app, use_orjson=True)
+    plain = FastJSONProvider(app_module.app, use_orjson=False)
+    obj = {'b': [1, 2.5, 'ب'], 'a': {'z': None, 'y': datetime.date(2024, 1, 2)}}
+    assert fast.dumpb(obj) == plain.dumpb(obj)
+    assert list(json.loads(fast.dumpb(obj))) == ['a', 'b']
+
+
+def test_unknown_types_are_rejected(provider):
+    with pytest.raises(TypeError):
+        provider.dumpb({'value': object()})
+
+
+def test_responses_are_utf8_json(client):
+    response = client.get('/api/content/hero')
+    assert response.mimetype == 'application/json'
+    assert 'تواصل معنا'.encode() in response.data
+    assert b'\\u' not in response.data
@@ -0,0 +1,18 @@
+def test_metrics_hidden_without_token(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'METRICS_TOKEN', None)
+    monkeypatch.setitem(app_module.app.config, 'METRICS_PUBLIC', False)
+    assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setitem(app_module.app.config, 'METRICS_PUBLIC', True)
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert b'# TYPE lfc_' in response.data
+
+
+def test_metrics_require_bearer_token(app_module, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'METRICS_TOKEN', 's3cret')
+    monkeypatch.setitem(app_module.app.config, 'METRICS_PUBLIC', True)  # a token always takes precedence
+
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code == 200
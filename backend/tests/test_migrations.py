@@ -0,0 +1,114 @@
+import pytest
+
+from db import create_storage
+from search import arabic_normalize, search
+
+
+@pytest.fixture
+def fresh(app_module, monkeypatch, tmp_path):
+    """Point the app at an empty database; the session database is put back afterwards."""
+    storage = create_storage('sqlite:///' + str(tmp_path / 'fresh.db'),
+                             functions={'arabic_normalize': arabic_normalize})
+    monkeypatch.setattr(app_module, 'storage', storage)
+    monkeypatch.setattr(app_module, 'schema_ready', False)
+    return storage
+
+
+def query(storage, sql, params=()):
+    conn = storage.acquire()
+    try:
+        return [dict(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        storage.release(conn)
+
+
+def write(storage, sql, params=()):
+    conn = storage.acquire(write=True)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        storage.release(conn)
+
+
+def migrate_to(app_module, monkeypatch, version):
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module, 'MIGRATIONS', [m for m in app_module.MIGRATIONS if m[0] <= version])
+        return app_module.migrate_schema()
+
+
+def test_empty_database_gets_every_migration_once(app_module, fresh):
+    applied = app_module.migrate_schema()
+    assert [version for version, _ in applied] == [m[0] for m in app_module.MIGRATIONS]
+    assert app_module.migrate_schema() == []
+    versions = query(fresh, 'SELECT version FROM schema_version ORDER BY version')
+    assert [row['version'] for row in versions] == list(range(1, app_module.SCHEMA_VERSION + 1))
+
+
+def test_older_schema_is_brought_up_to_date(app_module, fresh, monkeypatch):
+    assert [v for v, _ in migrate_to(app_module, monkeypatch, 4)] == [1, 2, 3, 4]
+    # Rows written before the search tables and the change log existed
+    write(fresh, "INSERT INTO news (title, content) VALUES ('شحنة القمح', 'وصلت')")
+
+    applied = app_module.migrate_schema()
+
+    assert [v for v, _ in applied] == list(range(5, app_module.SCHEMA_VERSION + 1))
+    conn = fresh.acquire()
+    try:
+        hits, _ = search(conn, ['news'], 'قمح')
+        assert [hit['title'] for hit in hits] == ['شحنة القمح']
+        assert app_module.rebuild_counters(conn) == {}
+    finally:
+        conn.rollback()
+        fresh.release(conn)
+
+
+def test_database_from_before_versioning_is_adopted(app_module, fresh):
+    # init_db() used to create the tables without recording a schema version
+    conn = fresh.acquire(write=True)
+    try:
+        app_module.create_tables(conn)
+        conn.execute("INSERT INTO services (title, order_num) VALUES ('Legacy', 1)")
+        conn.commit()
+    finally:
+        fresh.release(conn)
+
+    app_module.migrate_schema()
+
+    assert query(fresh, "SELECT title FROM services WHERE title = 'Legacy'") == [{'title': 'Legacy'}]
+    assert query(fresh, 'SELECT MAX(version) AS v FROM schema_version')[0]['v'] == app_module.SCHEMA_VERSION
+
+
+def test_every_step_can_run_twice(app_module, fresh):
+    app_module.migrate_schema()
+    counts = 'SELECT (SELECT COUNT(*) FROM users) AS users, (SELECT COUNT(*) FROM site_content) AS content, ' \
+             '(SELECT COUNT(*) FROM services) AS services, (SELECT COUNT(*) FROM news_fts) AS indexed'
+    before = query(fresh, counts)
+
+    conn = fresh.acquire(write=True)
+    try:
+        for _, _, step in app_module.MIGRATIONS:
+            step(conn)
+        conn.commit()
+    finally:
+        fresh.release(conn)
+
+    assert query(fresh, counts) == before
+
+
+def test_outdated_schema_without_auto_migrate_answers_503(app_module, fresh, monkeypatch, client):
+    migrate_to(app_module, monkeypatch, 3)
+    monkeypatch.setitem(app_module.app.config, 'AUTO_MIGRATE', False)
+
+    assert app_module.check_schema() == 3
+    assert client.get('/api/services').status_code == 503
+
+    app_module.migrate_schema()
+    assert client.get('/api/services').status_code == 200
+
+
+def test_boot_check_migrates_when_allowed(app_module, fresh, monkeypatch):
+    migrate_to(app_module, monkeypatch, 6)
+    monkeypatch.setitem(app_module.app.config, 'AUTO_MIGRATE', True)
+    assert app_module.check_schema() == app_module.SCHEMA_VERSION
+    assert app_module.schema_ready
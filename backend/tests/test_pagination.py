@@ -0,0 +1,119 @@
+import pytest
+
+# Far in the future, so these rows are the newest and fill the first pages
+STAMPS = ['2999-01-03 00:00:00', '2999-01-02 00:00:00', '2999-01-02 00:00:00', '2999-01-01 00:00:00',
+          '2999-01-01 00:00:00']
+
+
+def write(app_module, table, sql, rows=((),)):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.executemany(sql, rows)
+        conn.execute('UPDATE table_versions SET version = version + 1 WHERE name = ?', (table,))
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+
+
+@pytest.fixture
+def newest(app_module):
+    """Ids of five news rows, newest first; two pairs share a created_at, so id breaks the tie."""
+    write(app_module, 'news', 'INSERT INTO news (title, content, created_at) VALUES (?, ?, ?)',
+          [(f'Paged {i}', 'نص طويل ' * 50, stamp) for i, stamp in enumerate(STAMPS)])
+    conn = app_module.storage.acquire()
+    try:
+        rows = conn.execute("SELECT id FROM news WHERE title LIKE 'Paged %' "
+                            "ORDER BY created_at DESC, id DESC").fetchall()
+    finally:
+        app_module.storage.release(conn)
+    yield [row['id'] for row in rows]
+    write(app_module, 'news', "DELETE FROM news WHERE title LIKE 'Paged %'")
+
+
+def test_pages_follow_the_cursor_without_gaps_or_repeats(client, newest):
+    seen, url = [], '/api/news?limit=2'
+    while len(seen) < len(newest):
+        response = client.get(url)
+        page = response.get_json()
+        assert len(page) == 2 or len(seen) + len(page) >= len(newest)
+        seen.extend(item['id'] for item in page)
+        url = '/api/news?limit=2&after=' + response.headers['X-Next-Cursor']
+    assert seen[:len(newest)] == newest
+
+
+def test_cursor_points_at_the_last_item(client, newest):
+    response = client.get('/api/news?limit=3')
+    last = response.get_json()[-1]
+    assert last['id'] == newest[2]
+    assert response.headers['X-Next-Cursor'] == f"{last['created_at']},{last['id']}"
+
+
+def test_last_page_has_no_cursor(client, newest):
+    response = client.get('/api/news?limit=100')
+    assert 'X-Next-Cursor' not in response.headers
+    assert len(response.get_json()) < 100 or response.get_json()[-1]['id'] not in newest
+
+
+def test_page_view_leaves_out_content(client, newest):
+    item = client.get('/api/news?limit=1').get_json()[0]
+    assert 'content' not in item
+    assert {'id', 'title', 'excerpt', 'created_at'} <= set(item)
+
+
+def test_fields_projection_keeps_the_cursor_columns(client, newest):
+    response = client.get('/api/news?limit=1&fields=title,content')
+    item = response.get_json()[0]
+    assert set(item) == {'title', 'content', 'id', 'created_at'}
+    assert item['content'].startswith('نص طويل')
+    assert response.headers['X-Next-Cursor'] == f"{item['created_at']},{item['id']}"
+
+
+def test_unpaged_news_keeps_the_full_rows(client, newest):
+    items = client.get('/api/news').get_json()
+    assert [item['id'] for item in items[:len(newest)]] == newest
+    assert 'content' in items[0]
+
+
+@pytest.mark.parametrize('query, error', [
+    ('fields=title,secret', 'Unknown fields: secret'),
+    ('limit=ten', 'limit must be an integer'),
+    ('after=2999-01-01', 'after must be <created_at>,<id>'),
+    ('after=2999-01-01,abc', 'after must be <created_at>,<id>'),
+    ('after=,5', 'after must be <created_at>,<id>'),
+])
+def test_bad_page_arguments_answer_400(client, query, error):
+    response = client.get('/api/news?' + query)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+
+def test_limit_is_clamped(client, newest):
+    assert len(client.get('/api/news?limit=0').get_json()) == 1
+    assert len(client.get('/api/news?limit=100000').get_json()) <= 100
+
+
+def test_inbox_pages_and_unpaged_default(app_module, client, auth):
+    write(app_module, 'contact_messages',
+          'INSERT INTO contact_messages (name, email, message, created_at) VALUES (?, ?, ?, ?)',
+          [(f'Sender {i}', f's{i}@example.com', 'رسالة', stamp) for i, stamp in enumerate(STAMPS)])
+    try:
+        first = client.get('/api/contact?limit=2', headers=auth)
+        assert [m['name'] for m in first.get_json()] == ['Sender 0', 'Sender 2']
+        assert 'message' not in first.get_json()[0]
+
+        second = client.get('/api/contact?limit=2&after=' + first.headers['X-Next-Cursor'], headers=auth)
+        assert [m['name'] for m in second.get_json()] == ['Sender 1', 'Sender 4']
+
+        # The admin UI loads the inbox without parameters: every message, bodies included
+        everything = client.get('/api/contact', headers=auth)
+        assert everything.is_streamed
+        messages = everything.get_json()
+        assert 'X-Next-Cursor' not in everything.headers
+        assert [m['name'] for m in messages[:5]] == ['Sender 0', 'Sender 2', 'Sender 1', 'Sender 4', 'Sender 3']
+        assert messages[0]['message'] == 'رسالة'
+    finally:
+        write(app_module, 'contact_messages', "DELETE FROM contact_messages WHERE name LIKE 'Sender %'")
+
+
+def test_inbox_requires_a_token(client):
+    assert client.get('/api/contact?limit=2').status_code == 401
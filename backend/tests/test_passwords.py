@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from passwords import PasswordBusy, PasswordHasher, hash_prefix
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'scrypt:16384:8:1', 'pbkdf2', 'pbkdf2:sha256',
+                                    'pbkdf2:sha512:600000'])
+def test_prefix_matches_werkzeug(method):
+    assert hash_prefix(method) == generate_password_hash('', method).split('$', 1)[0]
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError):
+        hash_prefix('md5')
+
+
+def test_needs_rehash():
+    hasher = PasswordHasher('pbkdf2:sha256:1000')
+    assert not hasher.needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:1000'))
+    assert hasher.needs_rehash(generate_password_hash('x', 'pbkdf2:sha256:2000'))
+
+
+def test_slow_check_times_out_as_busy():
+    release = threading.Event()
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, timeout=0.05)
+    with pytest.raises(PasswordBusy):
+        hasher._run(release.wait)
+    # Still counted while the hash runs on, so the pending limit bounds real work
+    assert hasher.stats()['pending'] == 1
+    release.set()
+    hasher._pool().submit(lambda: None).result()
+    stats = hasher.stats()
+    assert (stats['pending'], stats['timeouts']) == (0, 1)
+
+
+def test_pending_limit():
+    release = threading.Event()
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=1, timeout=5)
+    thread = threading.Thread(target=hasher._run, args=(release.wait,))
+    thread.start()
+    while hasher.stats()['pending'] == 0:
+        pass
+    with pytest.raises(PasswordBusy):
+        hasher.verify('pbkdf2:sha256:1000$salt$hash', 'x')
+    release.set()
+    thread.join()
+    assert hasher.stats()['rejected'] == 1
+
+
+def test_login_answers_503_on_timeout(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module.password_hasher, 'timeout', 0)
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_identity_follows_users_changes_from_other_workers(app_module, client, auth):
+    assert client.get('/api/auth/me', headers=auth).get_json()['email'] == 'admin@foodcompany.ly'
+
+    # Written through another connection, as another worker would: no local invalidation
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.execute("UPDATE users SET email = 'changed@foodcompany.ly' WHERE username = 'admin'")
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'users'")
+        conn.commit()
+        assert client.get('/api/auth/me', headers=auth).get_json()['email'] == 'changed@foodcompany.ly'
+    finally:
+        conn.execute("UPDATE users SET email = 'admin@foodcompany.ly' WHERE username = 'admin'")
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'users'")
+        conn.commit()
+        app_module.storage.release(conn)
+
+
+def test_rehash_runs_before_the_writer_is_taken(app_module, client, monkeypatch):
+    hasher = app_module.password_hasher
+    hash_password = hasher.hash
+    writer_held = []
+
+    def watched(password):
+        writer_held.append(app_module.storage._writer_lock.locked())
+        return hash_password(password)
+
+    monkeypatch.setattr(hasher, 'needs_rehash', lambda stored: True)
+    monkeypatch.setattr(hasher, 'hash', watched)
+    response = client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'})
+
+    assert response.status_code == 200
+    assert writer_held == [False]
+    monkeypatch.undo()
+    assert client.post('/api/auth/login', json={'username': 'admin', 'password': 'admin123'}).status_code == 200
@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from db import PoolTimeout, PostgresConnection, create_storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = create_storage('sqlite:///' + str(tmp_path / 'pool.db'), max_readers=2, timeout=0.2)
+    conn = storage.acquire(write=True)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.commit()
+    storage.release(conn)
+    return storage
+
+
+def test_readers_are_reused(storage):
+    conn = storage.acquire()
+    storage.release(conn)
+    assert storage.acquire() is conn
+    stats = storage.stats()
+    assert (stats['misses'], stats['hits'], stats['readers_open']) == (1, 1, 1)
+
+
+def test_exhausted_reader_pool_times_out(storage):
+    held = [storage.acquire(), storage.acquire()]
+    with pytest.raises(PoolTimeout):
+        storage.acquire()
+    stats = storage.stats()
+    assert (stats['readers_open'], stats['waits'], stats['timeouts']) == (2, 1, 1)
+
+    storage.release(held.pop())
+    assert storage.acquire() is not None
+
+
+def test_waiting_reader_gets_released_connection(storage):
+    held = [storage.acquire(), storage.acquire()]
+    timer = threading.Timer(0.05, storage.release, (held[0],))
+    timer.start()
+    assert storage.acquire() is held[0]
+    timer.join()
+
+
+def test_single_writer(storage):
+    writer = storage.acquire(write=True)
+    errors = []
+
+    def second_writer():
+        try:
+            storage.acquire(write=True)
+        except PoolTimeout as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+    assert storage.stats()['writer_waits'] == 1
+
+    storage.release(writer)
+    assert storage.acquire(write=True) is writer
+    storage.release(writer)
+
+
+def test_release_rolls_back_open_transaction(storage):
+    writer = storage.acquire(write=True)
+    writer.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+    storage.release(writer)
+
+    reader = storage.acquire()
+    assert reader.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('url', ['sqlite:///:memory:', None])
+def test_reads_overlap_write_transaction(tmp_path, url):
+    storage = create_storage(url or 'sqlite:///' + str(tmp_path / 'wal.db'), timeout=0.2)
+    writer = storage.acquire(write=True)
+    writer.execute('CREATE TABLE items (id INTEGER PRIMARY KEY)')
+    writer.commit()
+    writer.execute('INSERT INTO items DEFAULT VALUES')
+
+    # WAL: readers see the last commit while the write transaction is open
+    reader = storage.acquire()
+    assert reader.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    writer.commit()
+    assert reader.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 1
+
+
+@pytest.mark.parametrize('url', ['sqlite://database.db', 'mysql://localhost/db', 'database.db'])
+def test_unsupported_urls_are_rejected(url):
+    with pytest.raises(ValueError):
+        create_storage(url)
+
+
+def test_sqlite_stream_steps_through_rows(storage):
+    conn = storage.acquire(write=True)
+    conn.executemany('INSERT INTO items (name) VALUES (?)', [(f'item {i}',) for i in range(5)])
+    conn.commit()
+    cursor = conn.stream('SELECT name FROM items WHERE id > ? ORDER BY id', (1,))
+    assert [row['name'] for row in cursor.fetchmany(2)] == ['item 1', 'item 2']
+    assert [row['name'] for row in cursor.fetchmany(5)] == ['item 3', 'item 4']
+    storage.release(conn)
+
+
+class FakeRaw:
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self, name=None):
+        cursor = FakeCursor(name)
+        self.cursors.append(cursor)
+        return cursor
+
+
+class FakeCursor:
+    def __init__(self, name):
+        self.name = name
+
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+
+def test_postgres_stream_uses_a_server_side_cursor():
+    raw = FakeRaw()
+    cursor = PostgresConnection(raw, pool=None).stream('SELECT * FROM news WHERE is_active = ?', (True,))
+    # Named cursors are server-side in psycopg: fetchmany() pulls one batch per round trip
+    assert cursor.name.startswith('lfc_stream_')
+    assert (cursor.sql, cursor.params) == ('SELECT * FROM news WHERE is_active = %s', (1,))
+    assert PostgresConnection(raw, pool=None).stream('SELECT 1').name != cursor.name
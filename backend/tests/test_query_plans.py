@@ -0,0 +1,22 @@
+def test_list_queries_use_indexes(app_module):
+    conn = app_module.storage.acquire()
+    try:
+        plans = list(app_module.query_plans(conn))
+    finally:
+        app_module.storage.release(conn)
+
+    sorting = {sql: plan for sql, plan, sorts in plans if sorts}
+    assert not sorting, f'Statements sorting in a temp B-tree: {sorting}'
+
+
+def test_plans_cover_detail_neighbours(app_module):
+    conn = app_module.storage.acquire()
+    try:
+        statements = app_module.list_statements(conn)
+    finally:
+        app_module.storage.release(conn)
+
+    for table, queries in app_module.DETAIL_QUERIES.items():
+        for name, sql in queries.items():
+            assert sql in statements, f'{table} {name} query was not captured'
+    assert app_module.INBOX_QUERY in statements
@@ -0,0 +1,87 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBuckets, RateLimiter, parse_limit
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, 'time', clock)
+    return clock
+
+
+def test_parse_limit():
+    assert parse_limit('10/minute') == (10 / 60, 10)
+    assert parse_limit('5/seconds') == (5, 5)
+    assert parse_limit('3') == (3, 3)
+
+
+def test_bucket_refills_over_time(clock):
+    limiter = RateLimiter(MemoryBuckets(), {'contact': '2/minute'})
+    assert limiter.check('contact', ['ip:a']) == (True, 0.0)
+    assert limiter.check('contact', ['ip:a']) == (True, 0.0)
+
+    allowed, retry_after = limiter.check('contact', ['ip:a'])
+    assert not allowed
+    assert retry_after == pytest.approx(30)
+
+    clock.now += 29
+    assert not limiter.check('contact', ['ip:a'])[0]
+    clock.now += 31  # 30 s refill one token
+    assert limiter.check('contact', ['ip:a'])[0]
+    assert limiter.stats()['contact']['limited'] == 2
+
+
+def test_buckets_are_per_key_and_capped(clock):
+    limiter = RateLimiter(MemoryBuckets(), {'login': '1/minute'})
+    assert limiter.check('login', ['ip:a'])[0]
+    assert limiter.check('login', ['ip:b'])[0]
+    # Checked against both keys: one empty bucket is enough to reject
+    assert limiter.check('login', ['ip:c', 'user:admin'])[0]
+    assert not limiter.check('login', ['ip:d', 'user:admin'])[0]
+
+    clock.now += 3600  # a full bucket holds capacity tokens, no more
+    assert limiter.check('login', ['ip:a'])[0]
+    assert not limiter.check('login', ['ip:a'])[0]
+
+
+def test_rejected_request_takes_no_tokens(clock):
+    limiter = RateLimiter(MemoryBuckets(), {'login': '2/minute'})
+    assert limiter.check('login', ['ip:attacker'])[0]
+    assert limiter.check('login', ['ip:attacker'])[0]
+
+    # Already limited by IP: hammering the victim's username must not drain its bucket
+    for _ in range(10):
+        assert not limiter.check('login', ['ip:attacker', 'user:victim'])[0]
+    assert limiter.check('login', ['ip:victim', 'user:victim'])[0]
+    assert limiter.check('login', ['ip:victim', 'user:victim'])[0]
+    assert not limiter.check('login', ['ip:other', 'user:victim'])[0]
+
+
+def test_unlimited_endpoint_always_allowed():
+    limiter = RateLimiter(MemoryBuckets(), {'contact': '1/minute'})
+    assert all(limiter.check('other', ['ip:a'])[0] for _ in range(10))
+
+
+def test_contact_answers_429_with_retry_after(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'rate_limiter', RateLimiter(MemoryBuckets(), {'contact': '2/minute'}))
+    body = {'name': 'Limited', 'email': 'limited@example.com', 'message': 'Hi'}
+
+    assert client.post('/api/contact', json=body).status_code == 201
+    assert client.post('/api/contact', json=body).status_code == 201
+    response = client.post('/api/contact', json=body)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '30'
+    # Other clients have their own bucket
+    other = client.post('/api/contact', json=body, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other.status_code == 201
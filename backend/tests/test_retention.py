@@ -0,0 +1,162 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from retention import MaintenanceScheduler, archive_batch, claim_run, compact_sqlite, retention_cutoff
+
+NOW = datetime(2024, 6, 30, 12, 0, 0)
+
+MESSAGES = [
+    # name, is_read, created_at
+    ('Retained old 0', 1, '2020-01-01 00:00:00'),
+    ('Retained old 1', 1, '2020-01-02 00:00:00'),
+    ('Retained old 2', 1, '2020-01-03 00:00:00'),
+    ('Retained unread', 0, '2020-01-01 00:00:00'),
+    ('Retained recent', 1, '2999-01-01 00:00:00'),
+]
+
+
+def write(app_module, sql, rows=((),)):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.executemany(sql, rows)
+        conn.execute("UPDATE table_versions SET version = version + 1 WHERE name = 'contact_messages'")
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+
+
+def names(app_module, table):
+    conn = app_module.storage.acquire()
+    try:
+        rows = conn.execute(f"SELECT name FROM {table} WHERE name LIKE 'Retained %' ORDER BY name").fetchall()
+    finally:
+        app_module.storage.release(conn)
+    return [row['name'] for row in rows]
+
+
+@pytest.fixture
+def messages(app_module):
+    write(app_module, 'INSERT INTO contact_messages (name, email, message, is_read, created_at) '
+                      "VALUES (?, 'retained@example.com', 'رسالة قديمة', ?, ?)", MESSAGES)
+    yield
+    write(app_module, "DELETE FROM contact_messages WHERE name LIKE 'Retained %'")
+    write(app_module, "DELETE FROM contact_messages_archive WHERE name LIKE 'Retained %'")
+
+
+def test_retention_cutoff():
+    assert retention_cutoff(30, now=NOW) == '2024-05-31 12:00:00'
+
+
+def test_archive_batch_moves_the_oldest_read_messages(app_module, messages):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        assert archive_batch(conn, '2024-01-01 00:00:00', 2) == 2
+        moved = conn.execute("SELECT name, message, is_read, created_at FROM contact_messages_archive "
+                             "WHERE name LIKE 'Retained %' ORDER BY name").fetchall()
+        assert [dict(row) for row in moved] == [
+            {'name': 'Retained old 0', 'message': 'رسالة قديمة', 'is_read': 1, 'created_at': '2020-01-01 00:00:00'},
+            {'name': 'Retained old 1', 'message': 'رسالة قديمة', 'is_read': 1, 'created_at': '2020-01-02 00:00:00'},
+        ]
+        assert archive_batch(conn, '2024-01-01 00:00:00', 2) == 1
+        assert archive_batch(conn, '2024-01-01 00:00:00', 2) == 0
+    finally:
+        conn.rollback()
+        app_module.storage.release(conn)
+
+
+def test_maintenance_archives_in_batches(app_module, monkeypatch, client, auth, messages):
+    monkeypatch.setitem(app_module.app.config, 'CONTACT_RETENTION_DAYS', 30)
+    monkeypatch.setitem(app_module.app.config, 'ARCHIVE_BATCH_SIZE', 2)
+    batches = []
+
+    def counting_batch(*args):
+        batches.append(archive_batch(*args))
+        return batches[-1]
+
+    monkeypatch.setattr(app_module, 'archive_batch', counting_batch)
+
+    result = app_module.run_maintenance(force=True)
+
+    assert result['archived'] == 3
+    assert batches == [2, 1]
+    assert names(app_module, 'contact_messages_archive') == ['Retained old 0', 'Retained old 1', 'Retained old 2']
+    # Unread and recent messages stay in the inbox
+    assert names(app_module, 'contact_messages') == ['Retained recent', 'Retained unread']
+    inbox = client.get('/api/contact', headers=auth).get_json()
+    assert not any(m['name'].startswith('Retained old') for m in inbox)
+
+
+def test_retention_is_off_by_default(app_module, messages):
+    assert app_module.app.config['CONTACT_RETENTION_DAYS'] == 0
+    assert app_module.run_maintenance(force=True)['archived'] == 0
+    assert names(app_module, 'contact_messages_archive') == []
+
+
+def test_archive_endpoint_pages(app_module, monkeypatch, client, auth, messages):
+    monkeypatch.setitem(app_module.app.config, 'CONTACT_RETENTION_DAYS', 30)
+    app_module.run_maintenance(force=True)
+
+    assert client.get('/api/contact/archive').status_code == 401
+    first = client.get('/api/contact/archive?limit=2', headers=auth)
+    page = first.get_json()
+    assert [m['name'] for m in page] == ['Retained old 2', 'Retained old 1']
+    assert 'message' not in page[0] and page[0]['archived_at']
+    second = client.get('/api/contact/archive?limit=2&after=' + first.headers['X-Next-Cursor'], headers=auth)
+    assert [m['name'] for m in second.get_json()] == ['Retained old 0']
+    assert 'X-Next-Cursor' not in second.headers
+
+    full = client.get('/api/contact/archive?limit=1&fields=name,message', headers=auth).get_json()
+    assert full[0]['message'] == 'رسالة قديمة'
+    assert client.get('/api/contact/archive?fields=password', headers=auth).status_code == 400
+
+
+def test_claim_run_once_per_interval(app_module):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.execute("INSERT INTO maintenance_runs (name) VALUES ('test-job')")
+        conn.commit()
+        assert claim_run(conn, 'test-job', 3600, now=NOW)
+        # A second worker inside the interval does not run it again
+        assert not claim_run(conn, 'test-job', 3600, now=NOW.replace(minute=30))
+        assert claim_run(conn, 'test-job', 3600, now=NOW.replace(hour=13))
+        assert not claim_run(conn, 'unknown-job', 3600, now=NOW)
+    finally:
+        conn.execute("DELETE FROM maintenance_runs WHERE name = 'test-job'")
+        conn.commit()
+        app_module.storage.release(conn)
+
+
+def test_compact_sqlite_frees_pages(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'compact.db')
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('CREATE TABLE blobs (data BLOB)')
+    conn.executemany('INSERT INTO blobs VALUES (?)', [(b'x' * 4096,) for _ in range(50)])
+    conn.commit()
+    conn.execute('DELETE FROM blobs')
+    conn.commit()
+    free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    assert free > 10
+
+    assert compact_sqlite(conn, 10) == {'free_pages': free - 10, 'freed_pages': 10}
+    assert compact_sqlite(conn, 1000) == {'free_pages': 0, 'freed_pages': free - 10}
+    conn.close()
+
+
+def test_scheduler_counts_runs_and_failures():
+    results = iter([{'archived': 3, 'freed_pages': 5}, None, RuntimeError('disk full')])
+
+    def job(force=False):
+        result = next(results)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    scheduler = MaintenanceScheduler(job, check_interval=60)
+    assert scheduler.run() == {'archived': 3, 'freed_pages': 5}
+    assert scheduler.run() is None  # not due
+    assert scheduler.run() is None  # failed
+    stats = scheduler.stats()
+    assert (stats['runs'], stats['failures'], stats['archived'], stats['freed_pages']) == (1, 1, 3, 5)
+    assert stats['check_interval'] == 60
@@ -0,0 +1,125 @@
+import pytest
+
+from search import arabic_normalize, best_snippet, query_terms, snippet
+
+
+@pytest.mark.parametrize('text, normalized', [
+    ('مُحَمَّدٌ', 'محمد'),  # diacritics
+    ('أحمد إسلام آمن ٱلقمح', 'احمد اسلام امن قمح'),  # alef variants
+    ('مدرسة', 'مدرسه'),  # taa marbuta
+    ('على', 'علي'),  # alef maksura
+    ('قـــمح', 'قمح'),  # tatweel
+    ('القمح الليبي', 'قمح ليبي'),  # the article
+    ('إلى', 'الي'),  # too short to carry an article
+    ('Wheat 2024', 'Wheat 2024'),
+])
+def test_arabic_normalize(text, normalized):
+    assert arabic_normalize(text) == normalized
+
+
+def test_arabic_normalize_passes_null_through():
+    assert arabic_normalize(None) is None
+
+
+def test_query_terms():
+    assert query_terms('القَمْحُ  الليبي, Wheat!') == ['قمح', 'ليبي', 'wheat']
+    assert query_terms('؟!') == []
+    assert len(query_terms(' '.join(f'w{i}' for i in range(15)))) == 10
+
+
+def test_snippet_marks_the_original_words():
+    text = 'وصلت شحنةُ القمحِ إلى الميناء'
+    # Diacritics, taa marbuta and the article are only folded for matching
+    assert snippet(text, query_terms('شحنة قمح')) == 'وصلت <mark>شحنةُ</mark> <mark>القمحِ</mark> إلى الميناء'
+
+
+def test_snippet_matches_word_starts_only():
+    assert snippet('الدقيق المدقق', query_terms('دق')) == '<mark>الدقيق</mark> المدقق'
+
+
+def test_snippet_escapes_html():
+    assert snippet('<b>القمح</b> & الدقيق', ['قمح']) == '&lt;b&gt;<mark>القمح</mark>&lt;/b&gt; &amp; الدقيق'
+
+
+def test_snippet_centres_on_the_match():
+    text = 'كلمة ' * 60 + 'القمح' + ' نهاية' * 60
+    excerpt = snippet(text, ['قمح'], width=60)
+    assert excerpt.startswith('…') and excerpt.endswith('…')
+    assert '<mark>القمح</mark>' in excerpt
+    assert len(excerpt.replace('<mark>', '').replace('</mark>', '')) == 62
+
+
+def test_snippet_without_match_is_the_start_of_the_text():
+    assert snippet('نص بلا نتيجة', ['زيت']) == 'نص بلا نتيجة'
+    assert snippet('ا' * 200, ['زيت'], width=10) == 'ا' * 10 + '…'
+
+
+def test_best_snippet_prefers_a_text_with_a_match():
+    assert best_snippet([None, 'لا شيء', 'فيه زيت'], ['زيت']) == 'فيه <mark>زيت</mark>'
+    assert best_snippet(['لا شيء هنا', 'ولا هنا'], ['زيت']) == 'لا شيء هنا'
+    assert best_snippet([None, ''], ['زيت']) == ''
+
+
+# ---------- /api/search ----------
+
+NEWS = [
+    # title, excerpt, content, is_active
+    ('أخبار الميناء', 'وصول شحنة زعفران', 'نص', 1),
+    ('زعفران ليبي فاخر', 'جودة عالية', 'نص', 1),
+    ('تقرير', 'ملخص', 'ذُكر الزعفرانُ مرة واحدة في النص', 1),
+    ('زعفران مخفي', 'غير منشور', 'نص', 0),
+]
+
+
+@pytest.fixture
+def saffron(app_module):
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.executemany('INSERT INTO news (title, excerpt, content, is_active) VALUES (?, ?, ?, ?)', NEWS)
+        conn.execute("INSERT INTO contact_messages (name, email, message) "
+                     "VALUES ('عميل', 'saffron@example.com', 'أريد سعر الزعفران')")
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+    yield
+    conn = app_module.storage.acquire(write=True)
+    try:
+        conn.executemany('DELETE FROM news WHERE title = ?', [(row[0],) for row in NEWS])
+        conn.execute("DELETE FROM contact_messages WHERE email = 'saffron@example.com'")
+        conn.commit()
+    finally:
+        app_module.storage.release(conn)
+
+
+def test_search_ranks_title_hits_first(client, saffron):
+    body = client.get('/api/search?q=زعفران').get_json()
+    titles = [hit['title'] for hit in body['results']]
+    # Public search: active news only, no messages
+    assert titles == ['زعفران ليبي فاخر', 'أخبار الميناء', 'تقرير']
+    assert {hit['type'] for hit in body['results']} == {'news'}
+    assert body['next_offset'] is None
+    assert body['results'][2]['snippet'] == 'ذُكر <mark>الزعفرانُ</mark> مرة واحدة في النص'
+
+
+def test_search_pages_with_offset(client, saffron):
+    first = client.get('/api/search?q=الزعفران&limit=2').get_json()
+    assert first['next_offset'] == 2
+    second = client.get('/api/search?q=الزعفران&limit=2&offset=2').get_json()
+    assert second['next_offset'] is None
+    ids = [hit['id'] for hit in first['results'] + second['results']]
+    assert len(ids) == len(set(ids)) == 3
+
+
+def test_search_matches_prefixes_while_typing(client, saffron):
+    assert len(client.get('/api/search?q=زعفر').get_json()['results']) == 3
+
+
+def test_messages_are_searched_for_admins_only(client, auth, saffron):
+    assert client.get('/api/search?q=زعفران&type=messages').status_code == 401
+    hits = client.get('/api/search?q=زعفران', headers=auth).get_json()['results']
+    assert [hit['title'] for hit in hits if hit['type'] == 'messages'] == ['عميل']
+
+
+@pytest.mark.parametrize('query', ['q=', 'q=x&type=users', 'q=x&limit=many'])
+def test_search_rejects_bad_arguments(client, query):
+    assert client.get('/api/search?' + query).status_code == 400
@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+
+import pytest
+
+
+def chunks(app_module, sql, fmt, batch_size=2):
+    return list(app_module.stream_rows(sql, fmt=fmt, batch_size=batch_size))
+
+
+SERVICES = 'SELECT id, title FROM services ORDER BY id'
+
+
+def expected(app_module):
+    conn = app_module.storage.acquire()
+    try:
+        return [dict(row) for row in conn.execute(SERVICES).fetchall()]
+    finally:
+        app_module.storage.release(conn)
+
+
+def test_json_array_is_sent_one_batch_per_chunk(app_module):
+    rows = expected(app_module)
+    assert len(rows) > 2
+    parts = chunks(app_module, SERVICES, 'json')
+    assert len(parts) == (len(rows) + 1) // 2 + 1  # one per batch, then the closing bracket
+    assert json.loads(''.join(parts)) == rows
+
+
+def test_ndjson_is_one_object_per_line(app_module):
+    lines = ''.join(chunks(app_module, SERVICES, 'ndjson')).splitlines()
+    assert [json.loads(line) for line in lines] == expected(app_module)
+
+
+def test_csv_has_a_header_row(app_module):
+    reader = csv.DictReader(io.StringIO(''.join(chunks(app_module, SERVICES, 'csv'))))
+    assert [{'id': int(r['id']), 'title': r['title']} for r in reader] == expected(app_module)
+
+
+@pytest.mark.parametrize('fmt, body', [('json', '[]'), ('ndjson', ''), ('csv', 'id\r\n')])
+def test_empty_results(app_module, fmt, body):
+    assert ''.join(chunks(app_module, 'SELECT id FROM services WHERE id < 0', fmt)) == body
+
+
+def test_stream_returns_its_connection(app_module):
+    stream = app_module.stream_rows(SERVICES, batch_size=1)
+    next(stream)
+    idle = app_module.storage.stats()['readers_idle']
+    stream.close()  # a client that disconnects half way
+    assert app_module.storage.stats()['readers_idle'] == idle + 1
+
+
+def test_export_streams_the_table(client, auth):
+    response = client.get('/api/services/export?format=ndjson', headers=auth)
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=services.ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['id'] for row in rows] == sorted(row['id'] for row in rows)
+    assert 'created_at' in rows[0]
+
+
+def test_export_keeps_arabic_readable(client, auth):
+    body = client.get('/api/site_content/export?format=csv', headers=auth).get_data(as_text=True)
+    assert 'تواصل معنا' in body
+
+
+def test_export_rejects_unknown_formats(client, auth):
+    response = client.get('/api/services/export?format=xml', headers=auth)
+    assert response.status_code == 400